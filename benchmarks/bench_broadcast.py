@@ -0,0 +1,119 @@
+"""
+Microbenchmark de serialización de broadcasts (src/database/services/services_websockets.py).
+
+Inicia una partida de `--players` jugadores, la carga en el estado en memoria y arma
+los mensajes de una vuelta de broadcasts (gameUpdated, playersState y draftCards) con:
+- legacy: el camino anterior, Pydantic -> jsonable_encoder -> json.dumps (y gameUpdated
+  con model_dump_json adentro de json.dumps), con las manos de todos para todos
+- bytes:  el actual, directo a bytes por pydantic-core y una vista por jugador (su mano
+  y sus secretos, de los demás solo lo público)
+
+Reporta bytes que recibe un socket (el más grande), bytes enviados a los `--players`
+sockets y µs de CPU por broadcast (promedio sobre `--rounds` vueltas). La vista de cada
+jugador tiene que coincidir con su entrada en el camino anterior.
+
+Después descarta una carta (un commit) y compara el estado completo (gameUpdated +
+playersState) con el delta que reciben los sockets por ese commit.
+
+Uso:
+    python -m benchmarks.bench_broadcast [--players 6] [--rounds 2000]
+"""
+import argparse
+import datetime
+import json
+import os
+import tempfile
+import time
+
+
+def legacy_messages(state, game_id):
+    from fastapi.encoders import jsonable_encoder
+    from pydantic import TypeAdapter
+    from src.schemas.card_schemas import AllCardsResponse
+    from src.schemas.games_schemas import Game_Response
+    from src.schemas.players_schemas import Player_State
+    players = [Player_State.model_validate(state.player_view(pid)) for pid in state.players]
+    draft = TypeAdapter(list[AllCardsResponse]).validate_python(state.draft_pile()[:3], from_attributes=True)
+    return [
+        json.dumps({"type": "gameUpdated", "data": Game_Response.model_validate(state).model_dump_json()}),
+        json.dumps({"type": "playersState", "data": jsonable_encoder(players)}),
+        json.dumps({"type": "draftCards", "data": jsonable_encoder(draft)}),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, default=6)
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'broadcast.db')}")
+    from src.database.database import SessionLocal, init_db
+    from src.database.models import Game, Player
+    from src.database.services.services_websockets import _card_draft_message, _game_information_messages
+    from src.gameState.game_state import attach, gameStateManager
+    from src.routes.games_routes import start_game
+    init_db()
+
+    with SessionLocal() as db:
+        game = Game(name="bench", status="bootable", max_players=6, min_players=2, players_amount=args.players, seed=1)
+        db.add(game)
+        db.flush()
+        db.add_all([Player(name=f"P{i}", game_id=game.game_id, birth_date=datetime.date(2000, 1, 1 + i))
+                    for i in range(args.players)])
+        db.flush()
+        start_game(game, db)
+        game_id = game.game_id
+        state = gameStateManager.load(db, game_id)
+
+    def views():
+        draft = _card_draft_message(game_id)
+        return {v: m + [draft] for v, m in _game_information_messages(game_id, full=True).items() if v is not None}
+
+    paths = {
+        # El camino anterior arma un solo broadcast y le manda lo mismo a todos
+        "legacy": lambda: dict.fromkeys(state.players, legacy_messages(state, game_id)),
+        "bytes": views,
+    }
+    legacy = [json.loads(m) for m in legacy_messages(state, game_id)]
+    everyone = {player["player_id"]: player for player in legacy[1]["data"]}
+    for player_id, messages in views().items():
+        game, players, draft = [json.loads(m) for m in messages]
+        own = next(p for p in players["data"] if p["player_id"] == player_id)
+        assert [game["data"], own, draft["data"]] == [legacy[0]["data"], everyone[player_id], legacy[2]["data"]], \
+            "los caminos no coinciden"
+
+    run(paths, args, f"{args.players} jugadores, 3 mensajes por vuelta")
+
+    def delta():
+        # Cada vuelta vuelve a armar el delta del mismo commit
+        state.sent_version = base
+        return {v: m for v, m in _game_information_messages(game_id).items() if v is not None}
+
+    base = state.version
+    with SessionLocal() as db:
+        player_id = state.current_player()
+        card = attach(db, state.hand(player_id)[0])
+        card.dropped, card.picked_up, card.discardInt = True, False, 1
+        db.commit()
+    def full():
+        return {v: m for v, m in _game_information_messages(game_id, full=True).items() if v is not None}
+
+    run({"full": full, "delta": delta}, args, f"\nun descarte (versión {base} -> {state.version})")
+
+
+def run(paths, args, title):
+    """`paths` arma {socket: [mensajes]} para los sockets de los jugadores."""
+    print(title)
+    print(f"{'path':<8}{'bytes':>8}{'x sockets':>11}{'CPU µs':>10}")
+    for name, build in paths.items():
+        sizes = [sum(len(m.encode()) for m in messages) for messages in build().values()]
+        start = time.process_time()
+        for _ in range(args.rounds):
+            build()
+        cpu = (time.process_time() - start) / args.rounds * 1e6
+        print(f"{name:<8}{max(sizes):>8}{sum(sizes):>11}{cpu:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Benchmark de la herencia de cartas: tabla única (modelos actuales) contra la
+herencia con tablas unidas anterior (cards + detectives + events), reproducida acá
+con modelos propios sobre otra base.
+
+Mide, por partida de 61 cartas y 4 jugadores:
+- creación del mazo (la parte de initialize_game que depende del esquema)
+- carga de manos (Player.cards con joinedload, como broadcast_game_information)
+- tope de la pila de descarte y draft (como broadcast_last_discarted_cards / broadcast_card_draft)
+
+Uso:
+    python -m benchmarks.bench_card_layout [--games 200]
+"""
+import argparse
+import datetime
+import os
+import tempfile
+import time
+from sqlalchemy import Boolean, Column, ForeignKey, Index, Integer, String, create_engine, desc, select, orm
+from sqlalchemy.orm import Session, declarative_base, joinedload, relationship
+
+from src.database.database import init_db
+from src.database import models
+from src.database.card_catalog import DETECTIVES_INFO, EVENTS_INFO
+
+# --- Réplica del esquema anterior (joined table inheritance) ---
+JoinedBase = declarative_base()
+
+
+class JGame(JoinedBase):
+    __tablename__ = "games"
+    game_id = Column(Integer, primary_key=True)
+
+
+class JPlayer(JoinedBase):
+    __tablename__ = "players"
+    player_id = Column(Integer, primary_key=True)
+    game_id = Column(Integer, ForeignKey("games.game_id"))
+    cards = relationship("JCard", primaryjoin="and_(JCard.player_id == JPlayer.player_id, JCard.dropped == False)")
+
+
+class JCard(JoinedBase):
+    __tablename__ = "cards"
+    card_id = Column(Integer, primary_key=True)
+    type = Column(String(15))
+    picked_up = Column(Boolean)
+    dropped = Column(Boolean)
+    player_id = Column(Integer, ForeignKey("players.player_id"))
+    game_id = Column(Integer, ForeignKey("games.game_id"))
+    draft = Column(Boolean, default=False)
+    discardInt = Column(Integer, default=0)
+    # Mismos índices que models.Card para que la comparación sea solo del layout
+    __table_args__ = tuple(Index(ix.name, *[c.name for c in ix.columns]) for ix in models.Card.__table__.indexes)
+    __mapper_args__ = {"polymorphic_on": type, "polymorphic_abstract": True}
+
+
+class JDetective(JCard):
+    __tablename__ = "detectives"
+    card_id = Column(Integer, ForeignKey("cards.card_id"), primary_key=True)
+    name = Column(String(30))
+    quantity_set = Column(Integer)
+    __mapper_args__ = {"polymorphic_identity": "detective"}
+
+
+class JEvent(JCard):
+    __tablename__ = "events"
+    card_id = Column(Integer, ForeignKey("cards.card_id"), primary_key=True)
+    name = Column(String(30))
+    __mapper_args__ = {"polymorphic_identity": "event"}
+
+
+def build_deck(Detective, Event, game_id):
+    cards = [Detective(name=n, quantity_set=q, game_id=game_id, picked_up=False, dropped=False)
+             for n, amount, q in DETECTIVES_INFO for _ in range(amount)]
+    cards += [Event(name=n, game_id=game_id, picked_up=False, dropped=False)
+              for n, amount in EVENTS_INFO for _ in range(amount)]
+    return cards
+
+
+def deal(cards, player_ids):
+    """Reparte manos y arma un descarte y un draft para que las lecturas tengan datos."""
+    for i, card in enumerate(cards):
+        if i < 6 * len(player_ids):
+            card.player_id, card.picked_up = player_ids[i % len(player_ids)], True
+        elif i < 6 * len(player_ids) + 10:
+            card.dropped, card.discardInt = True, i
+        elif i < 6 * len(player_ids) + 13:
+            card.draft = True
+
+
+def timed(fn, items):
+    items = list(items)
+    start = time.perf_counter()
+    for item in items:
+        fn(item)
+    return (time.perf_counter() - start) / len(items) * 1000
+
+
+def bench(label, engine, new_game, new_player, Player, Card, Detective, Event, polymorphic, games):
+    session = Session(engine)
+    game_ids = []
+
+    def create(_):
+        game = new_game()
+        session.add(game)
+        session.flush()
+        players = [new_player(game.game_id) for _ in range(4)]
+        session.add_all(players)
+        session.flush()
+        cards = build_deck(Detective, Event, game.game_id)
+        deal(cards, [p.player_id for p in players])
+        session.add_all(cards)
+        session.commit()
+        game_ids.append(game.game_id)
+
+    create_ms = timed(create, range(games))
+    session.expunge_all()
+
+    def hands(game_id):
+        session.query(Player).options(joinedload(Player.cards)).filter(Player.game_id == game_id).all()
+        session.expunge_all()
+
+    def discard(game_id):
+        session.execute(select(polymorphic).where(Card.game_id == game_id, Card.dropped == True)
+                        .order_by(desc(Card.discardInt)).limit(5)).scalars().all()
+        session.expunge_all()
+
+    def draft(game_id):
+        session.execute(select(polymorphic).where(Card.game_id == game_id, Card.draft == True).limit(3)).scalars().all()
+        session.expunge_all()
+
+    row = [create_ms, timed(hands, game_ids), timed(discard, game_ids), timed(draft, game_ids)]
+    print(f"{label:<8}" + "".join(f"{v:>12.3f}" for v in row))
+    session.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=200)
+    args = parser.parse_args()
+    tmp = tempfile.mkdtemp()
+
+    joined_engine = create_engine(f"sqlite:///{os.path.join(tmp, 'joined.db')}")
+    JoinedBase.metadata.create_all(joined_engine)
+    single_engine = create_engine(f"sqlite:///{os.path.join(tmp, 'single.db')}")
+    init_db(single_engine)
+
+    print(f"ms por partida ({args.games} partidas, 61 cartas, 4 jugadores)")
+    print(f"{'layout':<8}{'deck':>12}{'hands':>12}{'discard':>12}{'draft':>12}")
+    bench("joined", joined_engine, JGame, lambda game_id: JPlayer(game_id=game_id),
+          JPlayer, JCard, JDetective, JEvent, orm.with_polymorphic(JCard, [JDetective, JEvent]), args.games)
+    bench("single", single_engine,
+          lambda: models.Game(name="bench", max_players=4, min_players=2, players_amount=4),
+          lambda game_id: models.Player(name="P", game_id=game_id, birth_date=datetime.date(2000, 1, 1)),
+          models.Player, models.Card, models.Detective, models.Event, models.Card, args.games)
+
+
+if __name__ == "__main__":
+    main()
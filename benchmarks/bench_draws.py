@@ -0,0 +1,96 @@
+"""
+Benchmark de robo de cartas: draws/s con el mazo barajado en cada robo contra el
+orden de robo persistido (deck_position).
+
+Estrategias, sobre una partida de 61 cartas dentro de una base con `--games` partidas:
+- shuffle: carga el mazo entero, random.shuffle y toma la primera (comportamiento anterior)
+- indexed: la carta de menor deck_position con ORDER BY ... LIMIT 1 sobre ix_cards_game_deck
+- memory:  la primera carta del mazo del estado en memoria (GameState.deck), adjuntada sin SELECT
+
+Cada robo marca la carta como levantada y hace flush; al vaciarse el mazo se hace
+rollback y se vuelve a empezar, así todas las estrategias roban del mismo mazo.
+
+Uso:
+    python -m benchmarks.bench_draws [--games 200] [--draws 5000]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from src.database.database import init_db
+from src.database.models import Card, Game
+from src.database.services.services_cards import init_detective_cards, init_event_cards, shuffle_deck
+from src.gameState.game_state import GameStateManager, attach
+
+
+def deck_filter(game_id):
+    return (Card.game_id == game_id, Card.dropped == False, Card.picked_up == False, Card.draft == False)
+
+
+def draw_shuffle(session, game_id, state):
+    deck = session.query(Card).filter(*deck_filter(game_id)).all()
+    random.shuffle(deck)
+    return deck[0] if deck else None
+
+
+def draw_indexed(session, game_id, state):
+    return session.query(Card).filter(*deck_filter(game_id)).order_by(Card.deck_position, Card.card_id).first()
+
+
+def draw_memory(session, game_id, state):
+    # Sin commit el estado no avanza: se saltean las cartas ya robadas en esta vuelta
+    for row in state.deck():
+        card = attach(session, row)
+        if not card.picked_up:
+            return card
+    return None
+
+
+def bench(engine, game_id, draw, draws, manager):
+    session = Session(engine)
+    state = manager.load(session, game_id)
+    done = 0
+    start = time.perf_counter()
+    while done < draws:
+        card = draw(session, game_id, state)
+        if card is None:
+            session.rollback()
+            continue
+        card.picked_up = True
+        session.flush()
+        done += 1
+    elapsed = time.perf_counter() - start
+    session.rollback()
+    session.close()
+    return draws / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=200)
+    parser.add_argument("--draws", type=int, default=5000)
+    args = parser.parse_args()
+
+    engine = create_engine(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'draws.db')}")
+    init_db(engine)
+    with Session(engine) as session:
+        for _ in range(args.games):
+            game = Game(name="bench", status="in course", max_players=4, min_players=2, players_amount=4)
+            session.add(game)
+            session.commit()
+            init_detective_cards(game.game_id, session)
+            init_event_cards(game.game_id, session)
+            shuffle_deck(game.game_id, session)
+        game_id = game.game_id
+
+    print(f"draws/s ({args.draws} robos, {args.games} partidas de 61 cartas)")
+    for label, draw in (("shuffle", draw_shuffle), ("indexed", draw_indexed), ("memory", draw_memory)):
+        print(f"{label:<10}{bench(engine, game_id, draw, args.draws, GameStateManager()):>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Benchmark de inicio de partidas: throughput de POST /game/beginning/{game_id} con
+1, 100 y 1000 inicios concurrentes.
+
+Cada partida tiene 4 jugadores. Los inicios se lanzan todos juntos contra la app
+(httpx + ASGITransport) y se mide el tiempo total, partidas por segundo y la
+latencia por inicio (incluida la espera en cola). Los broadcasts se reemplazan por
+no-ops salvo con `--with-broadcasts`, para medir el trabajo de base de datos.
+
+`--in-flight` limita los requests simultáneos dentro de la app: cada inicio toma una
+conexión del pool y la retiene entre saltos al threadpool, así que con más requests
+que conexiones los que esperan ocupan los hilos que necesitan los que ya la tienen
+(DB_THREADPOOL_SIZE acota los hilos desde el servidor). Por nivel se muestra además
+la espera máxima por una conexión y los timeouts del pool (src/database/pool_metrics.py).
+
+También cuenta los commits por inicio (listener after_commit sobre todas las
+sesiones): el inicio es una sola unidad de trabajo y tiene que dar 1.
+`--max-commits` hace que el benchmark termine con error si algún nivel lo supera,
+para usarlo como chequeo de regresión.
+
+`--orm` reemplaza la creación del mazo por la versión anterior (un objeto ORM por
+carta + add_all) para comparar con el INSERT ... SELECT desde card_catalog.
+
+Uso:
+    python -m benchmarks.bench_game_start [--levels 1,100,1000] [--in-flight 8] [--orm] [--with-broadcasts] [--max-commits 1]
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+
+def orm_init_detective_cards(game_id, db, commit=True):
+    from src.database.card_catalog import DETECTIVES_INFO
+    from src.database.models import Detective
+    db.add_all([Detective(type="detective", name=name, picked_up=False, dropped=False, game_id=game_id, quantity_set=q)
+                for name, amount, q in DETECTIVES_INFO for _ in range(amount)])
+    db.commit() if commit else db.flush()
+
+
+def orm_init_event_cards(game_id, db, commit=True):
+    from src.database.card_catalog import EVENTS_INFO
+    from src.database.models import Event
+    db.add_all([Event(type="event", name=name, picked_up=False, dropped=False, game_id=game_id)
+                for name, amount in EVENTS_INFO for _ in range(amount)])
+    db.commit() if commit else db.flush()
+
+
+async def _noop(*args, **kwargs):
+    return None
+
+
+def create_games(amount, seed):
+    from src.database.database import SessionLocal
+    from src.database.models import Game, Player
+
+    db = SessionLocal()
+    # Misma semilla en todas: cada inicio baraja y reparte exactamente igual
+    games = [Game(name="bench", status="bootable", max_players=6, min_players=2, players_amount=4, seed=seed)
+             for _ in range(amount)]
+    db.add_all(games)
+    db.flush()
+    db.add_all([Player(name=f"P{i}", game_id=game.game_id, birth_date=datetime.date(2000, 1, 1 + i))
+                for game in games for i in range(4)])
+    db.commit()
+    game_ids = [game.game_id for game in games]
+    db.close()
+    return game_ids
+
+
+async def start_games(game_ids, in_flight):
+    import httpx
+    from src.main import app
+    gate = asyncio.Semaphore(in_flight)
+
+    async def start(client, game_id):
+        begin = time.perf_counter()
+        async with gate:
+            response = await client.post(f"/game/beginning/{game_id}")
+        return response.status_code, time.perf_counter() - begin
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        begin = time.perf_counter()
+        results = await asyncio.gather(*(start(client, game_id) for game_id in game_ids))
+        return time.perf_counter() - begin, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--levels", default="1,100,1000", help="inicios concurrentes, separados por coma")
+    parser.add_argument("--orm", action="store_true", help="crear el mazo con un objeto ORM por carta")
+    parser.add_argument("--with-broadcasts", action="store_true", help="no reemplazar los broadcasts")
+    parser.add_argument("--in-flight", type=int, default=8, help="requests simultáneos como máximo dentro de la app")
+    parser.add_argument("--seed", type=int, default=1, help="semilla de las partidas (repartos idénticos entre corridas)")
+    parser.add_argument("--max-commits", type=float, default=None, help="falla si los commits por inicio superan este valor")
+    args = parser.parse_args()
+
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}")
+    from sqlalchemy import event
+    from sqlalchemy.orm import Session
+    from src.database.database import init_db, poolMetrics
+    from src.routes import games_routes
+    init_db()
+    if args.orm:
+        games_routes.init_detective_cards = orm_init_detective_cards
+        games_routes.init_event_cards = orm_init_event_cards
+    if not args.with_broadcasts:
+        games_routes.broadcast_game_information = _noop
+        games_routes.broadcast_available_games = _noop
+
+    print(f"deck={'orm' if args.orm else 'insert-select'}  in-flight={args.in_flight}  DATABASE_URL={os.environ['DATABASE_URL']}")
+    commits = [0]
+    event.listen(Session, "after_commit", lambda session: commits.__setitem__(0, commits[0] + 1))
+
+    print(f"{'starts':>8}{'ok':>6}{'total s':>10}{'starts/s':>10}{'p50 ms':>10}{'p99 ms':>10}"
+          f"{'wait ms':>10}{'timeouts':>10}{'commits':>10}")
+    regression = False
+    for level in (int(l) for l in args.levels.split(",")):
+        game_ids = create_games(level, args.seed)
+        poolMetrics.reset()
+        commits[0] = 0
+        elapsed, results = asyncio.run(start_games(game_ids, args.in_flight))
+        latencies = sorted(latency for _, latency in results)
+        ok = sum(1 for status, _ in results if status == 202)
+        p99 = latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))]
+        pool = poolMetrics.snapshot()
+        per_start = commits[0] / level
+        print(f"{level:>8}{ok:>6}{elapsed:>10.2f}{level / elapsed:>10.1f}"
+              f"{statistics.median(latencies) * 1000:>10.1f}{p99 * 1000:>10.1f}"
+              f"{pool['wait_ms']['max']:>10.1f}{pool['timeouts']:>10}{per_start:>10.1f}")
+        regression |= args.max_commits is not None and per_start > args.max_commits
+    if regression:
+        sys.exit(f"commits por inicio por encima de {args.max_commits}")
+
+
+if __name__ == "__main__":
+    main()
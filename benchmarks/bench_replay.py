@@ -0,0 +1,112 @@
+"""
+Benchmark de reproducción del registro de acciones (src/gameState/action_log.py).
+
+Juega `--games` partidas de 4 jugadores contra la app (cada turno: descartar, robar y
+pasar el turno, hasta vaciar el mazo) y después mide, por partida:
+- replay: reconstruir el estado final desde el registro ya leído (solo CPU)
+- read:   leer la partida completa de la base, para tener una referencia
+
+y verifica que lo reproducido coincida con la base. Con `--game-id` no juega nada y
+reproduce una partida real de la base de DATABASE_URL (tráfico real como regresión).
+
+Uso:
+    python -m benchmarks.bench_replay [--games 20] [--seed 1] [--game-id N]
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import sys
+import tempfile
+import time
+
+
+async def _noop(*args, **kwargs):
+    return None
+
+
+async def play_games(amount, seed):
+    import httpx
+    from src.database.database import SessionLocal
+    from src.database.models import Game, Player
+    from src.gameState.game_state import gameStateManager
+    from src.main import app
+
+    with SessionLocal() as db:
+        games = [Game(name="bench", status="bootable", max_players=6, min_players=2, players_amount=4, seed=seed)
+                 for _ in range(amount)]
+        db.add_all(games)
+        db.flush()
+        db.add_all([Player(name=f"P{i}", game_id=game.game_id, birth_date=datetime.date(2000, 1, 1 + i))
+                    for game in games for i in range(4)])
+        db.commit()
+        game_ids = [game.game_id for game in games]
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for game_id in game_ids:
+            await client.post(f"/game/beginning/{game_id}")
+            while True:
+                with SessionLocal() as db:
+                    state = gameStateManager.load(db, game_id)
+                    player_id = state.current_player()
+                    if state.status == "finished" or not state.deck():
+                        break
+                await client.put(f"/cards/drop/{player_id}")
+                await client.put(f"/cards/pick_up/{player_id},{game_id}")
+                await client.put(f"/game/update_turn/{game_id}")
+    return game_ids
+
+
+def bench(game_ids):
+    from src.database.database import SessionLocal
+    from src.database.models import GameAction
+    from src.gameState.action_log import read_snapshot, replay, snapshot_of
+
+    total_actions = replay_s = read_s = 0.0
+    mismatches = 0
+    with SessionLocal() as db:
+        for game_id in game_ids:
+            actions = db.query(GameAction).filter(GameAction.game_id == game_id).order_by(GameAction.seq).all()
+            start = time.perf_counter()
+            state = replay(actions)
+            replay_s += time.perf_counter() - start
+            start = time.perf_counter()
+            stored = read_snapshot(db, game_id)
+            read_s += time.perf_counter() - start
+            mismatches += snapshot_of(state) != stored
+            total_actions += len(actions)
+    games = len(game_ids)
+    print(f"{games} partidas, {total_actions:.0f} acciones ({total_actions / games:.0f} por partida)")
+    print(f"{'replay':<8}{replay_s / games * 1000:>10.2f} ms/partida{total_actions / replay_s:>12.0f} acciones/s")
+    print(f"{'read':<8}{read_s / games * 1000:>10.2f} ms/partida")
+    print(f"no coinciden con la base: {mismatches}")
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1, help="semilla de las partidas jugadas")
+    parser.add_argument("--game-id", type=int, default=None, help="reproducir esta partida de DATABASE_URL")
+    args = parser.parse_args()
+
+    if args.game_id is None:
+        os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'replay.db')}")
+    from src.database.database import init_db
+    from src.database.services import services_games
+    from src.routes import cards_routes, games_routes
+    init_db()
+    if args.game_id is not None:
+        sys.exit(1 if bench([args.game_id]) else 0)
+    for module, names in ((games_routes, ("broadcast_game_information", "broadcast_available_games")),
+                          (cards_routes, ("broadcast_game_information", "broadcast_last_discarted_cards")),
+                          (services_games, ("broadcast_game_information",))):
+        for name in names:
+            setattr(module, name, _noop)
+    game_ids = asyncio.run(play_games(args.games, args.seed))
+    sys.exit(1 if bench(game_ids) else 0)
+
+
+if __name__ == "__main__":
+    main()
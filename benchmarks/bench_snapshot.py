@@ -0,0 +1,62 @@
+"""
+Benchmark de snapshots de partidas (src/database/services/services_snapshots.py).
+
+Inicia una partida de `--players` jugadores y mide, en promedio sobre `--rounds` vueltas:
+- tamaño del snapshot binario contra el mismo contenido en JSON
+- encode / decode del blob (solo CPU)
+- restore: crear una partida nueva desde el blob (un commit)
+- start:   crear la misma partida con el inicio completo (start_game)
+
+Uso:
+    python -m benchmarks.bench_snapshot [--players 6] [--rounds 200]
+"""
+import argparse
+import datetime
+import json
+import os
+import tempfile
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, default=6)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'snapshot.db')}")
+    from src.database.database import SessionLocal, init_db
+    from src.database.models import Game, Player
+    from src.database.services.services_snapshots import decode_snapshot, encode_snapshot, restore_game, snapshot_game
+    from src.routes.games_routes import start_game
+    init_db()
+
+    def new_game(db):
+        game = Game(name="bench", status="bootable", max_players=6, min_players=2, players_amount=args.players, seed=1)
+        db.add(game)
+        db.flush()
+        db.add_all([Player(name=f"P{i}", game_id=game.game_id, birth_date=datetime.date(2000, 1, 1 + i))
+                    for i in range(args.players)])
+        db.flush()
+        return game
+
+    def timed(fn):
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            fn()
+        return (time.perf_counter() - start) / args.rounds * 1e6
+
+    with SessionLocal() as db:
+        game = new_game(db)
+        start_game(game, db)
+        blob = snapshot_game(game.game_id, db)
+        tables = decode_snapshot(blob)
+        print(f"snapshot: {len(blob)} bytes (JSON: {len(json.dumps(tables, default=str))} bytes)")
+        print(f"{'encode':<10}{timed(lambda: encode_snapshot(tables)):>10.0f} µs")
+        print(f"{'decode':<10}{timed(lambda: decode_snapshot(blob)):>10.0f} µs")
+        print(f"{'restore':<10}{timed(lambda: restore_game(blob, db)):>10.0f} µs")
+        print(f"{'start':<10}{timed(lambda: start_game(new_game(db), db)):>10.0f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark de arranque en frío: mide el tiempo de importar src.main y la latencia
+del primer request, comparando el comportamiento anterior (create_all al importar)
+con el actual (create_all en el lifespan de la app).
+
+Cada medición corre en un proceso nuevo para que sea realmente un arranque en frío.
+
+Uso:
+    python -m benchmarks.bench_startup [--runs 5] [--url sqlite:///bench.db]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+_CHILD = r"""
+import json, sys, time
+mode = sys.argv[1]
+t0 = time.perf_counter()
+if mode == "eager":
+    # Comportamiento anterior: el esquema se crea durante el import
+    import src.database.database as database
+    database.init_db()
+import src.main
+t_import = time.perf_counter() - t0
+
+from fastapi.testclient import TestClient
+t1 = time.perf_counter()
+with TestClient(src.main.app) as client:
+    t_startup = time.perf_counter() - t1
+    t2 = time.perf_counter()
+    response = client.get("/games")
+    t_first = time.perf_counter() - t2
+assert response.status_code == 200, response.text
+print(json.dumps({"import": t_import, "startup": t_startup, "first_request": t_first}))
+"""
+
+
+def run_once(mode: str, env: dict) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", _CHILD, mode],
+        env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--url", default=None, help="DATABASE_URL a usar (por defecto un SQLite temporal)")
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    env = dict(os.environ)
+    env["DATABASE_URL"] = args.url or f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+    env["PYTHONPATH"] = os.getcwd()
+
+    print(f"DATABASE_URL={env['DATABASE_URL']}  runs={args.runs}")
+    print(f"{'mode':<8}{'import (ms)':>14}{'startup (ms)':>15}{'1st req (ms)':>15}")
+    for mode in ("eager", "lazy"):
+        results = [run_once(mode, env) for _ in range(args.runs)]
+        row = [statistics.median(r[key] for r in results) * 1000
+               for key in ("import", "startup", "first_request")]
+        print(f"{mode:<8}{row[0]:>14.1f}{row[1]:>15.1f}{row[2]:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
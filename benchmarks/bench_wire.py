@@ -0,0 +1,111 @@
+"""
+Benchmark de los formatos de WebSocket (src/webSocket/wire.py) contra el JSON actual.
+
+Inicia una partida de `--players` jugadores, descarta algunas cartas y arma los mensajes
+de siempre: playersState (el propio de un jugador y el público), droppedCards,
+draftCards y los del lobby (partidas disponibles y jugadores de la sala). Para cada
+mensaje y formato reporta:
+- bytes:  el mensaje solo (con deflate, un compresor nuevo: el primer mensaje de la conexión)
+- stream: con deflate, el mensaje en una conexión que ya recibió todos los mensajes de
+  antes de esos descartes y de una partida nueva en el lobby (el contexto ya tiene los
+  nombres de campos y de cartas, pero el mensaje no es igual al anterior)
+- µs:     codificar (y comprimir) el mensaje, promedio sobre `--rounds` vueltas
+
+json es lo que se manda hoy (send_text, el texto en UTF-8).
+
+Uso:
+    python -m benchmarks.bench_wire [--players 6] [--games 20] [--rounds 2000]
+"""
+import argparse
+import datetime
+import os
+import tempfile
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, default=6)
+    parser.add_argument("--games", type=int, default=20, help="partidas en la lista del lobby")
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'wire.db')}")
+    from src.database.database import SessionLocal, init_db
+    from src.database.models import Game, Player
+    from src.database.services.services_websockets import (
+        _available_games_message, _card_draft_message, _dropped_cards_message, _game_information_messages,
+        _lobby_messages)
+    from src.gameState.game_state import attach, gameStateManager
+    from src.routes.games_routes import start_game
+    from src.webSocket.wire import FORMATS
+    init_db()
+
+    def build(db, game_id):
+        state = gameStateManager.get(game_id)
+        views = _game_information_messages(game_id, full=True)
+        return {
+            "playersState (propio)": views[next(iter(state.players))][1],
+            "playersState (público)": views[None][1],
+            "droppedCards": _dropped_cards_message(state.discard_pile(limit=5)),
+            "draftCards": _card_draft_message(game_id),
+            "lobby: partidas": _available_games_message(db),
+            "lobby: jugadores": _lobby_messages(db, game_id)[1],
+        }
+
+    def discard(db, state, players, first):
+        for n, player_id in enumerate(players, start=first):
+            card = attach(db, state.hand(player_id)[0])
+            card.dropped, card.picked_up, card.discardInt = True, False, n
+        db.commit()
+
+    with SessionLocal() as db:
+        for i in range(args.games):
+            db.add(Game(name=f"Partida {i}", status="waiting players", max_players=6, min_players=2, players_amount=1))
+        game = Game(name="bench", status="bootable", max_players=6, min_players=2, players_amount=args.players, seed=1)
+        db.add(game)
+        db.flush()
+        db.add_all([Player(name=f"Jugador {i}", game_id=game.game_id, birth_date=datetime.date(2000, 1, 1 + i))
+                    for i in range(args.players)])
+        db.flush()
+        start_game(game, db)
+        game_id = game.game_id
+        state = gameStateManager.load(db, game_id)
+        players = list(state.players)
+        discard(db, state, players[:3], 1)
+        before = build(db, game_id)
+        discard(db, state, players[3:5], 4)
+        db.add(Game(name="Partida nueva", status="waiting players", max_players=6, min_players=2, players_amount=1))
+        db.commit()
+        messages = build(db, game_id)
+
+    def encoder(wire):
+        """Lo que sale por el socket de una conexión con ese formato (con su propio compresor)."""
+        compress = wire.compressor()
+
+        def encode(message):
+            data = wire.encode(message)
+            if compress is not None:
+                return compress(data)
+            return data.encode() if isinstance(data, str) else data
+        return encode
+
+    print(f"{'mensaje':<24}{'formato':<14}{'bytes':>8}{'stream':>8}{'µs':>8}")
+    for name, message in messages.items():
+        for subprotocol, wire in FORMATS.items():
+            size = stream = len(encoder(wire)(message))
+            encode = encoder(wire)
+            if wire.deflate:
+                for previous in before.values():
+                    encode(previous)
+                stream = len(encode(message))
+            start = time.perf_counter()
+            for _ in range(args.rounds):
+                encode(message)
+            micros = (time.perf_counter() - start) / args.rounds * 1e6
+            print(f"{name:<24}{subprotocol:<14}{size:>8}{stream:>8}{micros:>8.1f}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Prueba de carga: latencia de broadcast por WebSocket mientras corren acciones HTTP.
+
+Conecta sockets simulados a una partida y cada `--interval` ms programa un broadcast,
+midiendo cuánto tarda en llegar a los sockets. En paralelo lanza `--concurrency`
+clientes que roban y descartan cartas contra la API. Si las rutas async bloquean el
+event loop con la base de datos, la latencia del broadcast crece con la carga HTTP.
+
+`--blocking` reemplaza run_db por una versión que corre la consulta en el mismo event
+loop, para comparar con el comportamiento anterior.
+
+`--slow-sockets N` agrega N sockets que tardan `--slow-ms` en cada envío (clientes
+lentos o medio muertos). Sus latencias no se cuentan: con las colas por conexión la
+de los demás no debería moverse, y los lentos se cierran al vencer WS_SEND_TIMEOUT_MS.
+
+Uso:
+    python -m benchmarks.bench_ws_latency [--actions 200] [--concurrency 8] [--blocking]
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+
+class FakeWebSocket:
+    def __init__(self, delay: float = 0.0):
+        self.latencies = []
+        self.delay = delay
+
+    async def send_text(self, message: str):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        # Los broadcasts reales de la partida también llegan acá; solo se miden las sondas
+        if message.startswith("probe:"):
+            self.latencies.append(time.perf_counter() - float(message[6:]))
+
+
+async def _run_inline(fn, *args, **kwargs):
+    return fn(*args, **kwargs)
+
+
+def patch_blocking():
+    for name, module in list(sys.modules.items()):
+        if name.startswith("src.") and hasattr(module, "run_db"):
+            module.run_db = _run_inline
+
+
+async def probe(gameManager, game_id, stop: asyncio.Event, interval: float):
+    # Cada sonda lleva la hora en la que debía salir: si el loop está bloqueado,
+    # la demora hasta que llega a los sockets queda reflejada en la latencia.
+    while not stop.is_set():
+        due = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        await gameManager.broadcast(f"probe:{due}", game_id)
+
+
+async def player_actions(client, player_id, game_id, actions):
+    for _ in range(actions):
+        await client.put(f"/cards/pick_up/{player_id},{game_id}")
+        await client.put(f"/cards/drop/{player_id}")
+
+
+async def measure(args, with_load: bool):
+    import httpx
+    from src.main import app
+    from src.database.database import SessionLocal
+    from src.database.models import Game, Player
+    from src.webSocket.connection_manager import gameManager
+
+    db = SessionLocal()
+    game = Game(name="bench", status="bootable", max_players=6, min_players=2, players_amount=args.concurrency)
+    db.add(game)
+    db.commit()
+    players = [Player(name=f"P{i}", game_id=game.game_id, birth_date=datetime.date(2000, 1, 1 + i))
+               for i in range(args.concurrency)]
+    db.add_all(players)
+    db.commit()
+    game_id, player_ids = game.game_id, [p.player_id for p in players]
+    db.close()
+
+    sockets = [FakeWebSocket() for _ in range(args.sockets)]
+    slow = [FakeWebSocket(args.slow_ms / 1000) for _ in range(args.slow_sockets)]
+    gameManager.active_connections[game_id].extend(slow + sockets)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.post(f"/game/beginning/{game_id}")
+        for ws in sockets:
+            ws.latencies.clear()
+        stop = asyncio.Event()
+        probe_task = asyncio.create_task(probe(gameManager, game_id, stop, args.interval / 1000))
+        if with_load:
+            await asyncio.gather(*(player_actions(client, pid, game_id, args.actions // args.concurrency)
+                                   for pid in player_ids))
+        else:
+            await asyncio.sleep(1)
+        stop.set()
+        await probe_task
+
+    for ws in list(gameManager.active_connections.get(game_id, [])):
+        gameManager.disconnect(ws, game_id)
+    latencies = sorted(l for ws in sockets for l in ws.latencies)
+    return latencies
+
+
+def report(label, latencies):
+    p = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+    print(f"{label:<10}{len(latencies):>8}{statistics.median(latencies) * 1000:>10.2f}{p(0.99):>10.2f}{latencies[-1] * 1000:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--actions", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--sockets", type=int, default=6)
+    parser.add_argument("--interval", type=float, default=5.0, help="ms entre broadcasts de prueba")
+    parser.add_argument("--blocking", action="store_true", help="ejecutar la base de datos dentro del event loop")
+    parser.add_argument("--slow-sockets", type=int, default=0, help="sockets lentos adicionales")
+    parser.add_argument("--slow-ms", type=float, default=2000.0, help="demora de cada envío a un socket lento")
+    args = parser.parse_args()
+
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}")
+    from src.database.database import init_db
+    import src.main  # noqa: F401  (importa todas las rutas antes de parchear run_db)
+    init_db()
+    if args.blocking:
+        patch_blocking()
+
+    print(f"mode={'blocking' if args.blocking else 'threadpool'}  slow sockets={args.slow_sockets}  DATABASE_URL={os.environ['DATABASE_URL']}")
+    print(f"{'load':<10}{'samples':>8}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    report("idle", asyncio.run(measure(args, with_load=False)))
+    report("http", asyncio.run(measure(args, with_load=True)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Archivado de partidas terminadas (separación caliente/frío).
+
+Las partidas con status 'finished' se mueven, por lotes, de las tablas vivas (games,
+players, cards, secrets, sets, game_actions) a archived_games: una fila por partida con sus filas
+hijas guardadas en `snapshot` en forma de columnas + filas. Así las tablas vivas y
+sus índices crecen con las partidas activas y no con la historia.
+
+- Una partida se archiva recién `GAME_ARCHIVE_GRACE_MINUTES` después de terminar,
+  para que los clientes todavía conectados puedan leer el resultado.
+- Las partidas archivadas se borran del archivo a los `GAME_ARCHIVE_RETENTION_DAYS`
+  días (0 = no se borran nunca).
+- El lifespan de la app corre `run_archiver` cada `GAME_ARCHIVE_INTERVAL` segundos
+  (0 = desactivado). También se puede correr una vez desde cron:
+
+    python -m src.database.archive [--batch-size 100]
+"""
+import argparse
+import asyncio
+import datetime
+import logging
+from dataclasses import dataclass, field
+from sqlalchemy import delete, or_, select, update
+from sqlalchemy.orm import Session
+from src.database.database import SessionLocal, _env_int, run_db
+from src.database.models import ArchivedGame, Card, Game, GameAction, Player, Secrets, Set
+from src.gameState.game_state import SYNCED_OPTION
+
+logger = logging.getLogger(__name__)
+
+# Las partidas terminadas ya no están en el estado en memoria: los DELETE no lo invalidan
+_OPTIONS = {SYNCED_OPTION: True, "synchronize_session": False}
+
+# Orden de borrado: primero las tablas que apuntan a otras
+_CHILD_TABLES = (("game_actions", GameAction.__table__), ("cards", Card.__table__), ("secrets", Secrets.__table__),
+                 ("sets", Set.__table__), ("players", Player.__table__))
+
+
+@dataclass
+class ArchiveSettings:
+    batch_size: int = field(default_factory=lambda: _env_int("GAME_ARCHIVE_BATCH_SIZE", 100))
+    grace_minutes: int = field(default_factory=lambda: _env_int("GAME_ARCHIVE_GRACE_MINUTES", 10))
+    retention_days: int = field(default_factory=lambda: _env_int("GAME_ARCHIVE_RETENTION_DAYS", 90))
+    interval: int = field(default_factory=lambda: _env_int("GAME_ARCHIVE_INTERVAL", 600))
+
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, (datetime.date, datetime.datetime)) else value
+
+
+def _snapshot(db: Session, game_ids: list) -> dict:
+    """Filas hijas de cada partida: {game_id: {tabla: {"columns": [...], "rows": [[...]]}}}."""
+    snapshots = {game_id: {} for game_id in game_ids}
+    for name, table in reversed(_CHILD_TABLES):
+        columns = [c.name for c in table.columns]
+        pk = next(iter(table.primary_key.columns))
+        for game_id in game_ids:
+            snapshots[game_id][name] = {"columns": columns, "rows": []}
+        for row in db.execute(select(table).where(table.c.game_id.in_(game_ids)).order_by(pk)):
+            snapshots[row.game_id][name]["rows"].append([_json_value(v) for v in row])
+    return snapshots
+
+
+def archive_batch(db: Session, batch_size: int, finished_before: datetime.datetime,
+                  archived_at: datetime.datetime) -> int:
+    """
+    Archiva hasta `batch_size` partidas terminadas antes de `finished_before` (o sin
+    fecha de fin) en una sola transacción. Devuelve cuántas archivó.
+
+    Cada worker corre su archivador: las partidas se reclaman con un UPDATE condicional
+    ('finished' -> 'archiving') que bloquea sus filas hasta el commit, así otro
+    archivador que eligió las mismas no cambia ninguna fila y las saltea.
+    """
+    candidates = db.execute(
+        select(Game.game_id).where(Game.status == "finished",
+                                   or_(Game.finished_at.is_(None), Game.finished_at < finished_before))
+        .order_by(Game.game_id).limit(batch_size)
+    ).scalars().all()
+    if not candidates:
+        return 0
+    db.execute(update(Game.__table__).where(Game.game_id.in_(candidates), Game.status == "finished")
+               .values(status="archiving"), execution_options=_OPTIONS)
+    # El estado 'archiving' nunca se commitea: las filas se borran en esta misma transacción
+    games = db.execute(
+        select(Game).where(Game.game_id.in_(candidates), Game.status == "archiving").order_by(Game.game_id)
+    ).scalars().all()
+    if not games:
+        db.rollback()
+        return 0
+    game_ids = [game.game_id for game in games]
+    snapshots = _snapshot(db, game_ids)
+    db.add_all([ArchivedGame(game_id=game.game_id, name=game.name, max_players=game.max_players,
+                             min_players=game.min_players, players_amount=game.players_amount,
+                             finished_at=game.finished_at, archived_at=archived_at,
+                             snapshot={"game": {"status": "finished", "current_turn": game.current_turn,
+                                                "cards_left": game.cards_left},
+                                       **snapshots[game.game_id]})
+                for game in games])
+    db.flush()
+    for _, table in _CHILD_TABLES:
+        db.execute(delete(table).where(table.c.game_id.in_(game_ids)), execution_options=_OPTIONS)
+    db.execute(delete(Game.__table__).where(Game.game_id.in_(game_ids)), execution_options=_OPTIONS)
+    db.commit()
+    db.expunge_all()
+    return len(game_ids)
+
+
+def purge_archive(db: Session, archived_before: datetime.datetime) -> int:
+    """Borra del archivo las partidas archivadas antes de `archived_before`."""
+    result = db.execute(delete(ArchivedGame).where(ArchivedGame.archived_at < archived_before),
+                        execution_options=_OPTIONS)
+    db.commit()
+    return result.rowcount
+
+
+def archive_finished_games(db: Session, settings: ArchiveSettings = None, now: datetime.datetime = None) -> dict:
+    """Archiva todas las partidas terminadas que correspondan, lote por lote, y aplica la retención."""
+    settings = settings or ArchiveSettings()
+    now = now or datetime.datetime.utcnow()
+    finished_before = now - datetime.timedelta(minutes=settings.grace_minutes)
+    archived = 0
+    while True:
+        moved = archive_batch(db, settings.batch_size, finished_before, now)
+        archived += moved
+        if moved < settings.batch_size:
+            break
+    purged = 0
+    if settings.retention_days > 0:
+        purged = purge_archive(db, now - datetime.timedelta(days=settings.retention_days))
+    return {"archived": archived, "purged": purged}
+
+
+def _archive_once(settings: ArchiveSettings) -> dict:
+    db = SessionLocal()
+    try:
+        return archive_finished_games(db, settings)
+    finally:
+        db.close()
+
+
+async def run_archiver(settings: ArchiveSettings = None):
+    """Tarea de fondo del lifespan: archiva cada `settings.interval` segundos."""
+    settings = settings or ArchiveSettings()
+    while True:
+        await asyncio.sleep(settings.interval)
+        try:
+            result = await run_db(_archive_once, settings)
+            if result["archived"] or result["purged"]:
+                logger.info("Archivado de partidas: %(archived)s archivadas, %(purged)s borradas del archivo", result)
+        except Exception:
+            logger.exception("Error archivando partidas terminadas")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=None)
+    args = parser.parse_args()
+    settings = ArchiveSettings()
+    if args.batch_size:
+        settings.batch_size = args.batch_size
+    print(_archive_once(settings))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Catálogo de cartas del juego. La tabla card_catalog tiene una fila por cada carta
+física del mazo, así crear el mazo de una partida es copiarla con un INSERT ... SELECT.
+"""
+from sqlalchemy import func, insert, select
+
+# Catálogo de cartas: (nombre, cantidad en el mazo, cartas necesarias para el set)
+DETECTIVES_INFO = [
+    ("Harley Quin Wildcard", 4 , 1),
+    ("Adriane Oliver", 3 , 1),
+    ("Miss Marple", 3 , 3),
+    ("Parker Pyne", 3 , 2),
+    ("Tommy Beresford", 2 , 2),
+    ("Lady Eileen 'Bundle' Brent", 3 , 2),
+    ("Tuppence Beresford", 2 , 2),
+    ("Hercule Poirot", 3 , 3),
+    ("Mr Satterthwaite", 2 , 2),
+]
+
+# (nombre, cantidad en el mazo)
+EVENTS_INFO = [
+    ("Delay the murderer's escape!", 3),
+    ("Point your suspicions", 3),
+    ("Dead card folly", 3),
+    ("Another Victim", 2),
+    ("Look into the ashes", 3),
+    ("Card trade", 3),
+    ("And then there was one more...", 2),
+    ("Early train to paddington", 2),
+    ("Cards off the table", 1),
+    ("Not so fast" , 10) ,
+    ("Social Faux Pas" , 3) ,
+    ("Blackmailed" , 1)
+]
+
+
+def catalog_rows() -> list[dict]:
+    """Una fila por carta física, detectives primero, en el orden de las listas de arriba."""
+    rows = [{"type": "detective", "name": name, "quantity_set": quantity_set}
+            for name, quantity, quantity_set in DETECTIVES_INFO for _ in range(quantity)]
+    rows += [{"type": "event", "name": name, "quantity_set": None}
+             for name, quantity in EVENTS_INFO for _ in range(quantity)]
+    return rows
+
+
+def seed_card_catalog(conn, table):
+    """Carga el catálogo si la tabla está vacía (executemany de una sola sentencia)."""
+    if conn.execute(select(func.count()).select_from(table)).scalar():
+        return
+    conn.execute(insert(table), catalog_rows())
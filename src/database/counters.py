@@ -0,0 +1,99 @@
+"""
+Contadores desnormalizados de cartas:
+- players.hand_size: cartas levantadas y no descartadas del jugador (lo que contaba only_6)
+- games.cards_left: cartas en el mazo (sin levantar, sin descartar y fuera del draft)
+
+Se mantienen solos: al hacer flush se comparan los valores anteriores y nuevos de cada
+carta insertada, modificada o borrada, y los contadores se ajustan con
+UPDATE ... SET x = x + delta en la misma transacción que mueve las cartas. Las
+sentencias masivas que crean o mueven cartas tienen que llamar a `adjust_counters`.
+"""
+from collections import Counter
+from sqlalchemy import event, func, inspect, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+from src.database.models import Card, Game, Player
+from src.gameState import game_state
+
+_TRACKED_FIELDS = ("game_id", "player_id", "picked_up", "dropped", "draft")
+
+
+def hand_of(card: dict):
+    """player_id si la carta cuenta para la mano del jugador, si no None."""
+    if card["player_id"] is not None and card["picked_up"] and not card["dropped"]:
+        return card["player_id"]
+    return None
+
+
+def deck_of(card: dict):
+    """game_id si la carta está en el mazo, si no None."""
+    if not card["picked_up"] and not card["dropped"] and not card["draft"]:
+        return card["game_id"]
+    return None
+
+
+def _values(insp, previous: bool) -> dict:
+    values = {}
+    for field in _TRACKED_FIELDS:
+        history = insp.attrs[field].history
+        if previous and history.deleted:
+            values[field] = history.deleted[0]
+        else:
+            values[field] = insp.dict.get(field)
+    return values
+
+
+def adjust_counters(session: Session, hands: Counter = None, decks: Counter = None):
+    """Suma los deltas a los contadores en la base, en las instancias cargadas y en el estado en memoria."""
+    hands = {k: v for k, v in (hands or {}).items() if k is not None and v}
+    decks = {k: v for k, v in (decks or {}).items() if k is not None and v}
+    if not hands and not decks:
+        return
+    conn = session.connection()
+    players, games = Player.__table__, Game.__table__
+    for player_id, delta in hands.items():
+        conn.execute(update(players).where(players.c.player_id == player_id)
+                     .values(hand_size=players.c.hand_size + delta))
+        game_state.record_delta(session, Player, player_id, hand_size=delta)
+    for game_id, delta in decks.items():
+        conn.execute(update(games).where(games.c.game_id == game_id)
+                     .values(cards_left=func.coalesce(games.c.cards_left, 0) + delta))
+        game_state.record_delta(session, Game, game_id, cards_left=delta)
+
+    # Las instancias ya cargadas en la sesión reciben el valor nuevo sin releerlo
+    for obj in list(session.identity_map.values()) + list(session.new):
+        if isinstance(obj, Player) and obj.player_id in hands and "hand_size" in obj.__dict__:
+            set_committed_value(obj, "hand_size", (obj.__dict__["hand_size"] or 0) + hands[obj.player_id])
+        elif isinstance(obj, Game) and obj.game_id in decks and "cards_left" in obj.__dict__:
+            set_committed_value(obj, "cards_left", (obj.__dict__["cards_left"] or 0) + decks[obj.game_id])
+
+
+def _keep_previous(target, value, oldvalue, initiator):
+    return value
+
+
+# Con active_history el valor anterior se carga aunque la instancia esté expirada,
+# si no el flush no sabría de dónde sale la carta
+for _field in _TRACKED_FIELDS:
+    event.listen(getattr(Card, _field), "set", _keep_previous, active_history=True, propagate=True)
+
+
+@event.listens_for(Session, "after_flush")
+def _update_counters(session, flush_context):
+    hands, decks = Counter(), Counter()
+    for kind, objects in (("insert", session.new), ("update", session.dirty), ("delete", session.deleted)):
+        for obj in objects:
+            if not isinstance(obj, Card):
+                continue
+            insp = inspect(obj)
+            if kind == "update" and not any(insp.attrs[f].history.has_changes() for f in _TRACKED_FIELDS):
+                continue
+            if kind != "insert":
+                before = _values(insp, previous=True)
+                hands[hand_of(before)] -= 1
+                decks[deck_of(before)] -= 1
+            if kind != "delete":
+                after = _values(insp, previous=False)
+                hands[hand_of(after)] += 1
+                decks[deck_of(after)] += 1
+    adjust_counters(session, hands, decks)
@@ -0,0 +1,40 @@
+"""
+RNG reproducible por partida.
+
+Cada partida guarda una semilla (`Game.seed`) y cada barajado o reparto usa su propio
+flujo, `game_rng(seed, "deck")`, `game_rng(seed, "secrets")`, etc. Los flujos son
+independientes entre sí: agregar o reordenar un paso del inicio no cambia lo que sale
+en los otros. Con la misma semilla (y las mismas filas, que se leen siempre ordenadas
+por id) una partida se reparte igual, para reproducir bugs, comparar benchmarks sobre
+repartos idénticos y reconstruir partidas.
+"""
+import random
+from sqlalchemy.orm import Session
+
+_system_random = random.SystemRandom()
+
+# Cabe en un BIGINT con signo
+SEED_BITS = 63
+
+
+def new_seed() -> int:
+    return _system_random.getrandbits(SEED_BITS)
+
+
+def game_rng(seed: int, stream: str) -> random.Random:
+    # random.Random con un str es determinístico entre procesos (no depende de PYTHONHASHSEED)
+    return random.Random(f"{seed}:{stream}")
+
+
+def rng_for_game(db: Session, game_id: int, stream: str) -> random.Random:
+    """
+    El flujo `stream` de la partida. Las partidas creadas antes de guardar la semilla
+    reciben una la primera vez que se barajan.
+    """
+    from src.database.models import Game  # models.py usa new_seed como default de Game.seed
+    game = db.get(Game, game_id)
+    if game is None:
+        return random.Random(new_seed())
+    if game.seed is None:
+        game.seed = new_seed()
+    return game_rng(game.seed, stream)
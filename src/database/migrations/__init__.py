@@ -0,0 +1,63 @@
+"""
+Migraciones versionadas del esquema.
+
+Cada migración es un módulo `vNNN_<nombre>.py` con una constante `VERSION` y una
+función `upgrade(conn)`. La versión aplicada se guarda en la tabla `schema_version`.
+
+- Una base nueva se crea con `Base.metadata.create_all` (que ya incluye todo lo
+  que declaran los modelos) y se marca directamente con la última versión.
+- Una base existente corre, en orden, las migraciones que le falten.
+
+Las migraciones tienen que ser idempotentes (ver los helpers de `ops`), porque
+una base puede tener parte del esquema creado por `create_all`.
+"""
+import importlib
+import pkgutil
+from typing import List, Optional
+from sqlalchemy import Column, Integer, MetaData, Table, inspect, select
+
+_metadata = MetaData()
+schema_version = Table("schema_version", _metadata, Column("version", Integer, nullable=False))
+
+
+def load_migrations():
+    """Devuelve los módulos de migración ordenados por VERSION."""
+    modules = []
+    for info in pkgutil.iter_modules(__path__):
+        if info.name.startswith("v"):
+            modules.append(importlib.import_module(f"{__name__}.{info.name}"))
+    return sorted(modules, key=lambda m: m.VERSION)
+
+
+def head_version() -> int:
+    migrations = load_migrations()
+    return migrations[-1].VERSION if migrations else 0
+
+
+def current_version(conn) -> int:
+    if not inspect(conn).has_table("schema_version"):
+        return 0
+    return conn.execute(select(schema_version.c.version)).scalar() or 0
+
+
+def _set_version(conn, version: int):
+    _metadata.create_all(conn)
+    conn.execute(schema_version.delete())
+    conn.execute(schema_version.insert().values(version=version))
+
+
+def stamp(conn, version: Optional[int] = None):
+    """Marca la base con una versión sin correr migraciones (bases recién creadas)."""
+    _set_version(conn, head_version() if version is None else version)
+
+
+def upgrade(conn) -> List[int]:
+    """Aplica las migraciones pendientes y devuelve las versiones aplicadas."""
+    applied = []
+    version = current_version(conn)
+    for migration in load_migrations():
+        if migration.VERSION > version:
+            migration.upgrade(conn)
+            _set_version(conn, migration.VERSION)
+            applied.append(migration.VERSION)
+    return applied
@@ -0,0 +1,62 @@
+"""
+Operaciones idempotentes para usar dentro de las migraciones.
+"""
+from sqlalchemy import Column, Index, MetaData, Table, inspect, text
+from sqlalchemy.schema import CreateColumn
+
+
+def has_index(conn, table: str, name: str) -> bool:
+    return any(ix["name"] == name for ix in inspect(conn).get_indexes(table))
+
+
+def create_index(conn, table: str, name: str, *columns, unique: bool = False):
+    """
+    Crea el índice `name` sobre `table` si todavía no existe.
+    `columns` acepta nombres de columna o funciones que reciben la tabla reflejada
+    y devuelven una expresión (por ejemplo `lambda t: t.c.discardInt.desc()`).
+    """
+    if not inspect(conn).has_table(table) or has_index(conn, table, name):
+        return
+    reflected = Table(table, MetaData(), autoload_with=conn)
+    exprs = [reflected.c[col] if isinstance(col, str) else col(reflected) for col in columns]
+    Index(name, *exprs, unique=unique).create(conn)
+
+
+def drop_index(conn, table: str, name: str):
+    if not inspect(conn).has_table(table) or not has_index(conn, table, name):
+        return
+    reflected = Table(table, MetaData(), autoload_with=conn)
+    next(ix for ix in reflected.indexes if ix.name == name).drop(conn)
+
+
+def has_column(conn, table: str, name: str) -> bool:
+    return any(col["name"] == name for col in inspect(conn).get_columns(table))
+
+
+def add_column(conn, table: str, column: Column):
+    """ALTER TABLE ... ADD COLUMN si la columna todavía no existe."""
+    if not inspect(conn).has_table(table) or has_column(conn, table, column.name):
+        return
+    ddl = CreateColumn(column).compile(dialect=conn.dialect)
+    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {ddl}"))
+
+
+def add_foreign_key(conn, table: str, name: str, column: str, target: str):
+    """
+    Agrega una foreign key a una columna existente. SQLite no permite agregar
+    constraints con ALTER TABLE, así que ahí no hace nada.
+    """
+    if conn.dialect.name == "sqlite":
+        return
+    if any(fk["name"] == name for fk in inspect(conn).get_foreign_keys(table)):
+        return
+    target_table, target_column = target.split(".")
+    conn.execute(text(
+        f"ALTER TABLE {table} ADD CONSTRAINT {name} "
+        f"FOREIGN KEY ({column}) REFERENCES {target_table} ({target_column})"
+    ))
+
+
+def drop_table(conn, table: str):
+    if inspect(conn).has_table(table):
+        Table(table, MetaData()).drop(conn)
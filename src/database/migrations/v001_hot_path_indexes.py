@@ -0,0 +1,20 @@
+"""
+Índices compuestos para los filtros calientes sobre cards, secrets, players y games.
+"""
+from src.database.migrations.ops import create_index
+
+VERSION = 1
+
+
+def upgrade(conn):
+    # Mazo (pickup_a_card, replenish_draft_pile): game_id + zona de la carta
+    create_index(conn, "cards", "ix_cards_game_zone", "game_id", "dropped", "picked_up", "draft")
+    create_index(conn, "cards", "ix_cards_game_player_draft", "game_id", "player_id", "draft")
+    # Mano de un jugador (only_6, Player.cards)
+    create_index(conn, "cards", "ix_cards_player_dropped", "player_id", "dropped", "picked_up")
+    # Tope de la pila de descarte ordenado por discardInt
+    create_index(conn, "cards", "ix_cards_game_discard", "game_id", "dropped", lambda t: t.c.discardInt.desc())
+    create_index(conn, "cards", "ix_cards_game_draft", "game_id", "draft")
+    create_index(conn, "secrets", "ix_secrets_game_player", "game_id", "player_id")
+    create_index(conn, "players", "ix_players_game", "game_id")
+    create_index(conn, "games", "ix_games_status", "status")
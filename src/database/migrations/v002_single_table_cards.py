@@ -0,0 +1,33 @@
+"""
+Pasa las cartas a herencia de tabla única: las columnas de `detectives` y `events`
+se mueven a `cards` y las dos subtablas se eliminan.
+"""
+from sqlalchemy import Column, Integer, String, inspect, text
+from src.database.migrations.ops import add_column, add_foreign_key, drop_table
+
+VERSION = 2
+
+
+def upgrade(conn):
+    add_column(conn, "cards", Column("name", String(30)))
+    add_column(conn, "cards", Column("quantity_set", Integer))
+    add_column(conn, "cards", Column("set_id", Integer))
+    add_foreign_key(conn, "cards", "fk_cards_set_id", "set_id", "sets.set_id")
+
+    tables = inspect(conn).get_table_names()
+    if "detectives" in tables:
+        conn.execute(text(
+            "UPDATE cards SET "
+            "name = (SELECT d.name FROM detectives d WHERE d.card_id = cards.card_id), "
+            "quantity_set = (SELECT d.quantity_set FROM detectives d WHERE d.card_id = cards.card_id), "
+            "set_id = (SELECT d.set_id FROM detectives d WHERE d.card_id = cards.card_id) "
+            "WHERE type = 'detective'"
+        ))
+    if "events" in tables:
+        conn.execute(text(
+            "UPDATE cards SET "
+            "name = (SELECT e.name FROM events e WHERE e.card_id = cards.card_id) "
+            "WHERE type = 'event'"
+        ))
+    drop_table(conn, "detectives")
+    drop_table(conn, "events")
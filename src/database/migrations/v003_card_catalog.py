@@ -0,0 +1,20 @@
+"""
+Crea la tabla card_catalog (una fila por carta física) y la carga con el catálogo
+actual, para crear los mazos con INSERT ... SELECT.
+"""
+from sqlalchemy import Column, Integer, MetaData, String, Table
+from src.database.card_catalog import seed_card_catalog
+
+VERSION = 3
+
+
+def upgrade(conn):
+    catalog = Table(
+        "card_catalog", MetaData(),
+        Column("catalog_id", Integer, primary_key=True, autoincrement=True),
+        Column("type", String(15), nullable=False),
+        Column("name", String(30), nullable=False),
+        Column("quantity_set", Integer, nullable=True),
+    )
+    catalog.create(conn, checkfirst=True)
+    seed_card_catalog(conn, catalog)
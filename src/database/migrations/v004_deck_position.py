@@ -0,0 +1,28 @@
+"""
+Agrega cards.deck_position (orden de robo barajado una sola vez) y el índice para
+robar la posición más baja del mazo. Las cartas existentes reciben un orden
+aleatorio por partida.
+"""
+import random
+from collections import defaultdict
+from sqlalchemy import Column, Integer, text
+from src.database.migrations.ops import add_column, create_index, drop_index
+
+VERSION = 4
+
+
+def upgrade(conn):
+    add_column(conn, "cards", Column("deck_position", Integer))
+    # (game_id, player_id, draft) queda cubierto por el nuevo índice
+    drop_index(conn, "cards", "ix_cards_game_player_draft")
+    create_index(conn, "cards", "ix_cards_game_deck", "game_id", "player_id", "draft", "deck_position")
+
+    by_game = defaultdict(list)
+    for card_id, game_id in conn.execute(text("SELECT card_id, game_id FROM cards WHERE deck_position IS NULL")):
+        by_game[game_id].append(card_id)
+    positions = []
+    for card_ids in by_game.values():
+        random.shuffle(card_ids)
+        positions += [{"position": position, "card_id": card_id} for position, card_id in enumerate(card_ids)]
+    if positions:
+        conn.execute(text("UPDATE cards SET deck_position = :position WHERE card_id = :card_id"), positions)
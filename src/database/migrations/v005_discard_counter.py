@@ -0,0 +1,16 @@
+"""
+Agrega games.discard_seq, el contador de descarte por partida, y lo inicializa con
+el mayor discardInt que ya tenga cada partida.
+"""
+from sqlalchemy import Column, Integer, text
+from src.database.migrations.ops import add_column
+
+VERSION = 5
+
+
+def upgrade(conn):
+    add_column(conn, "games", Column("discard_seq", Integer, nullable=False, server_default="0"))
+    conn.execute(text(
+        "UPDATE games SET discard_seq = COALESCE("
+        "(SELECT MAX(c.discardInt) FROM cards c WHERE c.game_id = games.game_id), 0)"
+    ))
@@ -0,0 +1,22 @@
+"""
+Agrega players.hand_size y recalcula games.cards_left a partir de las cartas, para
+que los contadores que mantiene src/database/counters.py arranquen consistentes.
+"""
+from sqlalchemy import Column, Integer, text
+from src.database.migrations.ops import add_column
+
+VERSION = 6
+
+
+def upgrade(conn):
+    add_column(conn, "players", Column("hand_size", Integer, nullable=False, server_default="0"))
+    conn.execute(text(
+        "UPDATE players SET hand_size = (SELECT COUNT(*) FROM cards c "
+        "WHERE c.player_id = players.player_id AND c.picked_up = 1 AND c.dropped = 0)"
+    ))
+    # Las partidas sin cartas (sin iniciar) conservan cards_left en NULL
+    conn.execute(text(
+        "UPDATE games SET cards_left = (SELECT COUNT(*) FROM cards c WHERE c.game_id = games.game_id "
+        "AND c.picked_up = 0 AND c.dropped = 0 AND c.draft = 0) "
+        "WHERE EXISTS (SELECT 1 FROM cards c WHERE c.game_id = games.game_id)"
+    ))
@@ -0,0 +1,29 @@
+"""
+Agrega games.finished_at con su índice para elegir las partidas a archivar, y la
+tabla archived_games donde src/database/archive.py mueve las partidas terminadas.
+"""
+from sqlalchemy import JSON, Column, DateTime, Index, Integer, MetaData, String, Table
+from src.database.migrations.ops import add_column, create_index
+
+VERSION = 7
+
+
+def upgrade(conn):
+    # Las partidas terminadas antes de esta migración quedan con finished_at en NULL y se archivan en la primera pasada
+    add_column(conn, "games", Column("finished_at", DateTime, nullable=True))
+    create_index(conn, "games", "ix_games_status_finished", "status", "finished_at")
+    archived = Table(
+        "archived_games", MetaData(),
+        Column("archive_id", Integer, primary_key=True, autoincrement=True),
+        Column("game_id", Integer, nullable=False),
+        Column("name", String(30), nullable=False),
+        Column("max_players", Integer, nullable=False),
+        Column("min_players", Integer, nullable=False),
+        Column("players_amount", Integer, nullable=False),
+        Column("finished_at", DateTime, nullable=True),
+        Column("archived_at", DateTime, nullable=False),
+        Column("snapshot", JSON, nullable=False),
+        Index("ix_archived_games_archived_at", "archived_at"),
+        Index("ix_archived_games_game", "game_id"),
+    )
+    archived.create(conn, checkfirst=True)
@@ -0,0 +1,12 @@
+"""
+Agrega games.seed, la semilla de los barajados de cada partida (src/database/game_rng.py).
+Las partidas existentes quedan en NULL y reciben una semilla la próxima vez que se barajan.
+"""
+from sqlalchemy import BigInteger, Column
+from src.database.migrations.ops import add_column
+
+VERSION = 8
+
+
+def upgrade(conn):
+    add_column(conn, "games", Column("seed", BigInteger, nullable=True))
@@ -0,0 +1,27 @@
+"""
+Agrega la tabla game_actions (registro de acciones de cada partida) y games.action_seq,
+el contador con el que se numeran (ver src/gameState/action_log.py).
+"""
+from sqlalchemy import JSON, Column, DateTime, ForeignKey, Index, Integer, MetaData, String, Table
+from src.database.migrations.ops import add_column
+
+VERSION = 9
+
+
+def upgrade(conn):
+    add_column(conn, "games", Column("action_seq", Integer, nullable=False, server_default="0"))
+    metadata = MetaData()
+    Table("games", metadata, Column("game_id", Integer, primary_key=True))
+    actions = Table(
+        "game_actions", metadata,
+        Column("action_id", Integer, primary_key=True, autoincrement=True),
+        Column("game_id", Integer, ForeignKey("games.game_id"), nullable=False),
+        Column("seq", Integer, nullable=False),
+        Column("action", String(30), nullable=False),
+        Column("player_id", Integer, nullable=True),
+        Column("data", JSON, nullable=False),
+        Column("changes", JSON, nullable=False),
+        Column("created_at", DateTime, nullable=False),
+        Index("ix_game_actions_game_seq", "game_id", "seq", unique=True),
+    )
+    actions.create(conn, checkfirst=True)
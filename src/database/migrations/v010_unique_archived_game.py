@@ -0,0 +1,19 @@
+"""
+archived_games.game_id pasa a ser único: dos archivadores concurrentes no pueden
+guardar la misma partida dos veces. Los duplicados que ya haya (misma partida
+archivada por dos workers) se borran dejando el primero.
+"""
+from sqlalchemy import text
+from src.database.migrations.ops import create_index, drop_index
+
+VERSION = 10
+
+
+def upgrade(conn):
+    # Tabla derivada: MySQL no deja leer en un subquery la tabla de la que se borra
+    conn.execute(text(
+        "DELETE FROM archived_games WHERE archive_id NOT IN "
+        "(SELECT archive_id FROM (SELECT MIN(archive_id) AS archive_id FROM archived_games GROUP BY game_id) AS firsts)"
+    ))
+    drop_index(conn, "archived_games", "ix_archived_games_game")
+    create_index(conn, "archived_games", "uq_archived_games_game", "game_id", unique=True)
@@ -1,6 +1,8 @@
-from sqlalchemy import Column, ForeignKey, Integer, String, Boolean, CheckConstraint , DateTime, Text, JSON, Date 
+from sqlalchemy import BigInteger, Column, ForeignKey, Integer, String, Boolean, CheckConstraint , DateTime, Text, JSON, Date, Index, event
 from sqlalchemy.orm import relationship
 from src.database.database import Base
+from src.database.card_catalog import seed_card_catalog
+from src.database.game_rng import new_seed
 import datetime
 import uuid
 
@@ -14,12 +16,26 @@ class Game(Base):
     min_players = Column(Integer, nullable=False)
     players_amount = Column(Integer,nullable = False)
     current_turn = Column(Integer, nullable = True)
-    cards_left = Column(Integer , nullable=True)
+    cards_left = Column(Integer , nullable=True) # Cartas en el mazo, lo mantiene counters.py
+    # Último discardInt usado en la partida; se avanza con un UPDATE atómico (reserve_discard_order)
+    discard_seq = Column(Integer, nullable=False, default=0, server_default="0")
+    # Momento en que terminó la partida; el archivado (src/database/archive.py) la mueve después de un tiempo
+    finished_at = Column(DateTime, nullable=True)
+    # Semilla de todos los barajados y repartos de la partida (src/database/game_rng.py)
+    seed = Column(BigInteger, nullable=True, default=new_seed)
+    # Último seq del registro de acciones (game_actions); se avanza con un UPDATE atómico
+    action_seq = Column(Integer, nullable=False, default=0, server_default="0")
     players = relationship("Player", back_populates="game")
     cards = relationship("Card", back_populates="game")
     secrets = relationship("Secrets", back_populates="game")
     sets = relationship("Set" , back_populates="game")
 
+    __table_args__ = (
+        Index("ix_games_status", "status"),
+        Index("ix_games_status_finished", "status", "finished_at"),
+        # Sin AUTOINCREMENT SQLite reusa el id más alto si se borra (archivado): archived_games.game_id es único
+        {"sqlite_autoincrement": True},
+    )
 
 class Player(Base):
     __tablename__ = 'players'
@@ -29,12 +45,17 @@ class Player(Base):
     birth_date = Column(Date, nullable = False)
     turn_order = Column(Integer) # Posición del jugador en el turno
     avatar = Column(String(255), nullable = True)
+    hand_size = Column(Integer, nullable=False, default=0, server_default="0") # Cartas levantadas y no descartadas (counters.py)
     game_id = Column(Integer, ForeignKey("games.game_id"), nullable=False)  
     game = relationship("Game", back_populates="players")
     cards = relationship("Card",primaryjoin="and_(Card.player_id == Player.player_id, Card.dropped == False)", back_populates="player")
     secrets = relationship("Secrets", back_populates="player")
     sets = relationship("Set" , back_populates="player")
 
+    __table_args__ = (
+        Index("ix_players_game", "game_id"),
+    )
+
 class Card(Base):
     __tablename__ = 'cards'
     card_id = Column(Integer, primary_key=True, autoincrement=True)
@@ -47,16 +68,28 @@ class Card(Base):
     game = relationship("Game", back_populates="cards")
     draft = Column(Boolean, default=False)
     discardInt = Column(Integer, default=0)
+    name = Column(String(30))
+    # Orden de robo: se baraja una vez al iniciar la partida y se roba la posición más baja
+    deck_position = Column(Integer, nullable=True)
+
+    # Índices pensados para los filtros que más se repiten (mazo, mano, draft y descarte).
+    # Cualquier cambio acá tiene que ir acompañado de una migración en src/database/migrations.
+    __table_args__ = (
+        Index("ix_cards_game_zone", "game_id", "dropped", "picked_up", "draft"),
+        Index("ix_cards_game_deck", "game_id", "player_id", "draft", "deck_position"),
+        Index("ix_cards_player_dropped", "player_id", "dropped", "picked_up"),
+        Index("ix_cards_game_discard", "game_id", "dropped", discardInt.desc()),
+        Index("ix_cards_game_draft", "game_id", "draft"),
+    )
 
     __mapper_args__ = {
         'polymorphic_on': type,
         'polymorphic_abstract': True  
     }
 
+# Detective y Event comparten la tabla cards (herencia de tabla única): cargar una mano,
+# el descarte o el draft es una sola consulta sobre cards, sin joins a subtablas.
 class Detective(Card):
-    __tablename__ ='detectives'
-    name = Column(String(30))
-    card_id = Column(Integer, ForeignKey('cards.card_id'), primary_key=True)
     quantity_set = Column(Integer)
     set_id = Column(Integer , ForeignKey("sets.set_id"), nullable=True)
     set = relationship("Set" , back_populates="detective")
@@ -66,14 +99,59 @@ class Detective(Card):
     }
 
 class Event(Card):
-    __tablename__ ='events'
-    name = Column(String(30))
-    card_id = Column(Integer, ForeignKey('cards.card_id'), primary_key=True)
 
     __mapper_args__ = {
         'polymorphic_identity': 'event'
     }
 
+# Una fila por carta física del mazo. El mazo de cada partida se crea copiándola
+# con INSERT ... SELECT (ver init_detective_cards / init_event_cards).
+class CardCatalog(Base):
+    __tablename__ = 'card_catalog'
+    catalog_id = Column(Integer, primary_key=True, autoincrement=True)
+    type = Column(String(15), nullable=False)
+    name = Column(String(30), nullable=False)
+    quantity_set = Column(Integer, nullable=True)
+
+# El catálogo se carga apenas se crea la tabla (create_all o migración)
+event.listen(CardCatalog.__table__, "after_create", lambda target, connection, **kw: seed_card_catalog(connection, target))
+
+# Partidas terminadas fuera de las tablas vivas: una fila por partida con sus jugadores,
+# cartas, secretos y sets en `snapshot` (ver src/database/archive.py).
+class ArchivedGame(Base):
+    __tablename__ = 'archived_games'
+    archive_id = Column(Integer, primary_key=True, autoincrement=True)
+    game_id = Column(Integer, nullable=False) # El id que tenía en games (único: se archiva una sola vez)
+    name = Column(String(30), nullable=False)
+    max_players = Column(Integer, nullable=False)
+    min_players = Column(Integer, nullable=False)
+    players_amount = Column(Integer, nullable=False)
+    finished_at = Column(DateTime, nullable=True)
+    archived_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+    snapshot = Column(JSON, nullable=False)
+
+    __table_args__ = (
+        Index("ix_archived_games_archived_at", "archived_at"),
+        Index("uq_archived_games_game", "game_id", unique=True),
+    )
+
+# Registro de acciones de cada partida, solo de agregado: cada acción se escribe en la
+# misma transacción que sus cambios, con las filas que tocó (ver src/gameState/action_log.py).
+class GameAction(Base):
+    __tablename__ = 'game_actions'
+    action_id = Column(Integer, primary_key=True, autoincrement=True)
+    game_id = Column(Integer, ForeignKey("games.game_id"), nullable=False)
+    seq = Column(Integer, nullable=False) # Orden dentro de la partida, igual al orden de commit
+    action = Column(String(30), nullable=False)
+    player_id = Column(Integer, nullable=True) # Sin FK: el log sobrevive a los jugadores
+    data = Column(JSON, nullable=False)
+    changes = Column(JSON, nullable=False) # [[tipo, tabla, pk, valores], ...]
+    created_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_game_actions_game_seq", "game_id", "seq", unique=True),
+    )
+
 class Secrets(Base):
     __tablename__  = 'secrets'
     secret_id = Column(Integer, primary_key=True, autoincrement=True)
@@ -85,6 +163,9 @@ class Secrets(Base):
     game_id = Column(Integer, ForeignKey("games.game_id"), nullable=False)  
     game = relationship("Game", back_populates="secrets")
 
+    __table_args__ = (
+        Index("ix_secrets_game_player", "game_id", "player_id"),
+    )
     
 class Set(Base):
     __tablename__ = 'sets'
@@ -97,3 +178,5 @@ class Set(Base):
     detective = relationship("Detective" , back_populates="set")
 
 
+# Registra los listeners que mantienen players.hand_size y games.cards_left
+import src.database.counters  # noqa: E402,F401
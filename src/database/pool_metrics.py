@@ -0,0 +1,188 @@
+"""
+Telemetría del pool de conexiones.
+
+`instrument(engine)` registra listeners de checkout/checkin y, si el pool es
+`InstrumentedQueuePool`, mide cuánto espera cada checkout. `poolMetrics.snapshot()`
+junta conexiones en uso, histograma de espera, overflow, timeouts y los checkouts
+retenidos más largos con la ruta que los tomó (la marca `RouteTagMiddleware`).
+Se expone en GET /metrics/db-pool y se loguea cada `DB_POOL_LOG_INTERVAL` segundos.
+"""
+import asyncio
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from typing import Optional
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger(__name__)
+
+# Scope ASGI del request que está usando la base (None en tareas de fondo)
+_current_scope: ContextVar[Optional[dict]] = ContextVar("db_pool_scope", default=None)
+
+# Límites superiores (ms) de los buckets del histograma de espera
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+
+def current_route() -> str:
+    scope = _current_scope.get()
+    if scope is None:
+        return "background"
+    # FastAPI deja la ruta en el scope después del ruteo: se agrupa por plantilla y no por path
+    path = getattr(scope.get("route"), "path", None) or scope.get("path")
+    return f"{scope.get('method', 'WS')} {path}"
+
+
+class RouteTagMiddleware:
+    """Middleware ASGI que deja el scope en un ContextVar para atribuir cada checkout a su ruta."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            return await self.app(scope, receive, send)
+        token = _current_scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current_scope.reset(token)
+
+
+class PoolMetrics:
+    def __init__(self, slow_checkout_ms: int = 5000):
+        self.slow_checkout_ms = slow_checkout_ms
+        self._lock = threading.Lock()
+        # id del connection record -> (inicio del checkout, ruta)
+        self._held = {}
+        self.reset()
+
+    def reset(self):
+        """Pone los contadores en cero (los checkouts en curso se siguen midiendo)."""
+        with self._lock:
+            self.checkouts = 0
+            self.overflow_hits = 0
+            self.timeouts = 0
+            self.wait_count = 0
+            self.wait_total = 0.0
+            self.wait_max = 0.0
+            self.wait_histogram = [0] * (len(WAIT_BUCKETS_MS) + 1)
+            self.longest = {"route": None, "ms": 0.0}
+
+    def record_wait(self, seconds: float, timed_out: bool = False):
+        ms = seconds * 1000
+        with self._lock:
+            self.wait_count += 1
+            self.wait_total += ms
+            self.wait_max = max(self.wait_max, ms)
+            bucket = next((i for i, limit in enumerate(WAIT_BUCKETS_MS) if ms <= limit), len(WAIT_BUCKETS_MS))
+            self.wait_histogram[bucket] += 1
+            if timed_out:
+                self.timeouts += 1
+        if timed_out:
+            logger.warning("Timeout esperando una conexión del pool (%.0f ms) en %s", ms, current_route())
+
+    def on_checkout(self, key, overflow: bool):
+        with self._lock:
+            self.checkouts += 1
+            if overflow:
+                self.overflow_hits += 1
+            self._held[key] = (time.perf_counter(), current_route())
+
+    def on_checkin(self, key):
+        with self._lock:
+            held = self._held.pop(key, None)
+            if held is None:
+                return
+            ms = (time.perf_counter() - held[0]) * 1000
+            if ms > self.longest["ms"]:
+                self.longest = {"route": held[1], "ms": round(ms, 1)}
+        if ms > self.slow_checkout_ms:
+            logger.warning("Conexión retenida %.0f ms por %s", ms, held[1])
+
+    def snapshot(self, pool=None) -> dict:
+        now = time.perf_counter()
+        with self._lock:
+            held = sorted(((now - start) * 1000, route) for start, route in self._held.values())[::-1]
+            labels = [f"<={limit}" for limit in WAIT_BUCKETS_MS] + [f">{WAIT_BUCKETS_MS[-1]}"]
+            data = {
+                "checkouts": self.checkouts,
+                "overflow_hits": self.overflow_hits,
+                "timeouts": self.timeouts,
+                "wait_ms": {
+                    "count": self.wait_count,
+                    "avg": round(self.wait_total / self.wait_count, 2) if self.wait_count else 0.0,
+                    "max": round(self.wait_max, 2),
+                    "histogram": dict(zip(labels, self.wait_histogram)),
+                },
+                "held": {
+                    "count": len(held),
+                    "current": [{"route": route, "ms": round(ms, 1)} for ms, route in held[:5]],
+                    "longest": dict(self.longest),
+                },
+            }
+        if pool is not None:
+            data["pool"] = pool_status(pool)
+        return data
+
+
+def pool_status(pool) -> dict:
+    """Configuración y ocupación actual del pool (los pools de SQLite no tienen overflow)."""
+    status = {"class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update(size=pool.size(), max_overflow=pool._max_overflow, timeout=pool.timeout(),
+                      checked_out=pool.checkedout(), checked_in=pool.checkedin(), overflow=max(pool.overflow(), 0))
+    return status
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool que informa cuánto esperó cada checkout y los timeouts."""
+    metrics: Optional[PoolMetrics] = None
+
+    def _do_get(self):
+        if self.metrics is None:
+            return super()._do_get()
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        self.metrics.record_wait(time.perf_counter() - start)
+        return connection
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+def instrument(engine, metrics: PoolMetrics):
+    """Conecta `metrics` al pool del engine."""
+    if isinstance(engine.pool, InstrumentedQueuePool):
+        engine.pool.metrics = metrics
+
+    @event.listens_for(engine, "checkout")
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        pool = engine.pool
+        overflow = isinstance(pool, QueuePool) and pool.checkedout() > pool.size()
+        metrics.on_checkout(id(connection_record), overflow)
+
+    @event.listens_for(engine, "checkin")
+    def _checkin(dbapi_connection, connection_record):
+        metrics.on_checkin(id(connection_record))
+
+    return metrics
+
+
+async def log_pool_metrics(engine, metrics: PoolMetrics, interval: int):
+    """Tarea de fondo del lifespan: una línea de log con el estado del pool cada `interval` segundos."""
+    while True:
+        await asyncio.sleep(interval)
+        data = metrics.snapshot(engine.pool)
+        logger.info("Pool de conexiones: %s checkouts, %s en uso, espera avg %s ms / max %s ms, "
+                    "%s overflow, %s timeouts, más larga %s ms (%s)",
+                    data["checkouts"], data["held"]["count"],
+                    data["wait_ms"]["avg"], data["wait_ms"]["max"], data["overflow_hits"], data["timeouts"],
+                    data["held"]["longest"]["ms"], data["held"]["longest"]["route"])
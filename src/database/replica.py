@@ -0,0 +1,79 @@
+"""
+Ruteo de lecturas a una réplica.
+
+`ReplicaSession` es la sesión de las rutas de solo lectura (`get_read_db`) y de las
+lecturas de los broadcasts (`ReadSessionLocal`): consulta la réplica salvo que el
+request actual ya haya escrito algo en el primario. En ese caso lee del primario,
+así quien hizo la acción (y los broadcasts que dispara) ve su propia escritura aunque
+la réplica todavía no la tenga. Un flush desde una ReplicaSession también va al primario.
+
+Para saber si el request escribió, `ReadYourWritesMiddleware` deja un marcador por
+request en un ContextVar y los listeners de sesión lo marcan en cada flush o sentencia
+masiva. El marcador es un objeto mutable: run_db corre en el threadpool con una copia
+del contexto, y la marca tiene que volver al request.
+"""
+from contextvars import ContextVar
+from typing import Optional
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+class _RequestWrites:
+    __slots__ = ("wrote",)
+
+    def __init__(self):
+        self.wrote = False
+
+
+_request_writes: ContextVar[Optional[_RequestWrites]] = ContextVar("request_writes", default=None)
+
+
+def wrote_in_request() -> bool:
+    marker = _request_writes.get()
+    return marker is not None and marker.wrote
+
+
+def mark_write():
+    marker = _request_writes.get()
+    if marker is not None:
+        marker.wrote = True
+
+
+class ReadYourWritesMiddleware:
+    """Middleware ASGI: un marcador de escrituras nuevo por request o WebSocket."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            return await self.app(scope, receive, send)
+        token = _request_writes.set(_RequestWrites())
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_writes.reset(token)
+
+
+class ReplicaSession(Session):
+    """Sesión ligada a la réplica que vuelve al primario (`primary`) cuando el request escribió."""
+
+    def __init__(self, *args, primary=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.primary = primary
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self.primary is not None and (self._flushing or wrote_in_request()):
+            return self.primary
+        return super().get_bind(mapper=mapper, clause=clause, **kwargs)
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_flush(session, flush_context):
+    mark_write()
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_bulk(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        mark_write()
@@ -1,22 +1,99 @@
-import random
+from collections import Counter
 from fastapi import Depends
-from src.database.database import SessionLocal, get_db
+from src.database.database import SessionLocal, get_db, commit_or_flush
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
 from fastapi import HTTPException
-from src.database.models import Player, Card , Detective , Event, Game
+from sqlalchemy import Integer, false, insert, literal, select, update
+from src.database.models import Player, Card , Detective , Event, Game, CardCatalog
+from src.database.card_catalog import DETECTIVES_INFO, EVENTS_INFO
+from src.database.counters import adjust_counters, deck_of, hand_of
+from src.database.game_rng import rng_for_game
+from src.gameState.game_state import GAME_ID_OPTION, SYNCED_OPTION, gameStateManager, attach, record
+
+def shuffle_deck(game_id: int, db: Session, commit: bool = True, rng=None):
+    """
+    Baraja el mazo una sola vez al iniciar la partida: cada carta recibe su
+    deck_position y de ahí en más robar es tomar la posición más baja.
+    Sin `rng` usa el flujo "deck" de la semilla de la partida.
+    """
+    rng = rng or rng_for_game(db, game_id, "deck")
+    card_ids = [card_id for card_id, in db.query(Card.card_id).filter(Card.game_id == game_id).order_by(Card.card_id)]
+    rng.shuffle(card_ids)
+    try:
+        if card_ids:
+            db.execute(update(Card), [{"card_id": card_id, "deck_position": position}
+                                      for position, card_id in enumerate(card_ids)],
+                       execution_options={GAME_ID_OPTION: game_id})
+        commit_or_flush(db, commit)
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Ocurrió un error al barajar el mazo: {str(e)}")
+    return {"message": f"Se barajaron {len(card_ids)} cartas."}
+
+
+def draw_from_deck(game_id: int, db: Session, amount: int = 1):
+    """Las `amount` cartas de arriba del mazo (sin dueño, fuera del draft y del descarte), por índice."""
+    return db.query(Card).filter(
+        Card.game_id == game_id,
+        Card.player_id.is_(None),
+        Card.draft == False,
+        Card.dropped.is_not(True)
+    ).order_by(Card.deck_position, Card.card_id).limit(amount).all()
+
+
+def claim_from_deck(db: Session, state, cards=None, **values):
+    """
+    Roba la primera carta del mazo (o de `cards`, un iterador sobre el mazo para robar
+    varias seguidas) que siga libre en la base y le escribe `values`.
+    El UPDATE es condicional (sin dueño, sin levantar, sin descartar y fuera del draft):
+    si un request concurrente ya se la llevó no cambia ninguna fila y se prueba con la
+    siguiente, así dos robos nunca reciben la misma carta. Devuelve la carta adjunta a la
+    sesión con los valores escritos, o None si el mazo se vació.
+    """
+    for row in state.deck() if cards is None else cards:
+        result = db.execute(
+            # Las columnas booleanas de cartas viejas pueden ser NULL: IS NOT TRUE como `not` en memoria
+            update(Card).where(Card.card_id == row.card_id, Card.player_id.is_(None), Card.picked_up.is_not(True),
+                               Card.dropped.is_not(True), Card.draft.is_not(True)).values(**values),
+            execution_options={SYNCED_OPTION: True, "synchronize_session": False})
+        if result.rowcount != 1:
+            continue
+        record(db, Card, row.card_id, **values)
+        # La sentencia no pasa por el flush: los contadores se ajustan a mano
+        before = {"game_id": state.game_id, "player_id": None, "picked_up": False, "dropped": False, "draft": False}
+        after = {**before, **values}
+        adjust_counters(db, hands=Counter({hand_of(after): 1}),
+                        decks=Counter({deck_of(before): -1, deck_of(after): 1}))
+        card = attach(db, row)
+        for field, value in values.items():
+            set_committed_value(card, field, value)
+        return card
+    return None
+
+
+def reserve_discard_order(game_id: int, amount: int, db: Session) -> int:
+    """
+    Avanza el contador de descarte de la partida en `amount` con un UPDATE atómico
+    y devuelve el primer discardInt reservado. Dos descartes concurrentes nunca
+    reciben el mismo valor: el UPDATE bloquea la fila de la partida hasta el commit.
+    """
+    stmt = update(Game).where(Game.game_id == game_id).values(discard_seq=Game.discard_seq + amount)
+    options = {SYNCED_OPTION: True, "synchronize_session": False}
+    if db.get_bind().dialect.update_returning:
+        last = db.execute(stmt.returning(Game.discard_seq), execution_options=options).scalar_one()
+    else:
+        db.execute(stmt, execution_options=options)
+        last = db.query(Game.discard_seq).filter(Game.game_id == game_id).scalar()
+    record(db, Game, game_id, discard_seq=last)
+    return last - amount + 1
+
 
 def setup_initial_draft_pile(game_id: int, db: Session):
     """
     Selecciona las primeras 3 cartas del mazo para formar el draft pile inicial.
     """
-    deck = db.query(Card).filter(
-        Card.game_id == game_id, 
-        Card.player_id.is_(None),
-        Card.draft == False
-    ).all()
-    random.shuffle(deck)
-
-    for card in deck[:3]: # solo lo hace 3 veces 
+    for card in draw_from_deck(game_id, db, 3): # solo lo hace 3 veces 
         card.draft = True
     
     # El commit se hará en la ruta que llama a esta función.
@@ -26,25 +103,19 @@ def replenish_draft_pile(game_id: int, db: Session):
     """
     Repone una carta en el draft pile desde el mazo principal.
     """
-    game = db.query(Game).filter(Game.game_id == game_id).first()
-    deck = db.query(Card).filter(
-        Card.game_id == game_id,
-        Card.player_id.is_(None),
-        Card.draft == False
-    ).all()
-    random.shuffle(deck)
-     
-    deck[0].draft = True
-    game.cards_left = game.cards_left -1
+    state = gameStateManager.load(db, game_id)
     # Si no hay cartas, el draft pile simplemente se achicará. No es un error.
-    return deck[0] if deck else None
+    if state is None or not state.deck():
+        return None
+    return claim_from_deck(db, state, draft=True)
 
-def deal_NSF(game_id: int , db:Session):
+def deal_NSF(game_id: int , db:Session, commit: bool = True, rng=None):
 
-    nsf = db.query(Event).filter(Event.name == "Not so fast" , Event.game_id == game_id).all()
-    players = db.query(Player).filter(Player.game_id == game_id).all()
+    rng = rng or rng_for_game(db, game_id, "nsf")
+    nsf = db.query(Event).filter(Event.name == "Not so fast" , Event.game_id == game_id).order_by(Event.card_id).all()
+    players = db.query(Player).filter(Player.game_id == game_id).order_by(Player.player_id).all()
 
-    random.shuffle(nsf)
+    rng.shuffle(nsf)
     try:
         # Asignar 6 cartas a cada jugador.
         nsf_cursor = 0
@@ -53,7 +124,7 @@ def deal_NSF(game_id: int , db:Session):
             nsf_to_deal.player_id = player.player_id
             nsf_to_deal.picked_up = True
             nsf_cursor += 1
-        db.commit()
+        commit_or_flush(db, commit)
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Ocurrió un error al repartir las cartas: {str(e)}")
@@ -62,23 +133,16 @@ def deal_NSF(game_id: int , db:Session):
 
 
 
-def deal_cards_to_players(game_id: int, db: Session):
+def deal_cards_to_players(game_id: int, db: Session, commit: bool = True):
     """
     Reparte 6 cartas aleatorias a cada jugador en una partida específica.
     """
     # Obtener todos los jugadores de la partida.
-    players = db.query(Player).filter(Player.game_id == game_id).all()
+    players = db.query(Player).filter(Player.game_id == game_id).order_by(Player.player_id).all()
     num_players = len(players)
 
-    # Obtener todas las cartas disponibles (las que no tienen un player_id asignado).
-    deck = db.query(Card).filter(Card.game_id == game_id, Card.player_id == None).all()
-    # se supone que esto se llama cuando arranca la partida asiq todo va a estar en None
-
-    #se podria chequear con la cantidad de cartas y ver que el tamano de la lista 
-    # y cartas sea la misma, sino error
-
-    # barajar las cartas 
-    random.shuffle(deck)
+    # Las cartas de arriba del mazo ya barajado (las que no tienen un player_id asignado)
+    deck = draw_from_deck(game_id, db, 5 * num_players)
     try:
         card_cursor = 0
         for player in players : 
@@ -89,7 +153,7 @@ def deal_cards_to_players(game_id: int, db: Session):
                 card_to_deal.picked_up = True
                 card_cursor += 1
         # Confirmar todos los cambios en la base de datos
-        db.commit()
+        commit_or_flush(db, commit)
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Ocurrió un error al repartir las cartas: {str(e)}")
@@ -97,89 +161,51 @@ def deal_cards_to_players(game_id: int, db: Session):
     return {"message": f"Se repartieron 6 cartas a {num_players} jugadores en la partida {game_id}."}
 
 
-def init_detective_cards(game_id: int, db: Session = Depends(get_db)):
-    detectives_info = [
-        ("Harley Quin Wildcard", 4 , 1),
-        ("Adriane Oliver", 3 , 1),
-        ("Miss Marple", 3 , 3),
-        ("Parker Pyne", 3 , 2),
-        ("Tommy Beresford", 2 , 2),
-        ("Lady Eileen 'Bundle' Brent", 3 , 2),
-        ("Tuppence Beresford", 2 , 2),
-        ("Hercule Poirot", 3 , 3),
-        ("Mr Satterthwaite", 2 , 2),
-    ]
-
-    new_cards_list = []
-    for name, quantity, quantity_set in detectives_info:
-        for _ in range(quantity):
-            new_card_instance = Detective(
-                type="detective",
-                name=name,
-                picked_up=False,
-                dropped=False,
-                player_id=None,
-                game_id=game_id,
-                quantity_set = quantity_set,
-                set_id = None,
-
-            )
-            new_cards_list.append(new_card_instance)
-
+def _insert_deck_cards(game_id: int, card_type: str, db: Session) -> int:
+    """
+    Copia al mazo de la partida las cartas de `card_type` del catálogo con un solo
+    INSERT ... SELECT. Devuelve la cantidad de cartas creadas y las suma a cards_left.
+    """
+    catalog = CardCatalog.__table__
+    stmt = insert(Card.__table__).from_select(
+        ["type", "name", "quantity_set", "picked_up", "dropped", "game_id", "draft", "discardInt"],
+        select(catalog.c.type, catalog.c.name, catalog.c.quantity_set, false(), false(),
+               literal(game_id, Integer), false(), literal(0, Integer))
+        .where(catalog.c.type == card_type)
+        .order_by(catalog.c.catalog_id),
+    )
+    created = db.execute(stmt, execution_options={GAME_ID_OPTION: game_id}).rowcount
+    adjust_counters(db, decks={game_id: created})
+    return created
+
+def init_detective_cards(game_id: int, db: Session = Depends(get_db), commit: bool = True):
     try:
-        db.add_all(new_cards_list)
-        db.commit()
+        created = _insert_deck_cards(game_id, "detective", db)
+        commit_or_flush(db, commit)
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=400, detail=f"Error creating detective cards: {str(e)}")
     
-    return {"message": f"{len(new_cards_list)} detective cards created successfully"}
-
-def init_event_cards(game_id: int, db: Session = Depends(get_db)):
-    events_info = [
-        ("Delay the murderer's escape!", 3),
-        ("Point your suspicions", 3),
-        ("Dead card folly", 3),
-        ("Another Victim", 2),
-        ("Look into the ashes", 3),
-        ("Card trade", 3),
-        ("And then there was one more...", 2),
-        ("Early train to paddington", 2),
-        ("Cards off the table", 1),
-        ("Not so fast" , 10) ,
-        ("Social Faux Pas" , 3) ,
-        ("Blackmailed" , 1)
-    ]
-
-    new_events_list = []
-    for name, quantity in events_info:
-        for _ in range(quantity):
-            new_event_instance = Event(
-                type="event",
-                name=name,
-                picked_up=False,
-                dropped=False,
-                player_id=None,
-                game_id=game_id
-            )
-            new_events_list.append(new_event_instance)
+    return {"message": f"{created} detective cards created successfully"}
 
+def init_event_cards(game_id: int, db: Session = Depends(get_db), commit: bool = True):
     try:
-        db.add_all(new_events_list)
-        db.commit()
+        created = _insert_deck_cards(game_id, "event", db)
+        commit_or_flush(db, commit)
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=400, detail=f"Error creating event cards: {str(e)}")
     
-    return {"message": f"{len(new_events_list)} event cards created successfully"}
+    return {"message": f"{created} event cards created successfully"}
 
 
 def only_6 (player_id , db: Session = Depends(get_db)):
-    cartas_levantadas = db.query(Card).filter(
-        Card.player_id == player_id,
-        Card.picked_up == True,
-        Card.dropped == False
-    ).count()
+    # El tamaño de la mano es un contador (players.hand_size): no se cuentan cartas
+    game_id = gameStateManager.game_of(Player, player_id)
+    state = gameStateManager.get(game_id) if game_id is not None else None
+    if state is not None:
+        return state.hand_size(player_id) >= 6
+    cartas_levantadas = db.query(Player.hand_size).filter(Player.player_id == player_id).scalar() or 0
     if cartas_levantadas >= 6:
         return True
     else:
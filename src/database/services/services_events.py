@@ -1,4 +1,3 @@
-import random
 from fastapi import Depends
 from sqlalchemy import desc, func
 from src.database.database import SessionLocal, get_db
@@ -7,20 +6,25 @@ from fastapi import HTTPException
 from src.database.models import Player, Card , Detective , Event, Secrets, Game, Set
 from src.database.services.services_games import finish_game
 from src.database.services.services_secrets import steal_secret as steal_secret_service
+from src.database.services.services_cards import claim_from_deck, reserve_discard_order
+from src.gameState.game_state import gameStateManager, attach
+from src.gameState.action_log import log_action
 from typing import List 
 
 def cards_off_table(player_id: int, db: Session):
     """
     descarta las cartas not so fast de un jugador
     """
-    nsf = db.query(Event).filter(Event.name == "Not so fast", Event.player_id == player_id, Event.dropped == False).all()
+    state = gameStateManager.load_for(db, Player, player_id)
+    nsf = [c for c in state.hand(player_id) if c.type == "event" and c.name == "Not so fast"] if state else []
 
     if not nsf:
         # No hay cartas "Not so fast" para este jugador, no hay nada que hacer
         return {"message": "No 'Not so fast' cards found for this player to discard."}
     try:
         for event in nsf:
-            event.dropped = True        
+            attach(db, event).dropped = True        
+        log_action(db, state.game_id, "event", player_id, event="cards_off_table", card_ids=[c.card_id for c in nsf])
         db.commit() # se descartan las cartas nsf del jugador
     except Exception as e:
         db.rollback() 
@@ -33,17 +37,19 @@ def look_into_ashes(player_id: int, card_id: int, db: Session):
     cartas del descarte. entonces en el endpoint que llama esta funcion solo elije una de esas 5 cartas
     y le cambio dueno y dropped por true
     """
-    card = db.query(Card).filter(Card.card_id == card_id, Card.dropped == True).first()
-    if not card:
+    state = gameStateManager.load_for(db, Card, card_id)
+    taken = state.cards[card_id] if state else None
+    if not taken or not taken.dropped:
         raise HTTPException(status_code=404, detail="Card not found.")
     try:
+        card = attach(db, taken)
         card.dropped = False
         card.player_id = player_id
         card.discardInt = 0 #la carta vuelve a estar en juego
         card.picked_up=True
+        log_action(db, state.game_id, "event", player_id, event="look_into_ashes", card_id=card_id)
         db.commit()
-        db.refresh(card)
-        return card 
+        return card
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=400, detail=f"Error assigning card to player: {str(e)}")
@@ -54,6 +60,9 @@ def one_more(receive_secret_player_id: int, secret_id: int, db: Session):
     including your own. This may remove social disgrace.
     """
     try:
+        secret = gameStateManager.row(Secrets, secret_id)
+        if secret is not None:
+            log_action(db, secret.game_id, "event", receive_secret_player_id, event="one_more", secret_id=secret_id)
         stolen_secret = steal_secret_service(receive_secret_player_id, secret_id, db)
         return stolen_secret
     except HTTPException as e:
@@ -109,7 +118,8 @@ def early_train_paddington(game_id: int, db: Session):
     """
     Implement the effect of the 'Early Train to Paddington' event.
     """
-    deck = db.query(Card).filter(Card.game_id == game_id, Card.player_id == None, Card.draft == False).all()
+    state = gameStateManager.load(db, game_id)
+    deck = state.deck() if state else []
     
     if not deck:
         raise HTTPException(status_code=404, detail="Deck not found.")
@@ -118,18 +128,20 @@ def early_train_paddington(game_id: int, db: Session):
         finish_game(game_id) # se termina el juego si no hay mas cartas en el mazo
         return {"message": "Not enough cards in the deck. The game has ended."}
     
-    random.shuffle(deck)
-    max_discardInt = db.query(func.max(Card.discardInt)).filter(Card.game_id == game_id).scalar() or 0
-    cards_to_discard = deck[:6]
-    for card in cards_to_discard:
-        card.dropped = True
-        card.picked_up = False
-        max_discardInt += 1
-        card.discardInt = max_discardInt # Asigna el siguiente valor en la secuencia
+    next_discardInt = reserve_discard_order(game_id, 6, db)
+    # Cada carta se reclama con el UPDATE condicional del robo: si un request concurrente
+    # ya se llevó una, se sigue con la siguiente del mazo
+    remaining = iter(deck)
+    cards_to_discard = []
+    for n in range(6):
+        card = claim_from_deck(db, state, remaining, dropped=True, picked_up=False, discardInt=next_discardInt + n)
+        if card is None:
+            db.rollback()
+            raise HTTPException(status_code=409, detail="The deck changed while the event was running. Try again.")
+        cards_to_discard.append(card)
+    log_action(db, game_id, "event", event="early_train_paddington", card_ids=[c.card_id for c in cards_to_discard])
     try:
         db.commit()
-        for card in cards_to_discard:
-            db.refresh(card)
         return {"message": "Early Train to Paddington event executed successfully."}
     except Exception as e:
         db.rollback()
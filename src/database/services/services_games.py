@@ -1,11 +1,13 @@
 from fastapi import Depends, HTTPException , HTTPException
-from sqlalchemy import extract
+from sqlalchemy import extract, update
 from sqlalchemy.orm import Session  
 from src.database.services.services_websockets import broadcast_game_information
-from src.database.database import SessionLocal, get_db
+from src.database.database import SessionLocal, get_db, run_db, commit_db, commit_or_flush
 from src.database.models import Game, Player 
 from src.schemas.games_schemas import Game_Base
-from datetime import date 
+from src.gameState.game_state import SYNCED_OPTION, record
+from src.gameState.action_log import log_action
+from datetime import date, datetime
 
 today = date.today()
 acBday = date(today.year,9, 15)
@@ -31,64 +33,52 @@ def update_players_on_game (game_id : int, db : Session = Depends(get_db)):
     else :  
         return None 
 
-def assign_turn_to_players (game_id : int, db :Session = Depends (get_db)) : 
+def _turn_key(today: date, month: int, day: int) -> int:
+    """Días entre el cumpleaños de este año y el de Agatha Christie (15/9): juega primero el más cercano."""
+    acBday = date(today.year, 9, 15)
+    if (month, day) == (2, 29) and not (today.year % 4 == 0 and (today.year % 100 != 0 or today.year % 400 == 0)):
+        day = 28  # 29/2 en un año no bisiesto
+    return abs((acBday - date(today.year, month, day)).days)
+
+
+def assign_turn_to_players (game_id : int, db :Session = Depends (get_db), commit: bool = True) : 
+    """
+    Ordena a los jugadores por cercanía de su cumpleaños al de Agatha Christie con una
+    sola consulta y escribe todos los turn_order en un único UPDATE masivo.
+    """
     today = date.today()
-    acBday = date(today.year,9, 15)
-    game = db.query(Game).where(Game.game_id == game_id).first()
-    players = db.query(Player).filter(Player.game_id == game_id).all()
-    players_birthday = db.query (Player.player_id, extract('month', Player.birth_date).label("month"), 
-                        extract('day', Player.birth_date).label("day")).where(Player.game_id == game_id).all()
-     
-    turn_order = []
-    for player_id, month, day in players_birthday :
-        player_birthday_calc = date(today.year, int(month), int(day))
-        diff_days = abs((acBday-player_birthday_calc).days)
-        pos = 0 
-        for i in turn_order : 
-            if diff_days < i[1] :  
-                break
-            else : 
-                pos += 1    
+    players_birthday = db.query(Player.player_id, extract('month', Player.birth_date).label("month"),
+                                extract('day', Player.birth_date).label("day")).where(Player.game_id == game_id).all()
+    # Empates: primero el jugador que se unió antes (menor player_id), como el orden de la consulta
+    ordered = sorted(players_birthday, key=lambda p: (_turn_key(today, int(p.month), int(p.day)), p.player_id))
+    turns = [{"player_id": player_id, "turn_order": turn} for turn, (player_id, _, _) in enumerate(ordered, start=1)]
 
-        turn_order.insert(pos,(player_id, diff_days))
-    
-    for player in players:
-        index = 1 
-        for i in turn_order : 
-            if player.player_id == i[0] :
-                break
-            else : 
-                index += 1
-        player.turn_order = index
-        db.add(player)
-        try: 
-            db.commit()
-            db.refresh(player)
-        except Exception as e:
-            db.rollback()
-            raise HTTPException(status_code=400, detail=f"Error setting turn of players in game: {str(e)}") 
-    
-    game.current_turn = 1
-    db.add(game)
+    game = db.get(Game, game_id)
     try:
-        db.commit()
-        db.refresh(game)
+        if turns:
+            db.execute(update(Player), turns, execution_options={SYNCED_OPTION: True})
+            for row in turns:
+                record(db, Player, row["player_id"], turn_order=row["turn_order"])
+        game.current_turn = 1
+        # Turnos y turno actual se guardan juntos (un solo commit, o flush dentro del inicio de partida)
+        commit_or_flush(db, commit)
     except Exception as e:
         db.rollback()
-        raise HTTPException(status_code=400, detail=f"Error setting current turn in game: {str(e)}") 
+        raise HTTPException(status_code=400, detail=f"Error setting turn of players in game: {str(e)}") 
     return game
 
 
 async def finish_game (game_id : int , db : Session = Depends(get_db)) : 
-    game = db.query(Game).where(Game.game_id == game_id).first()
+    game = await run_db(db.query(Game).where(Game.game_id == game_id).first)
     if game.status != 'finished' : 
         game.status = 'finished'
+        game.finished_at = datetime.utcnow()
+        log_action(db, game_id, "finish")
         try:
-            db.commit()
-            db.refresh(game)
+            await commit_db(db, game)
             await broadcast_game_information(game_id)
         except Exception as e:
-            db.rollback()
+            await run_db(db.rollback)
             raise HTTPException(status_code=400, detail=f"Error finishing the game: {str(e)}")  
         return {"message": f"Game {game_id} finished successfully."}
     else : 
@@ -1,55 +1,72 @@
 from fastapi import APIRouter, Depends, HTTPException  #te permite definir las rutas o subrutas por separado
+from sqlalchemy import update
 from sqlalchemy.orm import Session  
-from src.database.database import SessionLocal, get_db
+from src.database.database import SessionLocal, get_db, run_db, commit_db, commit_or_flush
 from src.database.models import Secrets, Player
 import random
 
+from src.database.game_rng import rng_for_game
 from src.database.services.services_games import finish_game
+from src.gameState.game_state import SYNCED_OPTION, gameStateManager, attach, record
+from src.gameState.action_log import log_action
 
-def deal_secrets_to_players(game_id: int, db: Session):
+def deal_secret_ids(player_ids: list, secrets: list, rng=random) -> dict:
     """
-    Reparte 3 secretos aleatorios a cada jugador, reintentando si el Asesino y
-    el Cómplice son el mismo jugador.
+    Reparte 3 secretos por jugador sin reintentos: `secrets` es una lista de
+    (secret_id, murderer, acomplice) y devuelve {secret_id: player_id}.
+
+    El Asesino va a un lugar al azar entre los 3 * jugadores, el Cómplice a uno al
+    azar de los que no son del mismo jugador, y el resto llena los lugares libres en
+    orden aleatorio. Es la misma distribución que barajar todo y repetir hasta que
+    Asesino y Cómplice queden separados (uniforme sobre los repartos válidos).
     """
-    players = db.query(Player).filter(Player.game_id == game_id).all()
-    secrets_deck = db.query(Secrets).filter(Secrets.game_id == game_id, Secrets.player_id.is_(None)).all()
-    if not players:
+    slots = [player_id for player_id in player_ids for _ in range(3)]
+    murderer = next((s[0] for s in secrets if s[1]), None)
+    acomplice = next((s[0] for s in secrets if s[2]), None)
+    free = list(range(len(slots)))
+    dealt = {}
+    if murderer is not None:
+        slot = rng.choice(free)
+        dealt[murderer] = slots[slot]
+        free.remove(slot)
+        if acomplice is not None:
+            slot = rng.choice([i for i in free if slots[i] != dealt[murderer]])
+            dealt[acomplice] = slots[slot]
+            free.remove(slot)
+    rest = [s[0] for s in secrets if s[0] not in dealt]
+    rng.shuffle(rest)
+    dealt.update((secret_id, slots[slot]) for secret_id, slot in zip(rest, free))
+    return dealt
+
+
+def deal_secrets_to_players(game_id: int, db: Session, commit: bool = True, rng=None):
+    """
+    Reparte 3 secretos aleatorios a cada jugador, con el Asesino y el Cómplice en
+    jugadores distintos, y los guarda con un único UPDATE masivo. Sin `rng` usa el
+    flujo "secrets" de la semilla de la partida.
+    """
+    player_ids = [player_id for player_id, in db.query(Player.player_id).filter(Player.game_id == game_id).order_by(Player.player_id)]
+    secrets_deck = db.query(Secrets.secret_id, Secrets.murderer, Secrets.acomplice).filter(
+        Secrets.game_id == game_id, Secrets.player_id.is_(None)).order_by(Secrets.secret_id).all()
+    if not player_ids:
         raise HTTPException(status_code=404, detail="No players found for the given game_id")
     if not secrets_deck:
         raise HTTPException(status_code=404, detail="No secrets available to deal for the given game_id")
-    
-    while True:
-        # 1. Barajar las cartas en cada intento
-        random.shuffle(secrets_deck)
-
-        # 2. Asignar 3 secretos a cada jugador
-        secret_cursor = 0
-        for player in players:
-            for _ in range(3):
-                secret_to_deal = secrets_deck[secret_cursor]
-                secret_to_deal.player_id = player.player_id
-                secret_cursor += 1
-
-        # 3. Comprobar la condición
-        murderer_card = next((s for s in secrets_deck if s.murderer), None)
-        acomplice_card = next((s for s in secrets_deck if s.acomplice), None)
-
-        # Si no hay cómplice o si los dueños son diferentes, la repartición es válida
-        if not acomplice_card or (acomplice_card.player_id != murderer_card.player_id):
-            break  # Salir del bucle while
-
-        # Si la condición no se cumple, el bucle se repetirá, volviendo a barajar y asignar.
 
+    dealt = deal_secret_ids(player_ids, secrets_deck, rng or rng_for_game(db, game_id, "secrets"))
     try:
-        # 4. Confirmar los cambios en la base de datos una vez que la repartición es válida
-        db.commit()
+        db.execute(update(Secrets), [{"secret_id": secret_id, "player_id": player_id} for secret_id, player_id in dealt.items()],
+                   execution_options={SYNCED_OPTION: True})
+        for secret_id, player_id in dealt.items():
+            record(db, Secrets, secret_id, player_id=player_id)
+        commit_or_flush(db, commit)
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Ocurrió un error al repartir los secretos: {str(e)}")
 
-    return {"message": f"Se repartieron 3 secretos a {len(players)} jugadores en la partida {game_id}."}
+    return {"message": f"Se repartieron 3 secretos a {len(player_ids)} jugadores en la partida {game_id}."}
 
-def init_secrets(game_id : int , db: Session = Depends(get_db)):
+def init_secrets(game_id : int , db: Session = Depends(get_db), commit: bool = True):
     new_secret_list = []
     players = db.query(Player).filter(Player.game_id == game_id).all()
     num_players = len(players)
@@ -74,7 +91,7 @@ def init_secrets(game_id : int , db: Session = Depends(get_db)):
     
     try:
         db.add_all(new_secret_list)
-        db.commit()
+        commit_or_flush(db, commit)
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=400, detail=f"Error creating cards: {str(e)}")
@@ -82,35 +99,43 @@ def init_secrets(game_id : int , db: Session = Depends(get_db)):
     return {"message": f"{len(new_secret_list)} secrets created successfully"}
 
 
+def _secret_state(db: Session, secret_id: int):
+    # El secreto se busca en el estado en memoria de su partida
+    state = gameStateManager.load_for(db, Secrets, secret_id)
+    return (state, state.secrets[secret_id]) if state else (None, None)
+
+
 async def reveal_secret(secret_id: int, db: Session):
-    secret = db.query(Secrets).filter(Secrets.secret_id == secret_id).first()
-    if not secret:
+    state, revealed = await run_db(_secret_state, db, secret_id)
+    if not revealed:
         raise HTTPException(status_code=404, detail="Secret not found")
-    if secret.revelated:
+    if revealed.revelated:
         raise HTTPException(status_code=400, detail="Secret is already revealed")
 
+    secret = attach(db, revealed)
     secret.revelated = True
-    if secret.murderer:
+    log_action(db, revealed.game_id, "secret_reveal", revealed.player_id, secret_id=secret_id)
+    if revealed.murderer:
         # Si es la carta del asesino, se termina el juego
-        await finish_game(secret.game_id, db)
+        await finish_game(revealed.game_id, db)
     try:
-        db.commit()
-        db.refresh(secret)
+        await run_db(db.commit)
         return secret
     except Exception as e:
-        db.rollback()
+        await run_db(db.rollback)
         raise HTTPException(status_code=400, detail=f"Error revealing secret: {str(e)}")
 
 def hide_secret(secret_id: int, db: Session):
-    secret = db.query(Secrets).filter(Secrets.secret_id == secret_id).first()
-    if not secret:
+    state, hidden = _secret_state(db, secret_id)
+    if not hidden:
         raise HTTPException(status_code=404, detail="Secret not found")
-    if not secret.revelated:
+    if not hidden.revelated:
         raise HTTPException(status_code=400, detail="Secret is not revealed")
+    secret = attach(db, hidden)
     secret.revelated = False
+    log_action(db, hidden.game_id, "secret_hide", hidden.player_id, secret_id=secret_id)
     try: 
         db.commit()
-        db.refresh(secret)
         return secret
     except Exception as e:
         db.rollback()
@@ -119,22 +144,22 @@ def hide_secret(secret_id: int, db: Session):
 def steal_secret(target_player_id: int, secret_id: int, db: Session):
     # roba secreto_id y el nuevo dueño del secreto es target_player_id
     # EL SECRETO TIENE QUE ESTAR REVELADO
-    secret = db.query(Secrets).filter(Secrets.secret_id == secret_id).first()
-    if not secret:
+    state, stolen = _secret_state(db, secret_id)
+    if not stolen:
         raise HTTPException(status_code=404, detail="Secret not found")
-    if not secret.revelated:
+    if not stolen.revelated:
         raise HTTPException(status_code=400, detail="Secret must be revealed to be stolen")
-    new_owner = db.query(Player).filter(Player.player_id == target_player_id).first()
-    if not new_owner:
+    if target_player_id not in state.players:
         raise HTTPException(status_code=404, detail="Player not found")
 
-    hide_secret(secret_id=secret_id, db=db) # al robarlo se oculta automaticamente
-    secret.player_id = new_owner.player_id
+    secret = attach(db, stolen)
+    secret.revelated = False # al robarlo se oculta automaticamente
+    secret.player_id = target_player_id
+    log_action(db, stolen.game_id, "secret_steal", target_player_id, secret_id=secret_id)
 
     try:
         db.commit()
-        db.refresh(secret)
         return secret
     except Exception as e:
         db.rollback()
-        raise HTTPException(status_code=400, detail=f"Error stealing secret: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=400, detail=f"Error stealing secret: {str(e)}")
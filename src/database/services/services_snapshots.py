@@ -0,0 +1,252 @@
+"""
+Snapshots binarios de una partida completa: la fila de games y todas sus filas de
+players, sets, cards (con su zona: mazo, mano, draft, descarte o set) y secrets.
+
+Formato (versión 1): b"MCSN", un byte de versión y el cuerpo comprimido con zlib. El
+cuerpo tiene, por tabla y en orden fijo, los nombres de las columnas y las filas con
+cada valor etiquetado (enteros en varint zigzag, textos en UTF-8, fechas como ordinal).
+Al decodificar se obtiene {tabla: {"columns": [...], "rows": [[...]]}}, la misma forma
+que usa el archivo de partidas; al restaurar solo se usan las columnas que siguen
+existiendo, así un snapshot viejo se puede cargar después de una migración.
+
+`restore_game` escribe la partida con un INSERT masivo por tabla en una sola
+transacción: como partida nueva (ids nuevos) o sobre la misma partida, conservando
+los ids que conocen los clientes conectados.
+"""
+import datetime
+import zlib
+from typing import Optional
+from fastapi import HTTPException
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.orm import Session
+from src.database.database import commit_or_flush
+from src.database.models import Card, Game, Player, Secrets, Set
+from src.gameState.action_log import log_action, read_snapshot
+from src.gameState.game_state import GAME_ID_OPTION, SYNCED_OPTION
+
+MAGIC = b"MCSN"
+FORMAT_VERSION = 1
+
+# Orden de inserción: cada tabla apunta solo a las anteriores
+_TABLES = (("games", Game.__table__), ("players", Player.__table__), ("sets", Set.__table__),
+           ("cards", Card.__table__), ("secrets", Secrets.__table__))
+# El contador del registro de acciones sigue siendo el de la partida, no el del snapshot
+_NOT_RESTORED = {"games": {"action_seq"}}
+
+_NONE, _FALSE, _TRUE, _INT, _STR, _DATE, _DATETIME = range(7)
+
+
+def _write_varint(out: bytearray, value: int):
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return
+
+
+def _write_str(out: bytearray, value: str):
+    data = value.encode("utf-8")
+    _write_varint(out, len(data))
+    out += data
+
+
+def _write_value(out: bytearray, value):
+    if value is None:
+        out.append(_NONE)
+    elif value is True or value is False:
+        out.append(_TRUE if value else _FALSE)
+    elif isinstance(value, int):
+        out.append(_INT)
+        _write_varint(out, (value << 1) if value >= 0 else ((-value << 1) - 1))
+    elif isinstance(value, str):
+        out.append(_STR)
+        _write_str(out, value)
+    elif isinstance(value, datetime.datetime):
+        out.append(_DATETIME)
+        _write_str(out, value.isoformat())
+    elif isinstance(value, datetime.date):
+        out.append(_DATE)
+        _write_varint(out, value.toordinal())
+    else:
+        raise TypeError(f"Tipo no soportado en un snapshot: {type(value).__name__}")
+
+
+class _Reader:
+    def __init__(self, data: bytes):
+        self.data = data
+        self.pos = 0
+
+    def varint(self) -> int:
+        result = shift = 0
+        while True:
+            byte = self.data[self.pos]
+            self.pos += 1
+            result |= (byte & 0x7F) << shift
+            if not byte & 0x80:
+                return result
+            shift += 7
+
+    def str(self) -> str:
+        length = self.varint()
+        value = self.data[self.pos:self.pos + length].decode("utf-8")
+        self.pos += length
+        return value
+
+    def value(self):
+        tag = self.data[self.pos]
+        self.pos += 1
+        if tag == _NONE:
+            return None
+        if tag in (_FALSE, _TRUE):
+            return tag == _TRUE
+        if tag == _INT:
+            raw = self.varint()
+            return (raw >> 1) if not raw & 1 else -((raw + 1) >> 1)
+        if tag == _STR:
+            return self.str()
+        if tag == _DATE:
+            return datetime.date.fromordinal(self.varint())
+        if tag == _DATETIME:
+            return datetime.datetime.fromisoformat(self.str())
+        raise ValueError(f"Etiqueta desconocida en el snapshot: {tag}")
+
+
+def encode_snapshot(tables: dict) -> bytes:
+    out = bytearray()
+    for name, _ in _TABLES:
+        columns, rows = tables[name]["columns"], tables[name]["rows"]
+        _write_varint(out, len(columns))
+        for column in columns:
+            _write_str(out, column)
+        _write_varint(out, len(rows))
+        for row in rows:
+            for value in row:
+                _write_value(out, value)
+    return MAGIC + bytes([FORMAT_VERSION]) + zlib.compress(bytes(out), 9)
+
+
+def decode_snapshot(blob: bytes) -> dict:
+    """{tabla: {"columns": [...], "rows": [[...]]}}. ValueError si el blob no es un snapshot válido."""
+    if blob[:4] != MAGIC or len(blob) < 5:
+        raise ValueError("No es un snapshot de partida")
+    if blob[4] != FORMAT_VERSION:
+        raise ValueError(f"Versión de snapshot no soportada: {blob[4]}")
+    try:
+        reader = _Reader(zlib.decompress(blob[5:]))
+        tables = {}
+        for name, _ in _TABLES:
+            columns = [reader.str() for _ in range(reader.varint())]
+            rows = [[reader.value() for _ in columns] for _ in range(reader.varint())]
+            tables[name] = {"columns": columns, "rows": rows}
+    except (zlib.error, IndexError, UnicodeDecodeError) as e:
+        raise ValueError(f"Snapshot corrupto: {e}")
+    if len(tables["games"]["rows"]) != 1:
+        raise ValueError("El snapshot tiene que tener exactamente una partida")
+    return tables
+
+
+def snapshot_game(game_id: int, db: Session) -> Optional[bytes]:
+    """La partida entera como snapshot binario. None si no existe."""
+    tables = {}
+    for name, table in _TABLES:
+        pk = next(iter(table.primary_key.columns))
+        rows = db.execute(select(table).where(table.c.game_id == game_id).order_by(pk)).all()
+        tables[name] = {"columns": [c.name for c in table.columns], "rows": [list(row) for row in rows]}
+    if not tables["games"]["rows"]:
+        return None
+    return encode_snapshot(tables)
+
+
+def _rows(tables: dict, name: str, table) -> list:
+    """Filas del snapshot como dicts, solo con las columnas que existen en la tabla."""
+    skip = _NOT_RESTORED.get(name, set())
+    columns = [(i, c) for i, c in enumerate(tables[name]["columns"]) if c in table.c and c not in skip]
+    return [{c: row[i] for i, c in columns} for row in tables[name]["rows"]]
+
+
+def _insert(db: Session, table, rows: list, options: dict, pk: str = None) -> list:
+    """INSERT masivo; con `pk` devuelve los ids generados en el orden de `rows`."""
+    if not rows:
+        return []
+    if pk is None:
+        db.execute(insert(table), rows, execution_options=options)
+        return []
+    if not db.get_bind().dialect.insert_executemany_returning_sort_by_parameter_order:
+        # MySQL no tiene RETURNING: una fila por INSERT y el id sale de lastrowid
+        return [db.execute(insert(table).values(**row), execution_options=options).inserted_primary_key[0]
+                for row in rows]
+    stmt = insert(table).returning(table.c[pk], sort_by_parameter_order=True)
+    return db.execute(stmt, rows, execution_options=options).scalars().all()
+
+
+def _restore_as_new(db: Session, tables: dict) -> int:
+    # Una partida nueva no está en el estado en memoria: no hay nada que invalidar
+    options = {SYNCED_OPTION: True}
+    game = _rows(tables, "games", Game.__table__)[0]
+    game.pop("game_id")
+    game_id = _insert(db, Game.__table__, [game], options, "game_id")[0]
+
+    players = _rows(tables, "players", Player.__table__)
+    for row in players:
+        row["game_id"] = game_id
+    old_players = [row.pop("player_id") for row in players]
+    player_ids = dict(zip(old_players, _insert(db, Player.__table__, players, options, "player_id")))
+
+    sets = _rows(tables, "sets", Set.__table__)
+    for row in sets:
+        row.update(game_id=game_id, player_id=player_ids.get(row["player_id"]))
+    old_sets = [row.pop("set_id") for row in sets]
+    set_ids = dict(zip(old_sets, _insert(db, Set.__table__, sets, options, "set_id")))
+
+    cards = _rows(tables, "cards", Card.__table__)
+    secrets = _rows(tables, "secrets", Secrets.__table__)
+    for row in cards:
+        row.pop("card_id")
+        row.update(game_id=game_id, player_id=player_ids.get(row["player_id"]), set_id=set_ids.get(row.get("set_id")))
+    for row in secrets:
+        row.pop("secret_id")
+        row.update(game_id=game_id, player_id=player_ids.get(row["player_id"]))
+    _insert(db, Card.__table__, cards, options)
+    _insert(db, Secrets.__table__, secrets, options)
+    return game_id
+
+
+def _restore_in_place(db: Session, tables: dict, game_id: int) -> int:
+    game = _rows(tables, "games", Game.__table__)[0]
+    if game.pop("game_id") != game_id:
+        raise HTTPException(status_code=400, detail="The snapshot belongs to another game")
+    options = {GAME_ID_OPTION: game_id, "synchronize_session": False}
+    if db.execute(update(Game.__table__).where(Game.__table__.c.game_id == game_id).values(**game),
+                  execution_options=options).rowcount == 0:
+        raise HTTPException(status_code=404, detail="Game not found")
+    for name, table in reversed(_TABLES[1:]):
+        db.execute(delete(table).where(table.c.game_id == game_id), execution_options=options)
+    for name, table in _TABLES[1:]:
+        _insert(db, table, _rows(tables, name, table), options)
+    return game_id
+
+
+def restore_game(blob: bytes, db: Session, game_id: Optional[int] = None, commit: bool = True) -> int:
+    """
+    Restaura un snapshot y devuelve el game_id. Sin `game_id` crea una partida nueva;
+    con `game_id` reemplaza esa partida (el snapshot tiene que ser de ella).
+    """
+    try:
+        tables = decode_snapshot(blob)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        game_id = _restore_in_place(db, tables, game_id) if game_id is not None else _restore_as_new(db, tables)
+        # El registro de acciones se puede reproducir desde acá
+        log_action(db, game_id, "restore", snapshot=read_snapshot(db, game_id))
+        commit_or_flush(db, commit)
+    except HTTPException:
+        db.rollback()
+        raise
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=f"Error restoring game: {str(e)}")
+    return game_id
@@ -1,180 +1,487 @@
-from fastapi.encoders import jsonable_encoder
+"""
+Mensajes de los WebSockets del lobby y de las partidas.
+
+Protocolo del canal de una partida en memoria (/ws/game/{game_id}): cada commit que
+toca la partida sube su versión (`GameState.version`). El estado completo se manda
+como "gameUpdated" + "playersState" con un campo "version"; después, cada broadcast
+manda solo lo que cambió desde el último envío:
+
+    {"type": "gameDelta", "base": 41, "version": 43, "data": [
+        {"op": "merge",  "path": "/game",       "value": {"current_turn": 2}},
+        {"op": "add",    "path": "/cards/17",   "value": {...carta como en playersState...}},
+        {"op": "merge",  "path": "/secrets/4",  "value": {"revelated": true}},
+        {"op": "remove", "path": "/cards/9"}]}
+
+Las rutas son /game y /{players|cards|secrets|sets}/{id}; las cartas que aparecen son
+las de las manos y los sets, las mismas de playersState. "add" reemplaza la fila
+entera y "merge" pisa campos, así aplicar dos veces el mismo op no cambia nada. Un
+cliente aplica un delta si su versión es `base`; si no, se quedó atrás y se vuelve a
+conectar (al conectarse recibe el estado completo). Cada `WS_SNAPSHOT_EVERY` versiones,
+o si el journal de la partida ya no llega a la última versión enviada, se manda otra
+vez el estado completo. Con un broker entre varios workers (`WS_BROKER`) cada worker
+numera las versiones con su propio estado en memoria, así que se manda siempre el
+estado completo.
+
+Durante un request HTTP (`BroadcastBufferMiddleware`) los broadcasts del canal de una
+partida no se mandan en el momento: se anotan y, antes de responder, se arman todos
+juntos desde una sola lectura (el estado en memoria o una sesión) y cada socket recibe
+un único frame. Si hay más de un mensaje el frame es {"type": "batch", "data": [...]}
+con los mensajes en el orden gameUpdated/delta, playersState, droppedCards, draftCards.
+
+Vistas privadas: los sockets de /ws/game/{game_id}?player_id=N reciben en playersState
+su propio estado completo (Player_State) y de los demás solo lo público (Player_Public:
+cantidad de cartas en mano, secretos revelados y sets). Los deltas se filtran igual: las
+cartas en mano y los secretos sin revelar solo le llegan a su dueño. Los sockets sin
+jugador (espectadores, el lobby) reciben la vista pública de todos. Los mensajes del
+canal se arman como vistas {player_id o None: [mensajes]} y `gameManager.broadcast_views`
+le manda a cada socket la suya.
+"""
+import logging
+import os
+import threading
+from contextvars import ContextVar
+from typing import Dict, Optional
 from fastapi import HTTPException, WebSocket
 from sqlalchemy import desc, select, true, orm
 from sqlalchemy.orm import Session
-from src.schemas.card_schemas import Card_Response, AllCardsResponse
-from src.database.database import SessionLocal
-from src.database.models import Detective, Game, Player, Card, Event
+from src.schemas.card_schemas import Card_Response, AllCardsResponse, Detective_Response, Event_Response
+from src.database.database import ReadSessionLocal, run_db
+from src.database.models import Detective, Game, Player, Card, Event, Secrets, Set
+from src.gameState.game_state import GameState, audience, gameStateManager, sees
 from src.schemas.games_schemas import Game_Response
-from src.webSocket.connection_manager import lobbyManager, gameManager
-from src.schemas.players_schemas import Player_Base, Player_State
+from src.schemas.secret_schemas import Secret_Response
+from src.schemas.set_schemas import Set_Base, Set_Response
+from src.webSocket.connection_manager import broker, lobbyManager, gameManager
+from src.schemas.players_schemas import Player_Base, Player_Public, Player_State
 import json 
 from sqlalchemy.orm import joinedload
 from pydantic import TypeAdapter
-async def broadcast_available_games(db: Session):
+from pydantic_core import to_json
+
+logger = logging.getLogger(__name__)
+
+# Cada mensaje se serializa una sola vez, directo a bytes con el serializador de
+# pydantic-core (sin pasar por jsonable_encoder ni json.dumps), y el mismo str se
+# encola en todos los sockets de la partida.
+# Se usa typeAdapter por una cuestion de compatibilidad de versiones entre python y pydantic
+_GAME = TypeAdapter(Game_Response)
+_GAMES = TypeAdapter(list[Game_Response])
+_PLAYERS = TypeAdapter(list[Player_Base])
+_PLAYER_STATE = TypeAdapter(Player_State)
+_PLAYER_PUBLIC = TypeAdapter(Player_Public)
+_CARDS = TypeAdapter(list[AllCardsResponse])
+
+SNAPSHOT_EVERY = int(os.getenv("WS_SNAPSHOT_EVERY", 50))
+# Protege el cursor de envío de cada partida (sent_version / snapshot_version)
+_cursor_lock = threading.Lock()
+
+# Por modelo: ruta en el delta, schema de la fila entera y campos que ven los clientes. La PK
+# y game_id no cambian (el after_flush los agrega a cada update solo para ubicar la fila).
+_DELTA_ROWS = {
+    Player: ("players", _PLAYER_PUBLIC, set(Player_Public.model_fields) - {"secrets", "sets", "player_id", "game_id"}),
+    Card: ("cards", TypeAdapter(AllCardsResponse),
+           (set(Detective_Response.model_fields) | set(Event_Response.model_fields)) - {"card_id", "game_id"}),
+    Secrets: ("secrets", TypeAdapter(Secret_Response), set(Secret_Response.model_fields) - {"secret_id", "game_id"}),
+    Set: ("sets", TypeAdapter(Set_Response), set(Set_Base.model_fields) - {"set_id", "game_id"}),
+}
+_GAME_PUBLIC = set(Game_Response.model_fields) - {"game_id"}
+# Campos que un jugador ve de su propia fila (Player_State no tiene hand_size: ya tiene las cartas)
+_OWN_PLAYER = set(Player_State.model_fields) - {"cards", "secrets", "sets", "player_id", "game_id"}
+
+
+def _serialize(adapter: TypeAdapter, value) -> bytes:
+    return adapter.dump_json(adapter.validate_python(value, from_attributes=True))
+
+
+def _message(type_: str, data: bytes, **numbers: int) -> str:
+    """{"type": type_, **numbers, "data": data} con `data` ya serializado, sin volver a parsearlo."""
+    head = b"".join(b'"%s":%d,' % (key.encode(), value) for key, value in numbers.items())
+    return (b'{"type":"' + type_.encode() + b'",' + head + b'"data":' + data + b'}').decode()
+
+
+def _game_message(type_: str, game, **numbers: int) -> str:
+    # Los clientes esperan la partida como JSON dentro de un string (doble JSON.parse)
+    return _message(type_, json.dumps(_serialize(_GAME, game).decode()).encode(), **numbers)
+
+
+def _row_value(state: GameState, model, pk: int, viewer: Optional[int]):
+    """La fila entera como la ve `viewer` (el valor de un op "add")."""
+    if model is Player:
+        if pk == viewer:
+            return _PLAYER_STATE.dump_python(_PLAYER_STATE.validate_python(state.player_view(pk)))
+        return _PLAYER_PUBLIC.dump_python(_PLAYER_PUBLIC.validate_python(state.public_player_view(pk), from_attributes=True))
+    adapter = _DELTA_ROWS[model][1]
+    row = state.set_view(pk) if model is Set else getattr(state, _DELTA_ROWS[model][0])[pk]
+    return adapter.dump_python(adapter.validate_python(row, from_attributes=True))
+
+
+def _delta_ops(state: GameState, changes: dict, viewer: Optional[int]) -> list:
+    ops = []
+    for (model, pk), (before, fields) in changes.items():
+        if model is Game:
+            value = {f: getattr(state, f) for f in fields if f in _GAME_PUBLIC}
+            if value:
+                ops.append({"op": "merge", "path": "/game", "value": value})
+            continue
+        collection, _, public = _DELTA_ROWS[model]
+        if model is Player and pk == viewer:
+            public = _OWN_PLAYER
+        path = f"/{collection}/{pk}"
+        row = getattr(state, collection).get(pk)
+        was_visible = sees(viewer, before)
+        if not sees(viewer, audience(model, row)):
+            if was_visible:
+                ops.append({"op": "remove", "path": path})
+        elif not was_visible:
+            ops.append({"op": "add", "path": path, "value": _row_value(state, model, pk, viewer)})
+        else:
+            value = {f: getattr(row, f) for f in fields if f in public and hasattr(row, f)}
+            if value:
+                ops.append({"op": "merge", "path": path, "value": value})
+    return ops
+
+
+def _players_state_views(players: list, **numbers: int) -> Dict[Optional[int], str]:
+    """
+    playersState de cada jugador y de los sockets sin jugador (None), a partir de
+    [(player_id, estado completo, vista pública)]. Cada jugador se serializa dos veces,
+    completo y público, y las listas se arman pegando esos bytes.
+    """
+    own = {player_id: _serialize(_PLAYER_STATE, view) for player_id, view, _ in players}
+    public = {player_id: _serialize(_PLAYER_PUBLIC, view) for player_id, _, view in players}
+
+    def listing(viewer):
+        return b"[" + b",".join(own[p] if p == viewer else public[p] for p in public) + b"]"
+    return {viewer: _message("playersState", listing(viewer), **numbers) for viewer in [None, *public]}
+
+
+def _state_players(state: GameState) -> list:
+    return [(p, state.player_view(p), state.public_player_view(p)) for p in state.players]
+
+
+def _public_player(player: Player) -> dict:
+    view = {f: getattr(player, f) for f in Player_Public.model_fields if f not in ("secrets", "sets")}
+    view["hand_size"] = player.hand_size or 0
+    view["secrets"] = [s for s in player.secrets if s.revelated]
+    view["sets"] = player.sets
+    return view
+
+
+def _with_messages(views: dict, before: list = (), after: list = ()) -> dict:
+    """Agrega mensajes iguales para todos a cada vista. Sin vistas, todos reciben la de None."""
+    views = views or {None: []}
+    return {viewer: [*before, *messages, *after] for viewer, messages in views.items()}
+
+
+def _game_channel_messages(state: GameState, full: bool = False) -> Dict[Optional[int], list[str]]:
+    """
+    Vistas para los sockets de una partida en memoria: un delta desde la última
+    versión enviada o, si hace falta, el estado completo. {} si no hay nada nuevo.
+    """
+    with _cursor_lock:
+        version, base = state.version, state.sent_version
+        changes = None
+        # Sin deltas entre workers; igual, si no hay nada nuevo no se manda nada
+        deltas = broker.local or version == base
+        if deltas and not full and base is not None and version - state.snapshot_version < SNAPSHOT_EVERY:
+            changes = state.changes_since(base)
+        if changes is None:
+            state.snapshot_version = version
+        state.sent_version = version
+    if changes is None:
+        game = _game_message("gameUpdated", state, version=version)
+        return {viewer: [game, players]
+                for viewer, players in _players_state_views(_state_players(state), version=version).items()}
+    if version == base:
+        # Nada nuevo desde el último envío
+        return {}
+    # Un delta sin ops igual avanza la versión de los clientes (cambiaron campos que no ven)
+    return {viewer: [_message("gameDelta", to_json(_delta_ops(state, changes, viewer)), base=base, version=version)]
+            for viewer in [None, *state.players]}
+
+
+# --- Broadcasts combinados por request ---
+
+class _PendingBroadcasts:
+    """Broadcasts anotados durante un request: game_id -> tipos de mensaje."""
+    __slots__ = ("games",)
+
+    def __init__(self):
+        self.games: Dict[int, set] = {}
+
+
+_pending_broadcasts: ContextVar[Optional[_PendingBroadcasts]] = ContextVar("pending_broadcasts", default=None)
+
+
+def _defer(game_id: Optional[int], kind: str) -> bool:
+    """Anota el broadcast si hay un request en curso. False si hay que mandarlo ya."""
+    pending = _pending_broadcasts.get()
+    if pending is None or game_id is None:
+        return False
+    pending.games.setdefault(game_id, set()).add(kind)
+    return True
+
+
+def _batched_messages(game_id: int, kinds: set) -> Dict[Optional[int], list[str]]:
+    """Las vistas con todos los broadcasts anotados para una partida, leídas de un solo snapshot."""
+    with_players = bool(kinds & {"game", "players", "dropped"})
+    state = gameStateManager.get(game_id)
+    if state is not None:
+        views = _game_channel_messages(state) if with_players else {}
+        piles = _pile_messages(kinds, lambda: state.discard_pile(limit=5), lambda: state.draft_pile()[:3])
+        return _with_messages(views, after=piles)
+    db = ReadSessionLocal()
+    try:
+        game = []
+        if "game" in kinds:
+            row = db.query(Game).filter(Game.game_id == game_id).first()
+            if not row:
+                return {}
+            game.append(_game_message("gameUpdated", row))
+        views = {v: [m] for v, m in _players_state_message(db, game_id).items()} if with_players else {}
+        # Se serializa antes de cerrar la sesión: las cartas se leen de sus filas
+        piles = _pile_messages(kinds, lambda: _discard_pile(db, game_id), lambda: _draft_pile(db, game_id))
+        return _with_messages(views, before=game, after=piles)
+    finally:
+        db.close()
+
+
+def _pile_messages(kinds: set, discard_pile, draft_pile) -> list[str]:
+    # Con el descarte o el draft vacíos no hay mensaje (sin buffer, el broadcast da 404)
+    messages = []
+    dropped = discard_pile() if "dropped" in kinds else None
+    if dropped:
+        messages.append(_dropped_cards_message(dropped))
+    draft = draft_pile() if "draft" in kinds else None
+    if draft:
+        messages.append(_draft_cards_message(draft))
+    return messages
+
+
+def _frame(messages: list[str]) -> str:
+    if len(messages) == 1:
+        return messages[0]
+    return '{"type":"batch","data":[' + ",".join(messages) + "]}"
+
+
+async def _send_views(views: Dict[Optional[int], list[str]], game_id: int):
+    """Un frame por vista; cada socket recibe el de su jugador."""
+    frames = {viewer: _frame(messages) for viewer, messages in views.items() if messages}
+    if frames:
+        await gameManager.broadcast_views(frames, game_id)
+
+
+async def flush_broadcasts(pending: _PendingBroadcasts):
+    games, pending.games = pending.games, {}
+    for game_id, kinds in games.items():
+        try:
+            views = await run_db(_batched_messages, game_id, kinds)
+        except Exception:
+            # La acción ya se commiteó: un broadcast que falla no cambia la respuesta
+            logger.exception("No se pudo armar el broadcast de la partida %s", game_id)
+            continue
+        await _send_views(views, game_id)
+
+
+class BroadcastBufferMiddleware:
+    """
+    Middleware ASGI: junta los broadcasts de cada request HTTP y los manda como un
+    frame por partida justo antes de la respuesta (o al terminar, si el request falló).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        pending = _PendingBroadcasts()
+        token = _pending_broadcasts.set(pending)
+
+        async def send_after_broadcasts(message):
+            if message["type"] == "http.response.start":
+                await flush_broadcasts(pending)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_after_broadcasts)
+        finally:
+            _pending_broadcasts.reset(token)
+            await flush_broadcasts(pending)
+
+
+def _available_games_message(db: Session) -> str:
 
     #games = db.query(Game).filter(
     #   (Game.status == "bootable") | (Game.status == "waiting players")
     #).all()
 
     games = db.query(Game).all()
-    # Se convierten los objetos orm a un pydntic gameResponse para que se puedan leer los atributos de games luego
-    gamesResponse = [Game_Response.model_validate(game) for game in games]
-    
-   # se lo pasa a formato json
-    gamesResponseJson = jsonable_encoder(gamesResponse)
+    # manager.broadcast espera un string: la lista sale serializada directo desde los objetos orm
+    return _serialize(_GAMES, games).decode()
 
-    
-    # manager.broadcast espera un string, así que convertimos la lista a un JSON string.
-    
-    await lobbyManager.broadcast(json.dumps(gamesResponseJson))
+async def broadcast_available_games(db: Session):
+    # La lectura y serialización corren en el threadpool para no frenar el event loop
+    message = await run_db(_available_games_message, db)
+    await lobbyManager.broadcast(message)
 
-async def broadcast_lobby_information (db:Session, game_id : int) :
+def _lobby_messages(db: Session, game_id: int) -> list[str]:
     game = db.query(Game).filter(Game.game_id == game_id).first()
     if not game:
         # Si el juego ya no existe, no hacemos nada.
         print(f"Intento de broadcast para un juego no existente: {game_id}")
-        return
+        return []
     
     
     players = db.query(Player).filter(Player.game_id == game_id).all()
   
-    gameResponse = Game_Response.model_validate(game).model_dump_json()
-    playersResponse = [Player_Base.model_validate(player) for player in players]
-    playersResponseJson = jsonable_encoder(playersResponse)
-    await gameManager.broadcast(json.dumps({
-        "type": "game",
-        "data": gameResponse
-    }), game_id)
-
-    await gameManager.broadcast(json.dumps({
-        "type": "players",
-        "data": playersResponseJson
-    }), game_id)
-
-async def broadcast_game_information ( game_id : int) :
-    db = SessionLocal()
+    return [
+        _game_message("game", game),
+        _message("players", _serialize(_PLAYERS, players)),
+    ]
+
+async def broadcast_lobby_information (db:Session, game_id : int) :
+    for message in await run_db(_lobby_messages, db, game_id):
+        await gameManager.broadcast(message, game_id)
+
+def _players_state_message(db: Session, game_id: int) -> Dict[Optional[int], str]:
+    state = gameStateManager.get(game_id)
+    if state is not None:
+        # Partida en memoria: las manos salen del estado, sin consultar la base
+        return _players_state_views(_state_players(state))
+    players = db.query(Player).options(
+                        joinedload(Player.cards),joinedload(Player.secrets)).filter(Player.game_id == game_id).all()
+    # Convierte a Pydantic Player_State (el propio) y Player_Public (los demás)
+    return _players_state_views([(player.player_id, player, _public_player(player)) for player in players])
+
+def _game_information_messages(game_id: int, full: bool = False) -> Dict[Optional[int], list[str]]:
+    state = gameStateManager.get(game_id)
+    if state is not None:
+        return _game_channel_messages(state, full)
+    db = ReadSessionLocal()
     try: 
         game = db.query(Game).filter(Game.game_id == game_id).first()
         if not game:
             # Si el juego ya no existe, no hacemos nada.
             print(f"Intento de broadcast para un juego no existente: {game_id}")
-            return
+            return {}
         
-        players = db.query(Player).options(
-                            joinedload(Player.cards),joinedload(Player.secrets)).filter(Player.game_id == game_id).all()
-        
-        gameResponse = Game_Response.model_validate(game).model_dump_json()
-        playersStateResponse = [Player_State.model_validate(player) for player in players]
-        playersStateResponseJson = jsonable_encoder(playersStateResponse)
-
-        await gameManager.broadcast(json.dumps({
-            "type": "gameUpdated",
-            "data": gameResponse
-        }), game_id)
-
-        await gameManager.broadcast(json.dumps({
-            "type": "playersState",
-            "data": playersStateResponseJson
-        }), game_id)
+        gameUpdated = _game_message("gameUpdated", game)
+        return {viewer: [gameUpdated, players] for viewer, players in _players_state_message(db, game_id).items()}
     finally : 
         db.close() #cierro la conecxion para evitar saturacion de conexiones en la bdd
-            
 
-async def broadcast_player_state(game_id: int):
+async def broadcast_game_information ( game_id : int, full : bool = False) :
+    # full: manda el estado completo aunque los sockets puedan recibir un delta (conexión nueva)
+    if not full and _defer(game_id, "game"):
+        return
+    await _send_views(await run_db(_game_information_messages, game_id, full), game_id)
+            
 
-    db = SessionLocal() # Abre una nueva sesión para esta función
+def _player_state_messages(game_id: int) -> Dict[Optional[int], list[str]]:
+    state = gameStateManager.get(game_id)
+    if state is not None:
+        return _game_channel_messages(state)
+    db = ReadSessionLocal() # Abre una nueva sesión para esta función
     try :
         # Obtiene todos los jugadores y sus cartas (manos)
-        players = db.query(Player).options(
-                            joinedload(Player.cards),joinedload(Player.secrets)).filter(Player.game_id == game_id).all()
-        
-        # Convierte a Pydantic Player_State
-        playersStateResponse = [Player_State.model_validate(player) for player in players]
-        playersStateResponseJson = jsonable_encoder(playersStateResponse)
-
-        # Emite el WS de "playersState"
-        await gameManager.broadcast(json.dumps({
-            "type": "playersState",
-            "data": playersStateResponseJson
-        }), game_id)
+        return {viewer: [message] for viewer, message in _players_state_message(db, game_id).items()}
     finally : 
         db.close()
 
+async def broadcast_player_state(game_id: int):
+    # Emite el WS de "playersState" (o el delta de la partida)
+    if _defer(game_id, "players"):
+        return
+    await _send_views(await run_db(_player_state_messages, game_id), game_id)
+
 
         
-async def broadcast_last_discarted_cards(player_id : int) : 
-    db = SessionLocal() 
+def _dropped_cards_message(cardsDropped) -> str:
+    if not cardsDropped:
+        raise HTTPException(status_code=404, detail="No cards found in the discard pile for this game.")
+    return _message("droppedCards", _serialize(_CARDS, cardsDropped))
+
+def _discard_pile(db: Session, game_id: int) -> list:
+    # Con herencia de tabla única select(Card) ya devuelve Detective/Event sin joins
+    stmt = (
+        select(Card)
+        .where(Card.game_id == game_id, Card.dropped == True)
+        .order_by(desc(Card.discardInt))
+        .limit(5)
+    )
+    return db.execute(stmt).scalars().all()
+
+def _player_game(player_id: int) -> Optional[int]:
+    game_id = gameStateManager.game_of(Player, player_id)
+    if game_id is not None:
+        return game_id
+    db = ReadSessionLocal()
+    try:
+        return db.query(Player.game_id).filter(Player.player_id == player_id).scalar()
+    finally:
+        db.close()
+
+def _last_discarted_cards_messages(player_id : int, game_id : Optional[int] = None) -> tuple[int, dict]:
+    if game_id is None:
+        game_id = gameStateManager.game_of(Player, player_id)
+    state = gameStateManager.get(game_id) if game_id is not None else None
+    if state is not None:
+        cardsDropped = state.discard_pile(limit=5)
+        dropped = _dropped_cards_message(cardsDropped)
+        return game_id, _with_messages(_game_channel_messages(state), after=[dropped])
+    db = ReadSessionLocal() 
     try : 
-        player = db.query(Player).filter(Player.player_id == player_id).first()
-        game_id = player.game_id
-        polymorphic_loader = orm.with_polymorphic(Card, [Detective, Event])
-        stmt = (
-            select(polymorphic_loader)
-            .where(Card.game_id == game_id, Card.dropped == True)
-            .order_by(desc(Card.discardInt))
-            .limit(5)
-        )
-        cardsDropped = db.execute(stmt).scalars().all()
+        if game_id is None:
+            player = db.query(Player).filter(Player.player_id == player_id).first()
+            game_id = player.game_id
+        cardsDropped = _discard_pile(db, game_id)
         if not cardsDropped:
             raise HTTPException(status_code=404, detail="No cards found in the discard pile for this game.")
         
         #actualizo mano de jugador
-        players = db.query(Player).options(
-                            joinedload(Player.cards),joinedload(Player.secrets)).filter(Player.game_id == game_id).all()
-        playersStateResponse = [Player_State.model_validate(player) for player in players]
-        playersStateResponseJson = jsonable_encoder(playersStateResponse)
-        await gameManager.broadcast(json.dumps({
-            "type": "playersState",
-            "data": playersStateResponseJson
-        }), game_id)
-        # Se usa typeAdapter por una cuestion de compatibilidad de versiones entre python y pydantic
-        card_list_adapter = TypeAdapter(list[AllCardsResponse])
-
-        # Ahora validamos la lista completa contra el adaptador de listas.
-        cardsDroppedResponse = card_list_adapter.validate_python(cardsDropped, from_attributes=True)
-        
-        cardsResponseJson = jsonable_encoder(cardsDroppedResponse)
-        await gameManager.broadcast(json.dumps({
-            "type": "droppedCards",
-            "data": cardsResponseJson
-        }), game_id)
+        dropped = _dropped_cards_message(cardsDropped)
+        return game_id, {viewer: [players, dropped] for viewer, players in _players_state_message(db, game_id).items()}
     finally : 
         db.close()   
 
+async def broadcast_last_discarted_cards(player_id : Optional[int] = None, game_id : Optional[int] = None) : 
+    # Se identifica la partida por el jugador que descartó o directamente con game_id
+    if _pending_broadcasts.get() is not None:
+        if game_id is None:
+            game_id = await run_db(_player_game, player_id)
+        if _defer(game_id, "dropped"):
+            return
+    game_id, views = await run_db(_last_discarted_cards_messages, player_id, game_id)
+    await _send_views(views, game_id)
+
          
-async def broadcast_card_draft(game_id : int) : 
-    db = SessionLocal()
+def _draft_cards_message(cardsDraft) -> str:
+    if not cardsDraft:
+        raise HTTPException(status_code=404, detail="No cards found in the draft pile for this game.")
+    return _message("draftCards", _serialize(_CARDS, cardsDraft))
+
+def _draft_pile(db: Session, game_id: int) -> list:
+    # Con herencia de tabla única select(Card) ya devuelve Detective/Event sin joins
+    stmt = (
+        select(Card)
+        .where(Card.game_id == game_id, Card.draft == True)
+        .limit(3)
+    )
+    return db.execute(stmt).scalars().all()
+
+def _card_draft_message(game_id : int) -> str:
+    state = gameStateManager.get(game_id)
+    if state is not None:
+        return _draft_cards_message(state.draft_pile()[:3])
+    db = ReadSessionLocal()
     try : 
-        polymorphic_loader = orm.with_polymorphic(Card, [Detective, Event])
-        stmt = (
-            select(polymorphic_loader)
-            .where(Card.game_id == game_id, Card.draft == True)
-            .limit(3)
-        )
-        cardsDraft = db.execute(stmt).scalars().all()
-        if not cardsDraft:
-            raise HTTPException(status_code=404, detail="No cards found in the draft pile for this game.")
-
-        # Se usa typeAdapter por una cuestion de compatibilidad de versiones entre python y pydantic
-        card_list_adapter = TypeAdapter(list[AllCardsResponse])
-
-        # Ahora validamos la lista completa contra el adaptador de listas.
-        cardsDraftResponse = card_list_adapter.validate_python(cardsDraft, from_attributes=True)
-
-        cardsResponseJson = jsonable_encoder(cardsDraftResponse)
-        await gameManager.broadcast(json.dumps({
-            "type": "draftCards",
-            "data": cardsResponseJson
-        }), game_id)   
+        return _draft_cards_message(_draft_pile(db, game_id))
     finally : 
         db.close()
 
- 
-
-
-
-
-
-         
-    
\ No newline at end of file
+async def broadcast_card_draft(game_id : int) : 
+    if _defer(game_id, "draft"):
+        return
+    message = await run_db(_card_draft_message, game_id)
+    await gameManager.broadcast(message, game_id)
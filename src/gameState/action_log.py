@@ -0,0 +1,200 @@
+"""
+Registro de acciones de las partidas y su reproducción.
+
+Las rutas declaran cada acción con `log_action(db, game_id, "pickup", player_id, card_id=...)`
+antes de hacer commit. Al commitear se escribe una fila en game_actions por acción, en
+la misma transacción, con las filas que cambió la transacción tal como las junta el
+estado en memoria ([tipo, tabla, pk, valores]). Si una transacción declara varias
+acciones de la misma partida, sus cambios quedan en la última. El orden (`seq`) sale
+de games.action_seq, que se avanza con un UPDATE atómico: dos acciones concurrentes
+sobre la misma partida se numeran en el orden en que commitean.
+
+La acción "start" guarda la partida recién repartida completa (`snapshot`), y `replay`
+reconstruye un GameState a partir de ahí aplicando los cambios de cada acción, sin
+tocar la base. Para comparar una partida con su registro:
+
+    python -m src.gameState.action_log <game_id> [--upto SEQ]
+
+Se desactiva con GAME_ACTION_LOG=false.
+"""
+import argparse
+import datetime
+import json
+import os
+from typing import Iterable, Optional
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session
+from src.database.models import Game, GameAction
+from src.gameState.game_state import (_CHANGES_KEY, _GAME_FIELDS, _TRACKED, SYNCED_OPTION, GameState,
+                                      GameStateManager, _new_state, gameStateManager)
+
+ACTION_LOG_ENABLED = os.getenv("GAME_ACTION_LOG", "true").lower() in ("1", "true", "yes", "on")
+
+_PENDING_KEY = "game_actions_pending"
+_MODELS = {model.__tablename__: model for model in _TRACKED}
+
+
+class ReplayError(Exception):
+    """El registro no alcanza para reconstruir la partida."""
+
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, (datetime.date, datetime.datetime)) else value
+
+
+def log_action(db: Session, game_id: int, action: str, player_id: Optional[int] = None, **data):
+    """Declara una acción de la partida: se escribe con el próximo commit de `db` (un rollback la descarta)."""
+    if ACTION_LOG_ENABLED:
+        db.info.setdefault(_PENDING_KEY, []).append((game_id, action, player_id, data))
+
+
+def _game_of(kind, model, pk, values) -> Optional[int]:
+    if model is None:
+        return None
+    if model is Game:
+        return pk
+    return values.get("game_id") or gameStateManager.game_of(model, pk)
+
+
+def _serialize(changes: Iterable[tuple]) -> list:
+    return [[kind, model.__tablename__ if model is not None else None, pk,
+             {f: _json_value(v) for f, v in values.items()} if values is not None else None]
+            for kind, model, pk, values in changes]
+
+
+def _reserve_seq(session: Session, game_id: int, amount: int) -> Optional[int]:
+    """Primer seq de `amount` acciones seguidas de la partida (None si la partida ya no existe)."""
+    stmt = update(Game).where(Game.game_id == game_id).values(action_seq=Game.action_seq + amount)
+    options = {SYNCED_OPTION: True, "synchronize_session": False}
+    if session.get_bind().dialect.update_returning:
+        last = session.execute(stmt.returning(Game.action_seq), execution_options=options).scalar_one_or_none()
+    else:
+        session.execute(stmt, execution_options=options)
+        last = session.query(Game.action_seq).filter(Game.game_id == game_id).scalar()
+    return None if last is None else last - amount + 1
+
+
+@event.listens_for(Session, "before_commit")
+def _write_actions(session):
+    if not session.info.get(_PENDING_KEY):
+        return
+    # Lo que falta flushear también es parte de las acciones
+    session.flush()
+    pending = session.info.pop(_PENDING_KEY)
+    changes = session.info.get(_CHANGES_KEY, [])
+    games = list(dict.fromkeys(game_id for game_id, *_ in pending))
+    for game_id in games:
+        actions = [p for p in pending if p[0] == game_id]
+        first = _reserve_seq(session, game_id, len(actions))
+        if first is None:
+            continue
+        # Con una sola partida en la transacción, las filas sin game_id (contadores) también son suyas
+        own = changes if len(games) == 1 else [c for c in changes if _game_of(*c) == game_id]
+        for offset, (_, action, player_id, data) in enumerate(actions):
+            last = offset == len(actions) - 1
+            # Una acción con `snapshot` ya trae la partida completa
+            logged = _serialize(own) if last and "snapshot" not in data else []
+            session.add(GameAction(game_id=game_id, seq=first + offset, action=action, player_id=player_id,
+                                   data={k: _json_value(v) for k, v in data.items()}, changes=logged))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_actions(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+# --- Snapshots y reproducción ---
+
+def snapshot_of(state: GameState) -> dict:
+    """La partida en memoria como dict serializable en JSON (el `snapshot` de la acción "start")."""
+    snapshot = {"game": {f: _json_value(getattr(state, f)) for f in _GAME_FIELDS}}
+    for model, (_, collection, _) in _TRACKED.items():
+        if collection is not None:
+            snapshot[collection] = [{f: _json_value(getattr(row, f)) for f in row.__slots__}
+                                    for row in getattr(state, collection).values()]
+    return snapshot
+
+
+def read_snapshot(db: Session, game_id: int) -> Optional[dict]:
+    """Snapshot de la partida leído de la base (incluye lo flusheado y no commiteado)."""
+    state = gameStateManager._read(db, game_id)
+    return snapshot_of(state) if state is not None else None
+
+
+def state_from_snapshot(snapshot: dict) -> GameState:
+    state = _new_state(Game, snapshot["game"])
+    for model, (_, collection, pk) in _TRACKED.items():
+        if collection is not None:
+            getattr(state, collection).update((row[pk], _new_state(model, row)) for row in snapshot[collection])
+    return state
+
+
+class _ReplayManager(GameStateManager):
+    """Aplica los cambios del registro sobre una única partida, sin cache ni invalidaciones."""
+
+    def __init__(self, state: GameState):
+        super().__init__(max_games=1)
+        self._store(state)
+        self.state = state
+
+    def evict(self, game_id: int):
+        raise ReplayError(f"El registro de la partida {game_id} no coincide con sus filas")
+
+    def replay_changes(self, seq: int, changes: list):
+        state = self.state
+        rows = []
+        for kind, table, pk, values in changes:
+            if kind in ("evict", "bulk"):
+                raise ReplayError(f"La acción {seq} tiene una sentencia masiva sin valores")
+            rows.append((kind, _MODELS[table], pk, values))
+        # Igual que en apply: los deltas de contadores van al final
+        for kind, model, pk, values in sorted(rows, key=lambda row: row[0] == "delta"):
+            game_id = pk if model is Game else values.get("game_id") or self._owner[model].get(pk)
+            if game_id != state.game_id:
+                continue
+            if model is Game:
+                self._apply_game(kind, state, values)
+            else:
+                self._apply_row(kind, state, model, pk, values)
+        state.version = seq
+
+
+def replay(actions: Iterable, upto_seq: Optional[int] = None) -> GameState:
+    """
+    Reconstruye la partida a partir de sus acciones (filas de game_actions u objetos con
+    seq, action, data y changes), desde el último "start" hasta `upto_seq` inclusive.
+    """
+    actions = sorted(actions, key=lambda a: a.seq)
+    if upto_seq is not None:
+        actions = [a for a in actions if a.seq <= upto_seq]
+    start = next((i for i in range(len(actions) - 1, -1, -1) if "snapshot" in actions[i].data), None)
+    if start is None:
+        raise ReplayError("El registro no tiene el inicio de la partida")
+    manager = _ReplayManager(state_from_snapshot(actions[start].data["snapshot"]))
+    manager.state.version = actions[start].seq
+    for action in actions[start + 1:]:
+        manager.replay_changes(action.seq, action.changes)
+    return manager.state
+
+
+def replay_game(db: Session, game_id: int, upto_seq: Optional[int] = None) -> GameState:
+    actions = db.query(GameAction).filter(GameAction.game_id == game_id).order_by(GameAction.seq).all()
+    return replay(actions, upto_seq)
+
+
+def main():
+    from src.database.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Reproduce el registro de una partida y lo compara con la base")
+    parser.add_argument("game_id", type=int)
+    parser.add_argument("--upto", type=int, default=None, help="último seq a aplicar")
+    args = parser.parse_args()
+    with SessionLocal() as db:
+        replayed = snapshot_of(replay_game(db, args.game_id, args.upto))
+        if args.upto is None:
+            print("coincide con la base" if replayed == read_snapshot(db, args.game_id) else "NO coincide con la base")
+        print(json.dumps(replayed, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,567 @@
+"""
+Estado en memoria de las partidas en curso.
+
+`gameStateManager` guarda, por proceso, una copia compacta (objetos con __slots__) de
+cada partida viva: el juego, sus jugadores, cartas, secretos y sets. Se carga una sola
+vez por partida y después se mantiene al día con los eventos de la Session de
+SQLAlchemy: lo que se flushea se junta en la sesión y se aplica recién cuando el
+commit sale bien (un rollback lo descarta). La base sigue siendo la fuente de verdad.
+
+Con eso las rutas validan acciones y los broadcasts arman sus mensajes sin volver a
+leer la base, y las filas a modificar se adjuntan a la sesión con `attach` sin SELECT.
+
+Con varios workers cada uno tiene su propia copia: `share` publica en el broker de
+WebSocket las partidas que cambió cada commit y los demás workers las descartan, para
+volver a leerlas de la base en su próxima acción. Sin un broker entre workers
+(WS_BROKER) el cache solo es correcto con un único proceso: con varios workers
+(WEB_CONCURRENCY) se apaga al arrancar (connection_manager.share_game_state).
+"""
+import os
+import threading
+import uuid
+from collections import OrderedDict, deque
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.util import identity_key
+from src.database.models import Card, Detective, Event, Game, Player, Secrets, Set
+
+
+class CardState:
+    __slots__ = ("card_id", "type", "name", "game_id", "player_id", "picked_up", "dropped",
+                 "draft", "discardInt", "quantity_set", "set_id", "deck_position")
+
+
+class SecretState:
+    __slots__ = ("secret_id", "game_id", "player_id", "murderer", "acomplice", "revelated")
+
+
+class SetState:
+    __slots__ = ("set_id", "name", "game_id", "player_id")
+
+
+class PlayerState:
+    __slots__ = ("player_id", "name", "host", "game_id", "birth_date", "turn_order", "avatar", "hand_size")
+
+
+class GameState:
+    __slots__ = ("game_id", "name", "status", "max_players", "min_players", "players_amount",
+                 "current_turn", "cards_left", "discard_seq", "players", "cards", "secrets", "sets", "version",
+                 "turn_sequence", "journal", "sent_version", "snapshot_version")
+
+    def __init__(self):
+        self.players: Dict[int, PlayerState] = {}
+        self.cards: Dict[int, CardState] = {}
+        self.secrets: Dict[int, SecretState] = {}
+        self.sets: Dict[int, SetState] = {}
+        # Se incrementa con cada commit que toca la partida
+        self.version = 0
+        # Últimos commits: (versión, {(modelo, pk): (audiencia antes, campos cambiados)})
+        self.journal: deque = deque(maxlen=JOURNAL_SIZE)
+        # Versión que ya recibieron los sockets de la partida y la del último estado completo
+        self.sent_version: Optional[int] = None
+        self.snapshot_version: Optional[int] = None
+        # player_ids en orden de turno; se calcula al pedirlo y se descarta cuando cambia un jugador
+        self.turn_sequence: Optional[List[int]] = None
+
+    # --- Consultas sobre el estado (todas en memoria) ---
+
+    def hand(self, player_id: int) -> List[CardState]:
+        """Cartas en mano, igual que la relación Player.cards."""
+        return [c for c in self.cards.values() if c.player_id == player_id and not c.dropped]
+
+    def hand_size(self, player_id: int) -> int:
+        """Cartas levantadas y no descartadas (contador players.hand_size)."""
+        return self.players[player_id].hand_size
+
+    def turn_players(self) -> List[int]:
+        """player_ids ordenados por turn_order (los que todavía no tienen turno no entran)."""
+        if self.turn_sequence is None:
+            ordered = sorted((p for p in self.players.values() if p.turn_order is not None), key=lambda p: p.turn_order)
+            self.turn_sequence = [p.player_id for p in ordered]
+        return self.turn_sequence
+
+    def current_player(self) -> Optional[int]:
+        """player_id del jugador de turno, sin consultar la base."""
+        sequence = self.turn_players()
+        if not self.current_turn or self.current_turn > len(sequence):
+            return None
+        return sequence[self.current_turn - 1]
+
+    def next_turn(self) -> int:
+        """Turno que sigue a current_turn (vuelve a 1 después del último jugador)."""
+        current = self.current_turn or 0
+        return current + 1 if current < self.players_amount else 1
+
+    def deck(self) -> List[CardState]:
+        """Mazo para robar (sin dueño, fuera del draft y del descarte), en orden de robo."""
+        return _draw_order(c for c in self.cards.values() if not c.dropped and not c.picked_up and not c.draft)
+
+    def draft_pile(self) -> List[CardState]:
+        return [c for c in self.cards.values() if c.draft]
+
+    def discard_pile(self, limit: Optional[int] = None) -> List[CardState]:
+        """Pila de descarte, de la más reciente a la más antigua."""
+        pile = sorted((c for c in self.cards.values() if c.dropped), key=lambda c: c.discardInt or 0, reverse=True)
+        return pile[:limit] if limit is not None else pile
+
+    def player_secrets(self, player_id: int) -> List[SecretState]:
+        return [s for s in self.secrets.values() if s.player_id == player_id]
+
+    def player_sets(self, player_id: int) -> List[SetState]:
+        return [s for s in self.sets.values() if s.player_id == player_id]
+
+    def set_detectives(self, set_id: int) -> List[CardState]:
+        return [c for c in self.cards.values() if c.set_id == set_id]
+
+    def changes_since(self, version: int) -> Optional[Dict[Tuple[type, int], tuple]]:
+        """
+        Filas que cambiaron después de `version`: {(modelo, pk): (audiencia en `version`,
+        campos cambiados)}. None si el journal ya no llega tan atrás.
+        """
+        if version == self.version:
+            return {}
+        if not self.journal or version < self.journal[0][0] - 1 or version > self.version:
+            return None
+        changes = {}
+        # Copia: un commit en otro hilo puede agregar entradas mientras se recorre
+        for entry_version, rows in list(self.journal):
+            if entry_version <= version:
+                continue
+            for key, (before, fields) in rows.items():
+                if key in changes:
+                    changes[key][1].update(fields)
+                else:
+                    changes[key] = (before, set(fields))
+        return changes
+
+    # --- Vistas con la forma de las relaciones ORM, para validar con los schemas ---
+
+    def set_view(self, set_id: int) -> dict:
+        row = self.sets[set_id]
+        view = {f: getattr(row, f) for f in row.__slots__}
+        view["detective"] = self.set_detectives(set_id)
+        return view
+
+    def public_player_view(self, player_id: int) -> dict:
+        """Lo que ven los demás de un jugador: cuántas cartas tiene, sus secretos revelados y sus sets."""
+        row = self.players[player_id]
+        view = {f: getattr(row, f) for f in row.__slots__}
+        view["secrets"] = [s for s in self.player_secrets(player_id) if s.revelated]
+        view["sets"] = [self.set_view(s.set_id) for s in self.player_sets(player_id)]
+        return view
+
+    def player_view(self, player_id: int) -> dict:
+        row = self.players[player_id]
+        view = {f: getattr(row, f) for f in row.__slots__}
+        view["cards"] = self.hand(player_id)
+        view["secrets"] = self.player_secrets(player_id)
+        view["sets"] = [self.set_view(s.set_id) for s in self.player_sets(player_id)]
+        return view
+
+
+# Audiencia de una fila en gameUpdated/playersState
+EVERYONE = "everyone"
+
+
+def audience(model, row):
+    """
+    Quién ve la fila en el canal de la partida: EVERYONE, el player_id del único que la
+    ve (cartas en mano, secretos sin revelar) o None (mazo, draft y descarte).
+    """
+    if row is None:
+        return None
+    if model is Card:
+        if row.set_id is not None:
+            return EVERYONE
+        return row.player_id if not row.dropped else None
+    if model is Secrets:
+        if row.player_id is None:
+            return None
+        return EVERYONE if row.revelated else row.player_id
+    return EVERYONE
+
+
+def sees(viewer: Optional[int], who) -> bool:
+    """Si el jugador `viewer` (None: un socket sin jugador) ve una fila con audiencia `who`."""
+    return who == EVERYONE or (who is not None and who == viewer)
+
+
+def _draw_order(cards: Iterable[CardState]) -> List[CardState]:
+    # Las cartas sin deck_position (partidas anteriores al orden barajado) van al final
+    return sorted(cards, key=lambda c: (c.deck_position is None, c.deck_position or 0, c.card_id))
+
+
+# Modelo ORM -> (clase de estado, colección dentro de GameState, nombre de la PK)
+_TRACKED = {
+    Game: (GameState, None, "game_id"),
+    Player: (PlayerState, "players", "player_id"),
+    Card: (CardState, "cards", "card_id"),
+    Secrets: (SecretState, "secrets", "secret_id"),
+    Set: (SetState, "sets", "set_id"),
+}
+_GAME_FIELDS = tuple(f for f in GameState.__slots__
+                     if f not in ("players", "cards", "secrets", "sets", "version", "turn_sequence",
+                                  "journal", "sent_version", "snapshot_version"))
+_CHANGES_KEY = "game_state_changes"
+JOURNAL_SIZE = int(os.getenv("GAME_STATE_JOURNAL", 64))
+# Opción de ejecución para sentencias masivas que tocan una sola partida: en vez de
+# vaciar todo el cache, solo se descarta esa partida al hacer commit.
+GAME_ID_OPTION = "game_state_game_id"
+# Opción para sentencias cuyo efecto se informa a mano con `record`: no invalidan nada.
+SYNCED_OPTION = "game_state_synced"
+
+
+def _tracked_model(obj):
+    for model in _TRACKED:
+        if isinstance(obj, model):
+            return model
+    return None
+
+
+def _fields(model):
+    state_cls = _TRACKED[model][0]
+    return _GAME_FIELDS if state_cls is GameState else state_cls.__slots__
+
+
+def _new_state(model, values: dict):
+    state_cls = _TRACKED[model][0]
+    state = state_cls()
+    for field in _fields(model):
+        setattr(state, field, values.get(field))
+    return state
+
+
+class GameStateManager:
+    def __init__(self, max_games: int = 512, enabled: bool = True):
+        self.max_games = max_games
+        self.enabled = enabled
+        self._games: "OrderedDict[int, GameState]" = OrderedDict()
+        # Índices fila -> partida, para aplicar cambios de filas que no traen game_id
+        self._owner: Dict[type, Dict[int, int]] = {model: {} for model in _TRACKED}
+        # Cuenta commits por partida aunque no esté cargada, para descartar cargas viejas
+        self._generation: Dict[int, int] = {}
+        self._lock = threading.RLock()
+        # Broker por el que se avisa a los otros workers qué partidas cambiaron (`share`)
+        self._broker = None
+        self._origin = uuid.uuid4().hex
+
+    # --- Acceso ---
+
+    def get(self, game_id: int) -> Optional[GameState]:
+        """Devuelve la partida si está cargada, sin tocar la base."""
+        with self._lock:
+            state = self._games.get(game_id)
+            if state is not None:
+                self._games.move_to_end(game_id)
+            return state
+
+    def load(self, db: Session, game_id: int) -> Optional[GameState]:
+        """Devuelve la partida cargándola de la base la primera vez. None si no existe."""
+        if not self.enabled:
+            # Sin cache se lee la partida completa en cada acción
+            return self._read(db, game_id)
+        state = self.get(game_id)
+        if state is not None:
+            return state
+        for _ in range(3):
+            generation = self._generation.get(game_id, 0)
+            state = self._read(db, game_id)
+            if state is None:
+                return None
+            with self._lock:
+                # Si hubo un commit sobre la partida mientras se leía, la lectura puede estar vieja
+                if self._generation.get(game_id, 0) == generation:
+                    self._store(state)
+                    return state
+        return state
+
+    def load_for(self, db: Session, model, pk: int) -> Optional[GameState]:
+        """Partida a la que pertenece una fila (jugador, carta, secreto o set). None si la fila no existe."""
+        game_id = self.game_of(model, pk)
+        if game_id is None:
+            column = inspect(model).primary_key[0]
+            game_id = db.query(model.game_id).filter(column == pk).scalar()
+            if game_id is None:
+                return None
+        return self.load(db, game_id)
+
+    def row(self, model, pk: int):
+        """Fila del estado en memoria (PlayerState, CardState, ...) o None si su partida no está cargada."""
+        with self._lock:
+            if model is Game:
+                return self._games.get(pk)
+            game_id = self._owner[model].get(pk)
+            state = self._games.get(game_id) if game_id is not None else None
+            return getattr(state, _TRACKED[model][1]).get(pk) if state is not None else None
+
+    def game_of(self, model, pk: int) -> Optional[int]:
+        """game_id de una fila (jugador, carta, secreto o set) si su partida está cargada."""
+        with self._lock:
+            return self._owner[model].get(pk)
+
+    def evict(self, game_id: int):
+        with self._lock:
+            state = self._games.pop(game_id, None)
+            if state is None:
+                return
+            for model, collection in ((Player, state.players), (Card, state.cards),
+                                      (Secrets, state.secrets), (Set, state.sets)):
+                for pk in collection:
+                    self._owner[model].pop(pk, None)
+
+    def clear(self):
+        with self._lock:
+            self._games.clear()
+            for index in self._owner.values():
+                index.clear()
+            self._generation.clear()
+
+    # --- Varios workers ---
+
+    def share(self, broker, channel: str = "game-state"):
+        """
+        Mantiene las copias de varios workers: después de cada commit se publican en
+        `channel` las partidas que cambiaron, y las que publican los demás se descartan.
+        """
+        self._broker = broker
+        self._channel = channel
+        broker.subscribe(channel, self._invalidate)
+
+    def _announce(self, game_ids: Optional[Iterable[int]]):
+        """Publica las partidas commiteadas (None: todas, una sentencia masiva)."""
+        if self._broker is not None:
+            games = sorted(game_ids) if game_ids is not None else None
+            if games != []:
+                self._broker.publish_soon(self._channel, {"origin": self._origin, "games": games})
+
+    def _invalidate(self, message: dict):
+        if message["origin"] == self._origin:
+            return
+        if message["games"] is None:
+            self.clear()
+            return
+        with self._lock:
+            for game_id in message["games"]:
+                # Como un commit propio: una carga que estaba leyendo la partida se descarta
+                self._generation[game_id] = self._generation.get(game_id, 0) + 1
+                self.evict(game_id)
+
+    # --- Carga ---
+
+    def _read(self, db: Session, game_id: int) -> Optional[GameState]:
+        game = db.query(*[Game.__table__.c[f] for f in _GAME_FIELDS]).filter(Game.game_id == game_id).first()
+        if game is None:
+            return None
+        state = _new_state(Game, game._asdict())
+        for model in (Player, Card, Secrets, Set):
+            _, collection, pk = _TRACKED[model]
+            # Columnas de la tabla: con herencia de tabla única las de Detective no filtran por tipo
+            table = model.__table__
+            columns = [table.c[f] for f in _fields(model)]
+            for row in db.query(*columns).filter(table.c.game_id == game_id).order_by(table.c[pk]):
+                getattr(state, collection)[getattr(row, pk)] = _new_state(model, row._asdict())
+        return state
+
+    def _store(self, state: GameState):
+        self._games[state.game_id] = state
+        self._games.move_to_end(state.game_id)
+        for model, collection in ((Player, state.players), (Card, state.cards),
+                                  (Secrets, state.secrets), (Set, state.sets)):
+            for pk in collection:
+                self._owner[model][pk] = state.game_id
+        while len(self._games) > self.max_games:
+            self.evict(next(iter(self._games)))
+
+    # --- Aplicación de cambios commiteados ---
+
+    def apply(self, changes: Iterable[tuple]):
+        with self._lock:
+            touched = set()
+            # Por partida: lo que cambió en este commit, para mandar deltas a los sockets
+            journal: Dict[int, dict] = {}
+            # Los deltas de contadores van al final: se suman sobre las filas ya insertadas
+            changes = sorted(changes, key=lambda change: change[0] == "delta")
+            for kind, model, pk, values in changes:
+                game_id = values.get("game_id") if model is not Game else pk
+                if game_id is None:
+                    game_id = self._owner[model].get(pk)
+                if game_id is None:
+                    continue
+                touched.add(game_id)
+                state = self._games.get(game_id)
+                if state is None:
+                    continue
+                rows = journal.setdefault(game_id, {})
+                if (model, pk) not in rows:
+                    before = state if model is Game else getattr(state, _TRACKED[model][1]).get(pk)
+                    rows[(model, pk)] = (audience(model, before), set())
+                rows[(model, pk)][1].update(values)
+                if model is Game:
+                    self._apply_game(kind, state, values)
+                else:
+                    self._apply_row(kind, state, model, pk, values)
+            for game_id in touched:
+                self._generation[game_id] = self._generation.get(game_id, 0) + 1
+                state = self._games.get(game_id)
+                if state is not None:
+                    state.version += 1
+                    state.journal.append((state.version, journal.get(game_id, {})))
+                    # Las partidas terminadas no reciben más acciones: se liberan
+                    if state.status == "finished":
+                        self.evict(game_id)
+        self._announce(touched)
+
+    def _apply_game(self, kind, state: GameState, values: dict):
+        if kind in ("delete", "evict"):
+            self.evict(state.game_id)
+            return
+        for field, value in values.items():
+            if kind == "delta":
+                value = (getattr(state, field) or 0) + value
+            elif field == "discard_seq" and state.discard_seq is not None:
+                # Contador monotónico: commits concurrentes pueden aplicarse en otro orden
+                value = max(value, state.discard_seq)
+            if field in _GAME_FIELDS:
+                setattr(state, field, value)
+
+    def _apply_row(self, kind, state: GameState, model, pk: int, values: dict):
+        collection = getattr(state, _TRACKED[model][1])
+        if model is Player:
+            state.turn_sequence = None
+        if kind == "delete":
+            collection.pop(pk, None)
+            self._owner[model].pop(pk, None)
+            return
+        row = collection.get(pk)
+        if row is None:
+            if kind != "insert":
+                # Fila que no conocíamos: no hay forma segura de completarla
+                self.evict(state.game_id)
+                return
+            collection[pk] = _new_state(model, values)
+            self._owner[model][pk] = state.game_id
+        else:
+            for field, value in values.items():
+                if field in row.__slots__:
+                    if kind == "delta":
+                        value = (getattr(row, field) or 0) + value
+                    setattr(row, field, value)
+
+
+def record(db: Session, model, pk: int, **values):
+    """
+    Informa valores que se escribieron con una sentencia fuera del unit of work
+    (ejecutada con SYNCED_OPTION): se aplican al estado en memoria con el commit.
+    """
+    db.info.setdefault(_CHANGES_KEY, []).append(("update", model, pk, values))
+
+
+def record_delta(db: Session, model, pk: int, **deltas):
+    """Como `record`, pero los valores se suman a los actuales (contadores)."""
+    db.info.setdefault(_CHANGES_KEY, []).append(("delta", model, pk, deltas))
+
+
+def attach(db: Session, row):
+    """
+    Devuelve la instancia ORM de una fila del estado en memoria asociada a `db`,
+    sin hacer SELECT: si la sesión ya la tiene se usa esa, si no se construye con los
+    valores conocidos y se adjunta como persistente. Los cambios que se le hagan
+    generan un UPDATE normal al hacer commit.
+    """
+    if isinstance(row, CardState):
+        model, pk = Card, row.card_id
+        cls = Detective if row.type == "detective" else Event
+    else:
+        model = next(m for m, (state_cls, _, _) in _TRACKED.items() if isinstance(row, state_cls))
+        cls, pk = model, getattr(row, _TRACKED[model][2])
+    existing = db.identity_map.get(identity_key(model, pk))
+    if existing is not None:
+        return existing
+    fields = _GAME_FIELDS if model is Game else row.__slots__
+    instance = cls(**{f: getattr(row, f) for f in fields if hasattr(cls, f)})
+    make_transient_to_detached(instance)
+    db.add(instance)
+    return instance
+
+
+gameStateManager = GameStateManager(
+    max_games=int(os.getenv("GAME_STATE_MAX_GAMES", 512)),
+    enabled=os.getenv("GAME_STATE_CACHE", "true").lower() in ("1", "true", "yes", "on"),
+)
+
+
+# --- Sincronización con la base a través de los eventos de la Session ---
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session, flush_context):
+    changes = session.info.setdefault(_CHANGES_KEY, [])
+    for kind, objects in (("insert", session.new), ("update", session.dirty), ("delete", session.deleted)):
+        for obj in objects:
+            model = _tracked_model(obj)
+            if model is None:
+                continue
+            insp = inspect(obj)
+            pk = getattr(obj, _TRACKED[model][2]) if kind != "delete" else insp.identity[0]
+            if kind == "insert":
+                # Lo que no está en el dict no se asignó: en la base quedó NULL
+                values = {f: insp.dict.get(f) for f in _fields(model)}
+            elif kind == "update":
+                values = {f: insp.dict[f] for f in _fields(model)
+                          if f in insp.attrs and insp.attrs[f].history.has_changes()}
+                if "game_id" in insp.dict:
+                    values.setdefault("game_id", insp.dict["game_id"])
+                if not values:
+                    continue
+            else:
+                values = {"game_id": insp.dict.get("game_id")}
+            changes.append((kind, model, pk, values))
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _bulk_statement(orm_execute_state):
+    # INSERT/UPDATE/DELETE masivos no pasan por el flush: se invalida lo que haya en memoria
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    if orm_execute_state.execution_options.get(SYNCED_OPTION):
+        return
+    game_id = orm_execute_state.execution_options.get(GAME_ID_OPTION)
+    change = ("evict", Game, game_id, {}) if game_id is not None else ("bulk", None, None, None)
+    orm_execute_state.session.info.setdefault(_CHANGES_KEY, []).append(change)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_changes(session):
+    changes = session.info.pop(_CHANGES_KEY, [])
+    if any(kind == "bulk" for kind, *_ in changes):
+        gameStateManager.clear()
+        gameStateManager._announce(None)
+    elif changes:
+        gameStateManager.apply(changes)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _repopulate(session, transaction):
+    # El commit expira las instancias de la sesión; las que son de partidas en memoria
+    # se vuelven a llenar desde el estado para que leerlas no dispare un SELECT.
+    if transaction.parent is not None or not gameStateManager.enabled:
+        return
+    for obj in list(session.identity_map.values()):
+        model = _tracked_model(obj)
+        if model is None:
+            continue
+        insp = inspect(obj)
+        if not insp.expired_attributes:
+            continue
+        row = gameStateManager.row(model, insp.identity[0])
+        if row is None:
+            continue
+        for field in _fields(model):
+            if field in insp.expired_attributes and field in insp.mapper.column_attrs:
+                set_committed_value(obj, field, getattr(row, field))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session):
+    session.info.pop(_CHANGES_KEY, None)
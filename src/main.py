@@ -1,4 +1,13 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+import logging
+import anyio.to_thread
+from src.database.archive import ArchiveSettings, run_archiver
+from src.database.database import engine, init_db, poolMetrics, settings
+from src.database.pool_metrics import RouteTagMiddleware, log_pool_metrics, pool_status
+from src.database.replica import ReadYourWritesMiddleware
+from src.database.services.services_websockets import BroadcastBufferMiddleware
 from src.routes.players_routes import player
 from src.routes.games_routes import game
 from src.routes.cards_routes import card
@@ -6,36 +15,69 @@ from src.routes.secrets_routes import secret
 from src.routes.websocket_routes import ws
 from src.routes.set_routes import set
 from src.routes.event_routes import events
+from src.routes.metrics_routes import metrics
+from src.webSocket.connection_manager import broker
 from fastapi.middleware.cors import CORSMiddleware
 
 
-app = FastAPI(
-    title = "Agatha Christie's Death on the Cards API ",
-    description = "API to connect with server for the respective game"
-)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Las tablas se crean al arrancar el servidor y no al importar el módulo,
+    # así importar la app (workers, tests) no abre conexiones a la base de datos.
+    init_db()
+    if settings.threadpool_size > 0:
+        anyio.to_thread.current_default_thread_limiter().total_tokens = settings.threadpool_size
+    logging.getLogger(__name__).info("Pool de conexiones: %s, threadpool=%s",
+                                     pool_status(engine.pool), anyio.to_thread.current_default_thread_limiter().total_tokens)
+    tasks = []
+    # Archivado periódico de partidas terminadas (GAME_ARCHIVE_INTERVAL=0 lo desactiva)
+    archive_settings = ArchiveSettings()
+    if archive_settings.interval > 0:
+        tasks.append(asyncio.create_task(run_archiver(archive_settings)))
+    if settings.log_interval > 0:
+        tasks.append(asyncio.create_task(log_pool_metrics(engine, poolMetrics, settings.log_interval)))
+    # Broadcasts entre workers (WS_BROKER; en memoria no hace nada)
+    await broker.start()
+    yield
+    await broker.stop()
+    for task in tasks:
+        task.cancel()
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # Podés poner la URL de tu frontend: ["http://localhost:5173"]
-    allow_credentials=True,
-    allow_methods=["*"],  # GET, POST, PUT, DELETE, OPTIONS
-    allow_headers=["*"],  # Authorization, Content-Type, etc.
-)
 
+def create_app() -> FastAPI:
+    app = FastAPI(
+        title = "Agatha Christie's Death on the Cards API ",
+        description = "API to connect with server for the respective game",
+        lifespan = lifespan
+    )
 
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  # Podés poner la URL de tu frontend: ["http://localhost:5173"]
+        allow_credentials=True,
+        allow_methods=["*"],  # GET, POST, PUT, DELETE, OPTIONS
+        allow_headers=["*"],  # Authorization, Content-Type, etc.
+    )
+    # Un frame por partida con todos los broadcasts del request, antes de responder
+    app.add_middleware(BroadcastBufferMiddleware)
+    # Marca cada checkout del pool con la ruta que lo pidió (GET /metrics/db-pool)
+    app.add_middleware(RouteTagMiddleware)
+    # Las lecturas del request van a la réplica hasta que el request escribe (replica.py)
+    app.add_middleware(ReadYourWritesMiddleware)
 
+    @app.get("/")
+    def hola() :
+        return "Hola Mundo"
 
-@app.get("/")
-def hola() :
-    return "Hola Mundo"
-
-app.include_router(ws) 
-app.include_router(player)
-app.include_router(game)
-app.include_router(card)
-app.include_router(secret)
-app.include_router(set)
-app.include_router(events)
-
+    app.include_router(ws)
+    app.include_router(player)
+    app.include_router(game)
+    app.include_router(card)
+    app.include_router(secret)
+    app.include_router(set)
+    app.include_router(events)
+    app.include_router(metrics)
+    return app
 
 
+app = create_app()
@@ -1,18 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from sqlalchemy import desc, func  
-from src.database.database import SessionLocal, get_db
-from src.database.models import Card , Game , Detective , Event
-from src.database.services.services_cards import only_6 , replenish_draft_pile
+from src.database.database import SessionLocal, get_db, get_read_db, run_db, commit_db
+from src.database.models import Card , Game , Detective , Event, Player
+from src.gameState.game_state import gameStateManager, attach
+from src.gameState.action_log import log_action
+from src.database.services.services_cards import claim_from_deck, only_6 , replenish_draft_pile, reserve_discard_order
 from src.database.services.services_games import finish_game
 from src.schemas.card_schemas import Card_Response , Detective_Response , Event_Response, Discard_List_Request
 from src.database.services.services_websockets import broadcast_last_discarted_cards, broadcast_game_information , broadcast_player_state, broadcast_card_draft
-import random
 
 card = APIRouter()
 
 @card.get("/lobby/cards/{game_id}", tags=["Cards"], response_model=list[Card_Response])
-def list_cards_ingame(game_id: int, db: Session = Depends(get_db)):
+def list_cards_ingame(game_id: int, db: Session = Depends(get_read_db)):
     cards = db.query(Card).filter(Card.game_id == game_id).all()
     if not cards:
         raise HTTPException(status_code=404, detail="No cards found for the given game_id")
@@ -41,73 +42,78 @@ def list_events_ofplayer(player_id: int, db: Session = Depends(get_db)):
 
 @card.put("/cards/pick_up/{player_id},{game_id}", status_code=200, tags=["Cards"], response_model=Card_Response)
 async def pickup_a_card(player_id: int, game_id: int, db: Session = Depends(get_db)):
-    has_6_cards = only_6(player_id, db)
+    has_6_cards = await run_db(only_6, player_id, db)
     if has_6_cards:
         raise HTTPException(status_code=400, detail="The player already has 6 cards")
-    deck = db.query(Card).filter(Card.game_id == game_id, Card.dropped == False , Card.picked_up == False , Card.draft == False).all()
-    game = db.query(Game).filter(Game.game_id == game_id).first()
-    random.shuffle(deck)
+    # Mazo y partida salen del estado en memoria: la acción no relee la base.
+    # El mazo ya está barajado (deck_position): se roba la primera carta.
+    state = await run_db(gameStateManager.load, db, game_id)
+    deck = state.deck() if state else []
     if not deck: 
        await finish_game(game_id, db)
        raise HTTPException(status_code=400, detail="The player already has 6 cards")
 
-    if game.cards_left is None:
+    if state.cards_left is None:
        await finish_game(game_id, db)
-    card = deck[0]
     try:
-        card.picked_up = True
-        card.player_id = player_id
-        game.cards_left = len(deck) -1
-        if game.cards_left == 0:
+        card = await run_db(claim_from_deck, db, state, picked_up=True, player_id=player_id)
+    except Exception as e:
+        await run_db(db.rollback)
+        raise HTTPException(status_code=400, detail=f"Error assigning card to player: {str(e)}")
+    if card is None:
+        # Requests concurrentes se llevaron las cartas que quedaban
+        await run_db(db.rollback)
+        await finish_game(game_id, db)
+        raise HTTPException(status_code=400, detail="No cards left in the deck")
+    try:
+        log_action(db, game_id, "pickup", player_id, card_id=card.card_id)
+        # cards_left lo descuenta counters.py al hacer flush: esta es la última carta del mazo
+        if state.cards_left == 1:
             await finish_game(game_id, db)
-        db.commit()
-        db.refresh(card)
-        db.refresh(game)
+        await run_db(db.commit)
         await broadcast_game_information(game_id)
         return card
     except Exception as e:
-        db.rollback()
+        await run_db(db.rollback)
         raise HTTPException(status_code=400, detail=f"Error assigning card to player: {str(e)}")
 
 
 @card.put("/cards/drop/{player_id}" , status_code=200, tags = ["Cards"], response_model=Card_Response)
 async def discard_card(player_id : int , db: Session = Depends(get_db)):
-    card = db.query(Card).filter(Card.player_id == player_id , Card.dropped == False).first()
-    if not card:
+    state = await run_db(gameStateManager.load_for, db, Player, player_id)
+    hand = state.hand(player_id) if state else []
+    if not hand:
         raise HTTPException(status_code=404, detail="All cards dropped")       
     try:
-        # Encuentra el valor máximo actual de discardInt en la partida
-        max_discard = db.query(func.max(Card.discardInt)).filter(Card.game_id == card.game_id).scalar()
-        
-        # Asigna el siguiente valor en la secuencia
-        card.discardInt = (max_discard or 0) + 1
+        card = attach(db, hand[0])
+        # Siguiente valor en la secuencia de descarte de la partida
+        card.discardInt = await run_db(reserve_discard_order, state.game_id, 1, db)
         
         card.dropped = True
         card.picked_up = False
-        db.commit()
-        db.refresh(card)
+        log_action(db, state.game_id, "discard", player_id, card_ids=[card.card_id])
+        await run_db(db.commit)
         await broadcast_last_discarted_cards(player_id)
         return card
     except Exception as e:
-        db.rollback()
+        await run_db(db.rollback)
         raise HTTPException(status_code=400, detail=f"Error assigning card to player: {str(e)}")
     
 @card.put("/cards/game/drop/{player_id},{card_id}", status_code= 200 , tags = ["Cards"], response_model= Card_Response)
 def select_card_to_discard(player_id : int, card_id : int, db: Session = Depends (get_db)) : 
-    card = db.query(Card).filter(Card.player_id == player_id , Card.dropped == False, Card.card_id == card_id).first()
-    if not card:
+    state = gameStateManager.load_for(db, Player, player_id)
+    selected = next((c for c in state.hand(player_id) if c.card_id == card_id), None) if state else None
+    if not selected:
         raise HTTPException(status_code=404, detail="All cards dropped from player or card id invalid to player")       
     try:
-        # Encuentra el valor máximo actual de discardInt en la partida
-        max_discard = db.query(func.max(Card.discardInt)).filter(Card.game_id == card.game_id).scalar()
-
-        # Asigna el siguiente valor en la secuencia
-        card.discardInt = (max_discard or 0) + 1
+        card = attach(db, selected)
+        # Siguiente valor en la secuencia de descarte de la partida
+        card.discardInt = reserve_discard_order(state.game_id, 1, db)
 
         card.dropped = True
         card.picked_up = False
+        log_action(db, state.game_id, "discard", player_id, card_ids=[card_id])
         db.commit()
-        db.refresh(card)
         return card
     except Exception as e:
         db.rollback()
@@ -130,28 +136,30 @@ def get_draft_pile(game_id: int, db: Session = Depends(get_db)):
 
 @card.put("/cards/draft_pickup/{game_id},{card_id},{player_id}", status_code=200, tags=["Cards"], response_model=Card_Response)
 async def pick_up_draft_card(game_id: int, card_id: int, player_id: int, db: Session = Depends(get_db)):
-    card = db.query(Card).filter(Card.card_id == card_id, Card.game_id == game_id, Card.draft == True).first()
-    if not card:
+    state = await run_db(gameStateManager.load, db, game_id)
+    selected = state.cards.get(card_id) if state else None
+    if not selected or not selected.draft:
         raise HTTPException(status_code=404, detail="Card not found in draft pile.")
-    if only_6(player_id, db):
+    if await run_db(only_6, player_id, db):
         raise HTTPException(status_code=400, detail="The player already has 6 cards")    
     try:
+        card = attach(db, selected)
         card.draft = False
         card.player_id = player_id
         card.picked_up=True
-        replenish_draft_pile(game_id, db)
+        await run_db(replenish_draft_pile, game_id, db)
+        log_action(db, game_id, "draft_pick", player_id, card_id=card_id)
 
-        db.commit()
-        db.refresh(card)
+        await run_db(db.commit)
         await broadcast_game_information(game_id)
         await broadcast_card_draft(game_id)
         return card
     except Exception as e:
-        db.rollback()
+        await run_db(db.rollback)
         raise HTTPException(status_code=400, detail=f"Error picking up card: {str(e)}")
 
 @card.get("/cards/discard-pile/{game_id}", tags=["Cards"], response_model=list[Card_Response])
-def get_top_discard_pile(game_id: int, db: Session = Depends(get_db)):
+def get_top_discard_pile(game_id: int, db: Session = Depends(get_read_db)):
     """
     Obtiene las últimas 5 cartas de la pila de descarte, ordenadas de la más reciente a la más antigua.
     """
@@ -171,12 +179,10 @@ async def select_cards_to_discard(player_id: int, discard_request: Discard_List_
     if not card_ids:
         raise HTTPException(status_code=400, detail="Se requiere una lista de IDs de cartas.")
 
-    # Se buscan todas las cartas que el jugador quiere descartar
-    cards_to_discard = db.query(Card).filter(
-        Card.player_id == player_id,
-        Card.dropped == False,
-        Card.card_id.in_(card_ids)
-    ).all()
+    # Se buscan, en el estado en memoria, las cartas que el jugador quiere descartar
+    state = await run_db(gameStateManager.load_for, db, Player, player_id)
+    hand = {c.card_id: c for c in state.hand(player_id)} if state else {}
+    cards_to_discard = [hand[card_id] for card_id in dict.fromkeys(card_ids) if card_id in hand]
     
     # validación
     if len(cards_to_discard) != len(card_ids):
@@ -187,33 +193,29 @@ async def select_cards_to_discard(player_id: int, discard_request: Discard_List_
         )
 
     try:
-        # 3. ENCONTRAR EL MÁXIMO discardInt
-        max_discard = db.query(func.max(Card.discardInt)).filter(Card.game_id == cards_to_discard[0].game_id).scalar()
-        next_discard_int = (max_discard or 0) + 1
-        
-        updated_cards = []
+        # 3. RESERVAR LOS discardInt EN EL CONTADOR DE LA PARTIDA
+        next_discard_int = await run_db(reserve_discard_order, state.game_id, len(cards_to_discard), db)
 
         # 4. ITERAR Y ACTUALIZAR
-        for card_obj in cards_to_discard:
+        discarded = []
+        for selected in cards_to_discard:
+            card_obj = attach(db, selected)
+            discarded.append(card_obj)
             card_obj.discardInt = next_discard_int
             card_obj.dropped = True
             card_obj.picked_up = False
-            updated_cards.append(card_obj)
             next_discard_int += 1
+        log_action(db, state.game_id, "discard", player_id, card_ids=[c.card_id for c in cards_to_discard])
         
-        db.commit()
-
-        # 5. REFRESCAR Y RETORNAR (Uniformidad: refrescamos los objetos)
-        # Refrescamos los objetos para asegurarnos de que el ORM tenga los valores correctos
-        for card_obj in updated_cards:
-             db.refresh(card_obj)
+        # 5. COMMIT: el estado en memoria se actualiza con lo que se escribió
+        await run_db(db.commit)
 
         # 6. BROADCAST (La parte clave para que desaparezcan del frontend)
         await broadcast_last_discarted_cards(player_id)
         
-        return updated_cards
+        return discarded
         
     except Exception as e:
-        db.rollback()
+        await run_db(db.rollback)
         # Puedes añadir un manejo de HTTPException para uniformidad si no lo hiciste en el paso 2
-        raise HTTPException(status_code=500, detail=f"Error al descartar cartas seleccionadas: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error al descartar cartas seleccionadas: {str(e)}")
@@ -1,25 +1,30 @@
 import json
-from fastapi import APIRouter, Depends, HTTPException, WebSocket  #te permite definir las rutas o subrutas por separado
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, WebSocket  #te permite definir las rutas o subrutas por separado
 from sqlalchemy.orm import Session  
-from src.database.database import SessionLocal, get_db
-from src.database.models import Game 
-from src.schemas.games_schemas import Game_Base, Game_Response, Game_Initialized
+from src.database.database import SessionLocal, get_db, get_read_db, run_db, commit_db
+from src.database.models import Game, ArchivedGame
+from src.database.game_rng import new_seed
+from src.schemas.games_schemas import Game_Base, Game_Response, Game_Initialized, Archived_Game_Response, Archived_Game_Detail
 from src.database.services.services_games import assign_turn_to_players
-from src.database.services.services_cards import init_detective_cards , init_event_cards, deal_cards_to_players, setup_initial_draft_pile , deal_NSF
+from src.database.services.services_cards import init_detective_cards , init_event_cards, shuffle_deck, deal_cards_to_players, setup_initial_draft_pile , deal_NSF
 from src.database.services.services_secrets import init_secrets, deal_secrets_to_players
+from src.database.services.services_snapshots import snapshot_game, restore_game
 from src.database.services.services_websockets import broadcast_available_games, broadcast_card_draft, broadcast_game_information
 from src.webSocket.connection_manager import lobbyManager, gameManager
+from src.gameState.game_state import gameStateManager, attach
+from src.gameState.action_log import log_action, read_snapshot
 
 
 game = APIRouter()
 
 
 @game.get("/games",tags = ["Games"])
-def list_games (db: Session = Depends(get_db)) :
+def list_games (db: Session = Depends(get_read_db)) :
     return db.query(Game).all()
 
 @game.get("/games/availables",tags = ["Games"])
-def list_available_games (db : Session = Depends (get_db)): 
+def list_available_games (db : Session = Depends (get_read_db)): 
     return db.query(Game).filter((Game.status == "bootable") |  (Game.status == "waiting players")).all()
 
 @game.post ("/games", status_code=201, response_model = Game_Response,tags = ["Games"]) #devolvia un int y queria devolver una response con el schema de game_base
@@ -28,59 +33,75 @@ async def create_game (game : Game_Base, db: Session = Depends(get_db)) :
                         max_players = game.max_players,
                         min_players = game.min_players,
                         name = game.name,
-                        players_amount = 0)
+                        players_amount = 0,
+                        seed = game.seed if game.seed is not None else new_seed())
     db.add(new_game)
     try:
-        db.commit()
-        db.refresh(new_game)
+        await commit_db(db, new_game)
         await broadcast_available_games(db)
     except Exception as e:
-        db.rollback()
+        await run_db(db.rollback)
         raise HTTPException(status_code=400, detail=f"Error creating game: {str(e)}")
     return new_game
 
 
 @game.delete("/game/{game_id}", status_code=204, tags = ["Games"])
 async def delete_game(game_id: int, db:Session = Depends(get_db)):
-    game = db.get(Game, game_id) 
+    game = await run_db(db.get, Game, game_id) 
     if not game:
         raise HTTPException(status_code=404, detail="Game not found")
     try:
         db.delete(game)
-        db.commit()
+        await commit_db(db)
         await broadcast_available_games(db)
     except Exception as e:
-        db.rollback()
+        await run_db(db.rollback)
         raise HTTPException(status_code=400, detail=f"Error deleting game: {str(e)}")
     return None
 
 
 
+def start_game(game: Game, db: Session):
+    """
+    Secuencia completa de inicio como una sola unidad de trabajo: cada paso hace
+    flush (los siguientes ven sus cambios) y hay un único commit al final. Si un paso
+    falla no queda una partida a medio iniciar.
+    """
+    game_id = game.game_id
+    assign_turn_to_players(game_id, db, commit=False)
+    init_detective_cards(game_id, db, commit=False)
+    init_event_cards(game_id, db, commit=False)
+    shuffle_deck(game_id, db, commit=False)
+    init_secrets(game_id, db, commit=False)
+    deal_NSF(game_id, db, commit=False)
+    deal_cards_to_players(game_id, db, commit=False)
+    deal_secrets_to_players(game_id, db, commit=False)
+    setup_initial_draft_pile(game_id, db)
+    game.status = "in course"
+    db.flush()
+    # La partida recién repartida completa: desde acá se puede reproducir con el registro
+    log_action(db, game_id, "start", seed=game.seed, snapshot=read_snapshot(db, game_id))
+    db.commit()
+    db.refresh(game)
+
+
 @game.post("/game/beginning/{game_id}", status_code = 202,response_model= Game_Response, tags = ["Games"] ) 
 async def initialize_game (game_id : int, db : Session = Depends(get_db)):
-    game = db.query(Game).where(Game.game_id == game_id).first()
+    game = await run_db(db.query(Game).where(Game.game_id == game_id).first)
     if not game:
         raise HTTPException(status_code=404, detail="Game not found")
     if game.status == "in course":
         raise HTTPException(status_code=400, detail="Game already started")
-    if game.players_amount >= game.min_players :  
-        turns_assigned = assign_turn_to_players (game_id, db)
-        detectives_initialized = init_detective_cards (game_id, db)
-        events_initialized = init_event_cards(game_id , db)
-        secrets_initialized = init_secrets(game_id, db)
-        nsf_dealt = deal_NSF(game_id , db)
-        cards_dealt = deal_cards_to_players (game_id, db)
-        secrets_dealt = deal_secrets_to_players (game_id, db)
-        draft_pile_initialized = setup_initial_draft_pile(game_id, db)
-        game.cards_left = 61 - (game.players_amount * 6) - 3 #Se le resta el draft y las cartas repartidas
-        game.status = "in course"
-        
+    players_amount = game.players_amount
+    if players_amount >= game.min_players :  
         try:
-            db.commit()
-            db.refresh(game)
-            
+            await run_db(start_game, game, db)
+        except HTTPException:
+            # Se descarta toda la unidad de trabajo, no solo el paso que falló
+            await run_db(db.rollback)
+            raise
         except Exception as e:
-            db.rollback()
+            await run_db(db.rollback)
             raise HTTPException(status_code=400, detail=f"Error updating turn's game: {str(e)}")
         
         await broadcast_game_information(game_id)
@@ -92,24 +113,65 @@ async def initialize_game (game_id : int, db : Session = Depends(get_db)):
 
 @game.put ("/game/update_turn/{game_id}", status_code = 202, tags = ["Games"])
 async def update_turn (game_id : int , db: Session = Depends(get_db)) : 
-    game = db.query(Game).where(Game.game_id == game_id).first()
-    if not game:
+    # El turno siguiente sale del estado en memoria: se adjunta la partida sin SELECT
+    state = await run_db(gameStateManager.load, db, game_id)
+    if not state:
         raise HTTPException(status_code=404, detail="Game not found")
-    if game.current_turn < game.players_amount : 
-        game.current_turn += 1 
-    else : 
-        game.current_turn = 1
+    game = attach(db, state)
+    next_turn = state.next_turn()
+    game.current_turn = next_turn
+    log_action(db, game_id, "turn_change", state.current_player(), current_turn=next_turn)
     try:
-        db.commit()
+        await run_db(db.commit)
         await broadcast_game_information(game_id)
     except Exception as e:
-        db.rollback()
+        await run_db(db.rollback)
         raise HTTPException(status_code=400, detail=f"Error updating turn's game: {str(e)}")
 
-    return game.current_turn
+    return next_turn
+
+@game.get("/games/archived", tags=["Games"], response_model=list[Archived_Game_Response])
+def list_archived_games(game_id: Optional[int] = None, limit: int = 50, offset: int = 0, db: Session = Depends(get_read_db)):
+    """Partidas terminadas que ya salieron de las tablas vivas, de la más reciente a la más vieja."""
+    query = db.query(ArchivedGame)
+    if game_id is not None:
+        query = query.filter(ArchivedGame.game_id == game_id)
+    return query.order_by(ArchivedGame.archived_at.desc(), ArchivedGame.archive_id.desc()) \
+                .offset(offset).limit(min(limit, 200)).all()
+
+@game.get("/games/archived/{archive_id}", tags=["Games"], response_model=Archived_Game_Detail)
+def get_archived_game(archive_id: int, db: Session = Depends(get_read_db)):
+    archived = db.get(ArchivedGame, archive_id)
+    if not archived:
+        raise HTTPException(status_code=404, detail="Archived game not found")
+    return archived
+
+@game.get("/games/{game_id}/snapshot", tags=["Games"], response_class=Response)
+async def get_game_snapshot(game_id: int, db: Session = Depends(get_db)):
+    """La partida completa como snapshot binario (application/octet-stream) para guardarla o inspeccionarla."""
+    blob = await run_db(snapshot_game, game_id, db)
+    if blob is None:
+        raise HTTPException(status_code=404, detail="Game not found")
+    return Response(content=blob, media_type="application/octet-stream")
+
+@game.post("/games/snapshot", status_code=201, response_model=Game_Response, tags=["Games"])
+async def restore_game_as_new(request: Request, db: Session = Depends(get_db)):
+    """Crea una partida nueva a partir de un snapshot (el cuerpo del request)."""
+    game_id = await run_db(restore_game, await request.body(), db)
+    new_game = await run_db(db.get, Game, game_id)
+    await broadcast_available_games(db)
+    return new_game
+
+@game.put("/games/{game_id}/snapshot", response_model=Game_Response, tags=["Games"])
+async def restore_game_in_place(game_id: int, request: Request, db: Session = Depends(get_db)):
+    """Vuelve la partida al snapshot, conservando sus ids (los clientes conectados siguen igual)."""
+    await run_db(restore_game, await request.body(), db, game_id)
+    restored = await run_db(db.get, Game, game_id)
+    await broadcast_game_information(game_id)
+    return restored
 
 @game.get("/games/{game_id}", tags=["Games"])
-def get_game(game_id: int, db: Session = Depends(get_db)):
+def get_game(game_id: int, db: Session = Depends(get_read_db)):
     game = db.get(Game, game_id)
     if not game:
         raise HTTPException(status_code=404, detail="Game not found")
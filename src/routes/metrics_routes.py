@@ -0,0 +1,35 @@
+from fastapi import APIRouter
+from src.database.database import engine, poolMetrics, replica_engine
+from src.database.pool_metrics import pool_status
+from src.webSocket.connection_manager import broker, gameManager, lobbyManager
+
+metrics = APIRouter()
+
+
+@metrics.get("/metrics/db-pool", tags=["Metrics"])
+def db_pool_metrics(reset: bool = False):
+    """
+    Estado del pool de conexiones: conexiones en uso, histograma de espera por un
+    checkout, overflow, timeouts y los checkouts retenidos más largos con su ruta.
+    `reset=true` pone los contadores en cero después de leerlos.
+    """
+    data = poolMetrics.snapshot(engine.pool)
+    if replica_engine is not engine:
+        data["replica_pool"] = pool_status(replica_engine.pool)
+    if reset:
+        poolMetrics.reset()
+    return data
+
+
+@metrics.get("/metrics/websockets", tags=["Metrics"])
+def websocket_metrics():
+    """
+    Sockets conectados y resultado de los envíos: enviados, descartados y conexiones
+    cerradas por motivo. `broker`: mensajes publicados y repartidos en este worker.
+    """
+    return {
+        "lobby": {"connections": len(lobbyManager.active_connections), **lobbyManager.stats},
+        "games": {"connections": sum(len(c) for c in gameManager.active_connections.values()),
+                  "games": len(gameManager.active_connections), **gameManager.stats},
+        "broker": {"type": type(broker).__name__, **broker.stats},
+    }
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException  #te permite definir las rutas o subrutas por separado
 from sqlalchemy.orm import Session  
-from src.database.database import SessionLocal, get_db
+from src.database.database import SessionLocal, get_db, run_db
 from src.database.models import Player, Secrets
 from src.database.services.services_websockets import broadcast_player_state , broadcast_game_information
 from src.schemas.secret_schemas import Secret_Response
@@ -42,7 +42,7 @@ async def reveal_secret(secret_id : int ,  db: Session = Depends(get_db)):
 async def hide_secret(secret_id : int , db: Session = Depends(get_db)):
     # 2. Llamar a la función de servicio con los parámetros recibidos
     # La función de servicio se encarga de toda la lógica y las excepciones.
-    hidden = hide_secret_service(secret_id=secret_id, db=db)
+    hidden = await run_db(hide_secret_service, secret_id=secret_id, db=db)
     await broadcast_game_information(hidden.game_id)
     return hidden
 
@@ -52,6 +52,6 @@ async def steal_secret(secret_id : int , target_player_id: int, db: Session = De
     # 2. Llamar a la función de servicio con los parámetros recibidos
     # La función de servicio se encarga de toda la lógica y las excepciones.
     # se da el secret_id a robar y despues el jugador al que se lo doy
-    stolen = steal_secret_service(target_player_id=target_player_id, secret_id=secret_id, db=db)
+    stolen = await run_db(steal_secret_service, target_player_id=target_player_id, secret_id=secret_id, db=db)
     await broadcast_game_information(stolen.game_id)
     return stolen
@@ -2,21 +2,48 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from sqlalchemy import desc, func  
 from src.schemas.set_schemas import Set_Response, Set_Base
-from src.database.database import SessionLocal, get_db
+from src.database.database import SessionLocal, get_db, run_db, commit_db
 from src.database.models import Card , Game , Detective , Event , Set, Player
+from src.gameState.game_state import gameStateManager, attach
+from src.gameState.action_log import log_action
 from src.database.services.services_cards import only_6
 from src.schemas.card_schemas import Card_Response , Detective_Response , Event_Response
 from src.database.services.services_websockets import broadcast_last_discarted_cards, broadcast_player_state
-import random
 
 set = APIRouter()
 
+def _detective(state, card_id: int):
+    card = state.cards.get(card_id) if state else None
+    return card if card is not None and card.type == "detective" else None
+
+
+async def _create_set(db: Session, state, name: str, player_id: int, cards: list):
+    """
+    Crea el set y le asigna los detectives en una sola transacción. Devuelve la fila
+    del set commiteada.
+    """
+    new_set = Set(name = name , player_id = player_id , game_id = state.game_id)
+    db.add(new_set)
+    try:
+        await run_db(db.flush)
+        for selected in cards:
+            card = attach(db, selected)
+            card.set_id = new_set.set_id
+            card.player_id = None
+        log_action(db, state.game_id, "set_play", player_id, set_id=new_set.set_id, name=name,
+                   card_ids=[c.card_id for c in cards])
+        await run_db(db.commit)
+    except Exception as e:
+        await run_db(db.rollback)
+        raise HTTPException(status_code=400, detail=f"Error creating set: {str(e)}")
+    return new_set
+
+
 @set.post("/sets_of2/{card_id},{card_id_2}", status_code=201,response_model= Set_Base, tags = ["Sets"])
 async def play_set_of2(card_id : int , card_id_2:int , db:Session=Depends(get_db)):
-    card_1 = db.query(Detective).filter(Detective.card_id == card_id).first()
-    card_2 = db.query(Detective).filter(Detective.card_id == card_id_2).first()
-    game = db.query(Game).filter(Game.game_id == card_1.game_id).first()
-    game_id = game.game_id
+    state = await run_db(gameStateManager.load_for, db, Card, card_id)
+    card_1 = _detective(state, card_id)
+    card_2 = _detective(state, card_id_2)
 
     if not card_1 or not card_2:
         raise HTTPException(status_code=400, detail=f"Invalid card_id")
@@ -28,61 +55,27 @@ async def play_set_of2(card_id : int , card_id_2:int , db:Session=Depends(get_db
         raise HTTPException(status_code=400 , detail=f"You can't play this set")
     
     if (card_1.name == "Harley Quin Wildcard"):
-        new_set = Set(name = card_2.name , 
-                      player_id = card_2.player_id ,
-                      game_id = card_2.game_id)
-        db.add(new_set)
-        try:
-            db.commit()
-            db.refresh(new_set)
-        except Exception as e:
-            db.rollback()
-            raise HTTPException(status_code=400, detail=f"Error creating set: {str(e)}")
+        new_set = await _create_set(db, state, card_2.name, card_2.player_id, [card_1, card_2])
         
     elif(card_2.name == "Harley Quin Wildcard" or card_1.name == card_2.name):
-        new_set = Set(name = card_1.name ,
-                      player_id = card_1.player_id ,
-                      game_id = card_1.game_id)
-        db.add(new_set)
-        try:
-            db.commit()
-            db.refresh(new_set)
-        except Exception as e:
-            db.rollback()
-            raise HTTPException(status_code=400, detail=f"Error creating set: {str(e)}")
+        new_set = await _create_set(db, state, card_1.name, card_1.player_id, [card_1, card_2])
    
     elif((card_1.name == "Tommy Beresford" and card_2.name == "Tuppence Beresford" )or
          (card_1.name == "Tuppence Beresford" and card_2.name == "Tommy Beresford")):
-        new_set = Set(name = "Beresford brothers" , 
-                      player_id = card_1.player_id ,
-                      game_id = card_1.game_id)
-        db.add(new_set)
-        try:
-            db.commit()
-            db.refresh(new_set)
-        except Exception as e:
-            db.rollback()
-            raise HTTPException(status_code=400, detail=f"Error creating set: {str(e)}")
+        new_set = await _create_set(db, state, "Beresford brothers", card_1.player_id, [card_1, card_2])
         
     else: 
         raise HTTPException(status_code=400, detail=f"This are not two compatible detectives")
     
-    card_1.set_id = new_set.set_id
-    card_2.set_id = new_set.set_id
-    card_1.player_id = None
-    card_2.player_id = None 
-    db.commit()
-    db.refresh(card_1)
-    db.refresh(card_2)
-    db.refresh(game)
-    await broadcast_player_state(game_id)
+    await broadcast_player_state(state.game_id)
     return new_set
 
 @set.post("/sets_of3/{card_id},{card_id_2},{card_id_3}", status_code=201,response_model= Set_Base, tags = ["Sets"])
 async def play_set_of3(card_id : int , card_id_2: int , card_id_3: int , db:Session=Depends(get_db)):
-    card_1 = db.query(Detective).filter(Detective.card_id == card_id).first()
-    card_2 = db.query(Detective).filter(Detective.card_id == card_id_2).first()
-    card_3 = db.query(Detective).filter(Detective.card_id == card_id_3).first()
+    state = await run_db(gameStateManager.load_for, db, Card, card_id)
+    card_1 = _detective(state, card_id)
+    card_2 = _detective(state, card_id_2)
+    card_3 = _detective(state, card_id_3)
 
     if not card_1 or not card_2 or not card_3:
         raise HTTPException(status_code=400, detail=f"Invalid card_id")
@@ -91,58 +84,19 @@ async def play_set_of3(card_id : int , card_id_2: int , card_id_3: int , db:Sess
         raise HTTPException(status_code=400, detail=f"You need just 2 cards to play this set")
     
     if (card_1.name == "Harley Quin Wildcard" and card_2.name == card_3.name):
-        new_set = Set(name = card_2.name , 
-                      player_id = card_2.player_id ,
-                      game_id = card_2.game_id)
-        db.add(new_set)
-        try:
-            db.commit()
-            db.refresh(new_set)
-        except Exception as e:
-            db.rollback()
-            raise HTTPException(status_code=400, detail=f"Error creating set: {str(e)}")
+        new_set = await _create_set(db, state, card_2.name, card_2.player_id, [card_1, card_2, card_3])
         
     elif((card_2.name == "Harley Quin Wildcard" and card_1.name == card_3.name) or
          (card_3.name == "Harley Quin Wildcard" and card_1.name == card_2.name)):
-        new_set = Set(name = card_1.name ,
-                      player_id = card_1.player_id ,
-                      game_id = card_1.game_id)
-        db.add(new_set)
-        try:
-            db.commit()
-            db.refresh(new_set)
-        except Exception as e:
-            db.rollback()
-            raise HTTPException(status_code=400, detail=f"Error creating set: {str(e)}")
+        new_set = await _create_set(db, state, card_1.name, card_1.player_id, [card_1, card_2, card_3])
         
     elif(card_1.name == card_2.name == card_3.name):
-        new_set = Set(name = card_1.name ,
-                      player_id = card_1.player_id ,
-                      game_id = card_1.game_id)
-        db.add(new_set)
-        try:
-            db.commit()
-            db.refresh(new_set)
-        except Exception as e:
-            db.rollback()
-            raise HTTPException(status_code=400, detail=f"Error creating set: {str(e)}")
+        new_set = await _create_set(db, state, card_1.name, card_1.player_id, [card_1, card_2, card_3])
         
     else: 
         raise HTTPException(status_code=400, detail=f"This are not three compatible detectives")
-    
-
 
-    card_1.set_id = new_set.set_id
-    card_2.set_id = new_set.set_id
-    card_3.set_id = new_set.set_id
-    card_1.player_id = None
-    card_2.player_id = None
-    card_3.player_id = None
-    db.commit()
-    db.refresh(card_1)
-    db.refresh(card_2)
-    db.refresh(card_3)
-    await broadcast_player_state(card_1.game_id)
+    await broadcast_player_state(state.game_id)
     return new_set
 
 @set.get("/sets/list/{player_id}", status_code = 201, response_model= Set_Response, tags = {"Sets"})
@@ -155,20 +109,20 @@ def get_set_player (player_id : int , db : Session = Depends(get_db)):
 
 @set.put ("/sets/steal/{player_id_to}/{set_id}", status_code= 201,response_model= Set_Response, tags= ["Sets"])
 async def steal_set( player_id_to : int, set_id : int, db : Session = Depends(get_db)) :
-    set = db.query(Set).filter(Set.set_id == set_id).first()
-    if not set : 
+    state = await run_db(gameStateManager.load_for, db, Set, set_id)
+    if not state : 
         raise HTTPException(status_code=400, detail=f"Player does not have that set")
-    player_id_2 = db.query(Player).filter(Player.player_id == player_id_to).first()
-    if not player_id_2 : 
+    if player_id_to not in state.players : 
         raise HTTPException (status_code = 400, detail = f"Player id 2 does not exist") 
 
-    set.player_id = player_id_to
+    stolen = attach(db, state.sets[set_id])
+    stolen.player_id = player_id_to
+    log_action(db, state.game_id, "set_steal", player_id_to, set_id=set_id)
     try : 
-        db.commit()
-        db.refresh(set)
-        await broadcast_player_state(set.game_id)
+        await run_db(db.commit)
+        await broadcast_player_state(state.game_id)
 
-        return set
+        return stolen
     except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=400, detail=f"Error stealing set: {str(e)}")
\ No newline at end of file
+        await run_db(db.rollback)
+        raise HTTPException(status_code=400, detail=f"Error stealing set: {str(e)}")
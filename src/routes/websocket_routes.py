@@ -1,11 +1,12 @@
 import json
+from typing import Optional
 from fastapi import Depends, HTTPException, WebSocket, APIRouter
 from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session 
 from src.schemas.games_schemas import Game_Response
 from src.schemas.players_schemas import Player_Base
 from src.database.models import Game, Player
-from src.database.database import get_db
+from src.database.database import get_db, run_db
 from src.database.services.services_websockets import broadcast_available_games, broadcast_card_draft, broadcast_lobby_information, broadcast_game_information
 from src.webSocket.connection_manager import lobbyManager , gameManager
 
@@ -16,6 +17,8 @@ async def ws_available_games(websocket: WebSocket, db: Session = Depends(get_db)
     await lobbyManager.connect(websocket)
     # Envía la lista actual de partidas tan pronto como el cliente se conecta
     await broadcast_available_games(db)
+    # La sesión no se usa más: se devuelve la conexión al pool en vez de retenerla mientras dure el socket
+    await run_db(db.close)
     try:
         while True:
             # Mantenemos la conexión abierta. 
@@ -31,7 +34,7 @@ async def ws_available_games(websocket: WebSocket, db: Session = Depends(get_db)
 
 @ws.websocket("/ws/lobby/{game_id}", name = "Players from lobby")
 async def ws_list_players(websocket : WebSocket,game_id : int ,db:Session = Depends(get_db)) : 
-    game = db.query(Game).filter(Game.game_id == game_id).first() # .all() me devuelve una lista, si no hay nada devuelve lista vacia
+    game = await run_db(db.query(Game).filter(Game.game_id == game_id).first)
     if not game:
         await websocket.close(code=4004, reason="Game not found")
         return 
@@ -39,6 +42,7 @@ async def ws_list_players(websocket : WebSocket,game_id : int ,db:Session = Depe
     
     try : 
         await broadcast_lobby_information(db, game_id)
+        await run_db(db.close)
         
         while True:
             # Mantenemos la conexión abierta para detectar cuando el cliente se va.
@@ -52,15 +56,23 @@ async def ws_list_players(websocket : WebSocket,game_id : int ,db:Session = Depe
         gameManager.disconnect(websocket, game_id)
       
 @ws.websocket("/ws/game/{game_id}", name = "Info from game")
-async def ws_info_from_game(websocket : WebSocket, game_id : int, db : Session =Depends(get_db)) :
-    game = db.query(Game).filter(Game.game_id == game_id).first() # .all() me devuelve una lista, si no hay nada devuelve lista vacia
+async def ws_info_from_game(websocket : WebSocket, game_id : int, player_id : Optional[int] = None, db : Session =Depends(get_db)) :
+    game = await run_db(db.query(Game).filter(Game.game_id == game_id).first)
     if not game:
         await websocket.close(code=4004, reason="Game not found")
         return 
-    await gameManager.connect(websocket, game_id)
+    # Con player_id el socket recibe la mano y los secretos de ese jugador; sin él, solo lo público
+    if player_id is not None:
+        player = await run_db(db.query(Player).filter(Player.player_id == player_id, Player.game_id == game_id).first)
+        if not player:
+            await websocket.close(code=4004, reason="Player not found")
+            return
+    await run_db(db.close)
+    await gameManager.connect(websocket, game_id, player_id)
     
     try : 
-        await broadcast_game_information(game_id)
+        # El socket nuevo no tiene versión: todos reciben el estado completo
+        await broadcast_game_information(game_id, full=True)
         await broadcast_card_draft(game_id)
         
         while True:
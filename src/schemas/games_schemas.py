@@ -1,5 +1,6 @@
 from pydantic import BaseModel, ConfigDict
 from typing import Optional 
+from datetime import datetime
 
 class Game_Base(BaseModel) : 
     id : Optional[int] = None
@@ -7,6 +8,7 @@ class Game_Base(BaseModel) :
     min_players : int
     status : str 
     name : str
+    seed : Optional[int] = None # Para reproducir una partida; si falta se sortea
 
 class Game_Response (BaseModel) : 
     game_id : Optional[int] = None
@@ -23,4 +25,19 @@ class Game_Initialized (BaseModel) :
     game_id : int 
     status : str 
     name : str 
-    players_amount : int
\ No newline at end of file
+    players_amount : int
+
+class Archived_Game_Response (BaseModel) : 
+    archive_id : int 
+    game_id : int 
+    name : str 
+    max_players : int 
+    min_players : int 
+    players_amount : int 
+    finished_at : Optional[datetime] = None 
+    archived_at : datetime 
+    model_config = ConfigDict(from_attributes=True)
+
+class Archived_Game_Detail (Archived_Game_Response) : 
+    # {"game": {...}, "players"/"cards"/"secrets"/"sets": {"columns": [...], "rows": [[...]]}}
+    snapshot : dict 
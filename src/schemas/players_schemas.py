@@ -20,4 +20,11 @@ class Player_State(Player_Base) :
     cards : list[AllCardsResponse]
     secrets : list[Secret_Response]
     sets : list[Set_Response]
-    
\ No newline at end of file
+
+
+class Player_Public(Player_Base) : 
+    # Lo que ven los demás jugadores: la cantidad de cartas en mano y solo los secretos revelados
+    turn_order : Optional[int] = None
+    hand_size : int
+    secrets : list[Secret_Response]
+    sets : list[Set_Response]
@@ -1,3 +1,4 @@
+import datetime
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
@@ -6,7 +7,10 @@ from sqlalchemy.pool import StaticPool
 
 # Importa tu aplicación de FastAPI y la configuración de la base de datos
 from src.main import app
-from src.database.database import Base, get_db
+from src.database.database import Base, get_db, get_read_db
+from src.database.models import Game, Player
+from src.gameState.game_state import gameStateManager
+from src.routes.games_routes import start_game
 
 # --- CONFIGURACIÓN DE LA BASE DE DATOS DE PRUEBA ---
 # Usamos una base de datos SQLite en memoria. Es la forma más rápida y limpia
@@ -38,6 +42,35 @@ def setup_test_db():
     Base.metadata.create_all(bind=engine)
 
 
+def pytest_configure(config):
+    config.addinivalue_line("markers", "game_state_cache: el test revisa el estado en memoria (no corre sin cache)")
+
+
+@pytest.fixture(autouse=True, params=["cache", "no_cache"])
+def game_state_cache(request):
+    """
+    Corre cada test con el estado en memoria prendido y apagado (GAME_STATE_CACHE=false):
+    las respuestas tienen que salir de lo commiteado aunque la partida no esté en memoria.
+    """
+    if request.param == "no_cache" and request.node.get_closest_marker("game_state_cache"):
+        pytest.skip("revisa el estado en memoria")
+    enabled = gameStateManager.enabled
+    gameStateManager.enabled = request.param == "cache"
+    yield
+    gameStateManager.enabled = enabled
+
+
+@pytest.fixture(autouse=True)
+def clear_game_state():
+    """
+    Vacía el estado en memoria de las partidas entre tests: cada test revierte su
+    transacción y los ids se reutilizan, así que lo cargado en uno no vale en el otro.
+    """
+    gameStateManager.clear()
+    yield
+    gameStateManager.clear()
+
+
 @pytest.fixture(scope="function")
 def db_session():
     """
@@ -78,11 +111,34 @@ def client(db_session):
         finally:
             db_session.close()
 
-    # Aplica la sobrescritura a la aplicación de FastAPI
+    # Aplica la sobrescritura a la aplicación de FastAPI (las rutas de lectura usan la misma sesión)
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
 
     # Proporciona el cliente de prueba al test
     yield TestClient(app)
 
     # Limpia la sobrescritura después de que el test haya terminado
-    del app.dependency_overrides[get_db]
\ No newline at end of file
+    del app.dependency_overrides[get_db]
+    del app.dependency_overrides[get_read_db]
+
+@pytest.fixture
+def started_game(request, db_session):
+    """
+    Partida iniciada (turnos, cartas y secretos repartidos) y cargada en memoria.
+    Devuelve su game_id. Sin broadcasts: los sockets arrancan con el estado completo.
+
+    Por defecto tiene 4 jugadores y seed 5; se cambian con una parametrización indirecta:
+    `@pytest.mark.parametrize("started_game", [{"players": 3, "seed": 7}], indirect=True)`.
+    """
+    params = {"players": 4, "seed": 5, **getattr(request, "param", {})}
+    game = Game(name="Started", status="bootable", max_players=6, min_players=2,
+                players_amount=params["players"], seed=params["seed"])
+    db_session.add(game)
+    db_session.commit()
+    db_session.add_all([Player(name=f"P{i}", birth_date=datetime.date(2000, 1 + i, 1), game_id=game.game_id)
+                        for i in range(params["players"])])
+    db_session.commit()
+    start_game(game, db_session)
+    gameStateManager.load(db_session, game.game_id)
+    return game.game_id
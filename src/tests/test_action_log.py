@@ -0,0 +1,84 @@
+"""
+Tests del registro de acciones y su reproducción (src/gameState/action_log.py).
+"""
+from unittest.mock import AsyncMock
+
+import pytest
+
+from src.database.models import Card, Game, GameAction, Secrets
+from src.gameState.action_log import _PENDING_KEY, ReplayError, log_action, read_snapshot, replay_game, snapshot_of
+from src.gameState.game_state import gameStateManager
+
+_BROADCASTS = {
+    "src.routes.games_routes": ("broadcast_game_information", "broadcast_available_games"),
+    "src.routes.cards_routes": ("broadcast_game_information", "broadcast_last_discarted_cards", "broadcast_card_draft"),
+    "src.routes.secrets_routes": ("broadcast_game_information",),
+}
+
+STARTED_GAME = pytest.mark.parametrize("started_game", [{"players": 3, "seed": 7}], indirect=True)
+
+
+@pytest.fixture(autouse=True)
+def no_broadcasts(mocker):
+    for module, names in _BROADCASTS.items():
+        for name in names:
+            mocker.patch(f"{module}.{name}", new_callable=AsyncMock)
+
+
+def _actions(db_session, game_id):
+    return db_session.query(GameAction).filter(GameAction.game_id == game_id).order_by(GameAction.seq).all()
+
+
+@STARTED_GAME
+def test_actions_are_logged_in_order_and_replay_rebuilds_the_game(client, db_session, started_game):
+    game_id = started_game
+    state = gameStateManager.load(db_session, game_id)
+    player_id = state.current_player()
+    draft_card = next(c.card_id for c in state.cards.values() if c.draft)
+    secret = next(s for s in state.secrets.values() if not s.murderer and s.player_id != player_id)
+
+    assert client.put(f"/cards/drop/{player_id}").status_code == 200
+    assert client.put(f"/cards/draft_pickup/{game_id},{draft_card},{player_id}").status_code == 200
+    assert client.put(f"/cards/drop/{player_id}").status_code == 200
+    assert client.put(f"/cards/pick_up/{player_id},{game_id}").status_code == 200
+    assert client.put(f"/secrets/reveal/{secret.secret_id}").status_code == 200
+    assert client.put(f"/secrets/steal/{secret.secret_id},{player_id}").status_code == 200
+    assert client.put(f"/game/update_turn/{game_id}").status_code == 202
+
+    actions = _actions(db_session, game_id)
+    assert [a.action for a in actions] == ["start", "discard", "draft_pick", "discard", "pickup",
+                                           "secret_reveal", "secret_steal", "turn_change"]
+    assert [a.seq for a in actions] == list(range(1, 9))
+    assert actions[0].data["seed"] == 7 and actions[0].changes == []
+    assert actions[2].player_id == player_id and actions[2].data == {"card_id": draft_card}
+
+    assert snapshot_of(replay_game(db_session, game_id)) == read_snapshot(db_session, game_id)
+    # Hasta una acción intermedia: el draft ya se repuso, el secreto todavía no se reveló
+    partial = replay_game(db_session, game_id, upto_seq=3)
+    assert partial.cards[draft_card].player_id == player_id
+    assert not partial.secrets[secret.secret_id].revelated and partial.version == 3
+
+
+@STARTED_GAME
+def test_rolled_back_actions_are_not_logged(db_session, started_game):
+    card = db_session.query(Card).filter(Card.game_id == started_game, Card.draft == True).first()
+    card.draft = False
+    log_action(db_session, started_game, "draft_pick", card_id=card.card_id)
+    assert db_session.info[_PENDING_KEY]
+    # Después del rollback del test la base queda sin transacción: se mira lo pendiente en la sesión
+    db_session.rollback()
+
+    assert _PENDING_KEY not in db_session.info
+
+
+def test_replay_needs_the_start_of_the_game(db_session):
+    game = Game(name="Sin inicio", status="in course", max_players=4, min_players=2, players_amount=0)
+    db_session.add(game)
+    db_session.commit()
+    secret = Secrets(murderer=False, acomplice=False, revelated=False, game_id=game.game_id)
+    db_session.add(secret)
+    log_action(db_session, game.game_id, "secret_reveal", secret_id=1)
+    db_session.commit()
+
+    with pytest.raises(ReplayError):
+        replay_game(db_session, game.game_id)
@@ -0,0 +1,115 @@
+"""
+Tests del archivado de partidas terminadas (src/database/archive.py).
+"""
+import datetime
+
+import pytest
+from sqlalchemy import delete, event
+from sqlalchemy.exc import IntegrityError
+
+from src.database.archive import ArchiveSettings, archive_finished_games
+from src.database.models import ArchivedGame, Card, Detective, Event, Game, Player, Secrets, Set
+
+NOW = datetime.datetime(2025, 1, 10, 12, 0)
+
+
+def _archived(db_session, game_id):
+    return db_session.query(ArchivedGame).filter(ArchivedGame.game_id == game_id).one_or_none()
+
+
+def _add_game(db_session, status="finished", finished_at=NOW - datetime.timedelta(hours=1)):
+    game = Game(name="Archive", status=status, max_players=4, min_players=2, players_amount=2, finished_at=finished_at)
+    db_session.add(game)
+    db_session.flush()
+    players = [Player(name=f"P{i}", birth_date=datetime.date(2000, 1, 1 + i), game_id=game.game_id) for i in range(2)]
+    db_session.add_all(players)
+    db_session.flush()
+    card_set = Set(name="Miss Marple", player_id=players[0].player_id, game_id=game.game_id)
+    db_session.add(card_set)
+    db_session.flush()
+    db_session.add_all([
+        Detective(name="Miss Marple", picked_up=True, dropped=False, player_id=players[0].player_id,
+                  game_id=game.game_id, quantity_set=3, set_id=card_set.set_id),
+        Event(name="Not so fast", picked_up=False, dropped=False, game_id=game.game_id),
+        Secrets(murderer=True, acomplice=False, revelated=False, player_id=players[1].player_id, game_id=game.game_id),
+    ])
+    db_session.commit()
+    return game.game_id
+
+
+def test_finished_games_move_to_archive_in_batches(client, db_session):
+    finished = [_add_game(db_session) for _ in range(3)]
+    live = _add_game(db_session, status="in course", finished_at=None)
+
+    result = archive_finished_games(db_session, ArchiveSettings(batch_size=2, grace_minutes=10, retention_days=0), now=NOW)
+
+    assert result == {"archived": 3, "purged": 0}
+    assert [g.game_id for g in db_session.query(Game)] == [live]
+    for model in (Player, Card, Secrets, Set):
+        assert {row.game_id for row in db_session.query(model)} == {live}
+    archived = _archived(db_session, finished[0])
+    assert archived.snapshot["game"]["status"] == "finished"
+    assert {name: len(archived.snapshot[name]["rows"]) for name in ("players", "cards", "secrets", "sets")} == \
+           {"players": 2, "cards": 2, "secrets": 1, "sets": 1}
+
+    listed = client.get("/games/archived")
+    assert listed.status_code == 200
+    assert sorted(g["game_id"] for g in listed.json()) == finished
+    assert [g["archive_id"] for g in client.get(f"/games/archived?game_id={finished[0]}").json()] == [archived.archive_id]
+    detail = client.get(f"/games/archived/{archived.archive_id}").json()
+    assert detail["game_id"] == finished[0]
+    cards = detail["snapshot"]["cards"]
+    assert [dict(zip(cards["columns"], row))["name"] for row in cards["rows"]] == ["Miss Marple", "Not so fast"]
+    assert client.get("/games/archived/999").status_code == 404
+    assert client.get(f"/games/{finished[0]}").status_code == 404
+
+
+def test_recently_finished_games_wait_for_grace_period(db_session):
+    recent = _add_game(db_session, finished_at=NOW - datetime.timedelta(minutes=2))
+    untimed = _add_game(db_session, finished_at=None)  # terminadas antes de existir finished_at
+
+    archive_finished_games(db_session, ArchiveSettings(batch_size=10, grace_minutes=10, retention_days=0), now=NOW)
+
+    assert [g.game_id for g in db_session.query(Game)] == [recent]
+    assert _archived(db_session, untimed) is not None
+
+
+def test_retention_purges_old_archived_games(db_session):
+    old = _add_game(db_session)
+    settings = ArchiveSettings(batch_size=10, grace_minutes=10, retention_days=30)
+    archive_finished_games(db_session, settings, now=NOW)
+    _archived(db_session, old).archived_at = NOW - datetime.timedelta(days=31)
+    db_session.commit()
+    _add_game(db_session)
+
+    assert archive_finished_games(db_session, settings, now=NOW) == {"archived": 1, "purged": 1}
+    assert [g.archived_at for g in db_session.query(ArchivedGame)] == [NOW]
+
+
+def test_games_claimed_by_another_archiver_are_skipped(db_session):
+    taken, mine = _add_game(db_session), _add_game(db_session)
+    raced = []
+
+    def other_worker_archives_first(orm_execute_state):
+        # Otro worker archivó `taken` entre la elección de candidatas y el UPDATE que las reclama
+        if orm_execute_state.is_update and not raced:
+            raced.append(taken)
+            connection = orm_execute_state.session.connection()
+            for table in ("game_actions", "cards", "secrets", "sets", "players", "games"):
+                connection.execute(delete(Game.metadata.tables[table]).where(Game.metadata.tables[table].c.game_id == taken))
+            connection.execute(ArchivedGame.__table__.insert().values(
+                game_id=taken, name="Archive", max_players=4, min_players=2, players_amount=2, archived_at=NOW,
+                snapshot={}))
+
+    event.listen(db_session, "do_orm_execute", other_worker_archives_first)
+    result = archive_finished_games(db_session, ArchiveSettings(batch_size=10, grace_minutes=10, retention_days=0), now=NOW)
+    event.remove(db_session, "do_orm_execute", other_worker_archives_first)
+
+    assert raced and result == {"archived": 1, "purged": 0}
+    assert [a.game_id for a in db_session.query(ArchivedGame).order_by(ArchivedGame.game_id)] == [taken, mine]
+
+
+def test_a_game_is_archived_only_once(db_session):
+    with pytest.raises(IntegrityError), db_session.begin_nested():
+        db_session.add_all([ArchivedGame(game_id=1, name="Archive", max_players=4, min_players=2, players_amount=2,
+                                         archived_at=NOW, snapshot={}) for _ in range(2)])
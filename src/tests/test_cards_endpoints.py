@@ -396,3 +396,44 @@ async def test_discard_list_of_cards_success(mock_broadcast, client, db_session)
 
     mock_broadcast.assert_awaited_once_with(player_id)
 
+
+
+# --- Tests para robar del mazo ---
+
+def _deck_game(db_session, cards):
+    game = Game(name="Deck Game", status="in course", max_players=4, min_players=2, players_amount=1, current_turn=1)
+    player = Player(name="P1", game=game, birth_date=datetime.date(2000, 1, 1), turn_order=1)
+    db_session.add_all([game, player])
+    db_session.commit()
+    db_session.add_all([Detective(type="detective", name=f"Card {i}", game_id=game.game_id, quantity_set=2,
+                                  deck_position=i) for i in range(cards)])
+    db_session.commit()
+    return game.game_id, player.player_id
+
+
+def test_claim_from_deck_skips_card_taken_concurrently(db_session):
+    """Si otro request ya se llevó la primera carta del mazo, el robo sigue con la siguiente."""
+    from sqlalchemy import update
+    from src.database.services.services_cards import claim_from_deck
+    from src.gameState.game_state import gameStateManager
+
+    game_id, player_id = _deck_game(db_session, 3)
+    state = gameStateManager.load(db_session, game_id)
+    first, second = state.deck()[:2]
+    # Otro worker la roba: la base cambia pero el estado en memoria de este no
+    db_session.execute(update(Card).where(Card.card_id == first.card_id).values(player_id=player_id, picked_up=True))
+
+    card = claim_from_deck(db_session, state, picked_up=True, player_id=player_id)
+    db_session.commit()
+
+    assert card.card_id == second.card_id
+    assert db_session.get(Card, second.card_id).player_id == player_id
+
+
+def test_replenish_draft_pile_with_empty_deck(db_session):
+    """Sin cartas en el mazo el draft pile se achica: no es un error."""
+    from src.database.services.services_cards import replenish_draft_pile
+
+    game_id, _ = _deck_game(db_session, 0)
+
+    assert replenish_draft_pile(game_id, db_session) is None
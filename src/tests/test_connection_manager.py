@@ -1,6 +1,11 @@
 import pytest
 from unittest.mock import AsyncMock, call
-from src.webSocket.connection_manager import ConnectionManagerLobby, ConnectionManagerGames
+import asyncio
+import json
+import zlib
+from src.webSocket import cbor
+from src.webSocket.broker import InMemoryBroker, SocketBroker
+from src.webSocket.connection_manager import ConnectionManagerLobby, ConnectionManagerGames, WebSocketSettings
 
 # Marcamos todas las pruebas en este archivo para que se ejecuten con pytest-asyncio
 pytestmark = pytest.mark.asyncio
@@ -42,6 +47,7 @@ async def test_lobby_broadcast(mock_websocket):
     await manager.connect(ws2)
 
     await manager.broadcast("Hola a todos")
+    await manager.flush()
 
     # Verificar que se intentó enviar el mensaje a ambos
     ws1.send_text.assert_awaited_once_with("Hola a todos")
@@ -85,9 +91,247 @@ async def test_games_broadcast(mock_websocket):
     await manager.connect(ws3_game2, game_id_2)
 
     await manager.broadcast("Mensaje para partida 1", game_id_1)
+    await manager.flush()
 
     # Verificar que el mensaje solo se envió a los jugadores de la partida 1
     ws1_game1.send_text.assert_awaited_once_with("Mensaje para partida 1")
     ws2_game1.send_text.assert_awaited_once_with("Mensaje para partida 1")
     # Verificar que el jugador de la partida 2 NO recibió el mensaje
-    ws3_game2.send_text.assert_not_awaited()
\ No newline at end of file
+    ws3_game2.send_text.assert_not_awaited()
+
+# --- Envío por conexión: colas acotadas, timeouts y clientes lentos ---
+
+def _slow_websocket(delay):
+    ws = AsyncMock()
+    async def send_text(message):
+        await asyncio.sleep(delay)
+    ws.send_text = AsyncMock(side_effect=send_text)
+    return ws
+
+
+async def test_slow_client_does_not_delay_the_others_and_is_dropped():
+    manager = ConnectionManagerGames(WebSocketSettings(queue_size=4, send_timeout_ms=50, slow_consumer_policy="close"))
+    slow, fast = _slow_websocket(10), AsyncMock()
+    await manager.connect(slow, 1)
+    await manager.connect(fast, 1)
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    await manager.broadcast("estado", 1)
+    await asyncio.wait_for(manager._senders[fast].join(), 1)
+
+    assert loop.time() - start < 0.05
+    fast.send_text.assert_awaited_once_with("estado")
+    await asyncio.sleep(0.1)
+    # El envío al lento venció: se cerró y ya no es parte de la partida
+    assert manager.active_connections[1] == [fast]
+    slow.close.assert_awaited_once()
+    assert manager.stats["closed_timeout"] == 1
+
+
+async def test_dead_socket_is_removed_without_stopping_the_broadcast():
+    manager = ConnectionManagerGames()
+    dead, alive = AsyncMock(), AsyncMock()
+    dead.send_text.side_effect = RuntimeError("socket cerrado")
+    await manager.connect(dead, 1)
+    await manager.connect(alive, 1)
+
+    await manager.broadcast("uno", 1)
+    await manager.flush()
+    await manager.broadcast("dos", 1)
+    await manager.flush()
+
+    assert manager.active_connections[1] == [alive]
+    assert [c.args[0] for c in alive.send_text.await_args_list] == ["uno", "dos"]
+    assert manager.stats["closed_dead"] == 1
+    manager.disconnect(dead, 1)  # el handler del socket también lo desconecta: no falla
+
+
+async def test_full_queue_policies():
+    for policy, expected in (("close", []), ("drop_oldest", ["m2", "m3"])):
+        manager = ConnectionManagerLobby(WebSocketSettings(queue_size=2, send_timeout_ms=1000, slow_consumer_policy=policy))
+        blocked = asyncio.Event()
+        received = []
+        ws = AsyncMock()
+        async def send_text(message):
+            await blocked.wait()
+            received.append(message)
+        ws.send_text = AsyncMock(side_effect=send_text)
+        await manager.connect(ws)
+
+        await manager.broadcast("m0")
+        await asyncio.sleep(0)  # m0 ya está en envío
+        for message in ("m1", "m2", "m3"):
+            await manager.broadcast(message)
+        blocked.set()
+        await manager.flush()
+
+        assert received[1:] == expected
+        assert (ws in manager.active_connections) == (policy == "drop_oldest")
+
+
+# --- Broker: broadcasts entre workers ---
+
+async def _received(ws, count=1, timeout=1):
+    """Espera a que el socket reciba `count` mensajes (llegan por el hub, no en el momento)."""
+    async def wait():
+        while ws.send_text.await_count < count:
+            await asyncio.sleep(0.005)
+    await asyncio.wait_for(wait(), timeout)
+    return [c.args[0] for c in ws.send_text.await_args_list]
+
+
+async def test_managers_on_the_same_broker_share_broadcasts():
+    broker = InMemoryBroker()
+    worker_a, worker_b = ConnectionManagerGames(broker=broker), ConnectionManagerGames(broker=broker)
+    lobby_b = ConnectionManagerLobby(broker=broker)
+    ws_game, ws_lobby = AsyncMock(), AsyncMock()
+    await worker_b.connect(ws_game, 1)
+    await lobby_b.connect(ws_lobby)
+
+    await worker_a.broadcast("estado", 1)
+    await ConnectionManagerLobby(broker=broker).broadcast("partidas")
+    await worker_b.flush()
+    await lobby_b.flush()
+
+    ws_game.send_text.assert_awaited_once_with("estado")
+    ws_lobby.send_text.assert_awaited_once_with("partidas")
+
+
+async def test_socket_broker_fans_out_across_workers_and_survives_the_hub(tmp_path):
+    url = f"unix://{tmp_path}/ws.sock"
+    brokers = [SocketBroker(url, retry_ms=10), SocketBroker(url, retry_ms=10)]
+    managers = [ConnectionManagerGames(broker=b) for b in brokers]
+    for broker in brokers:
+        await broker.start(timeout=1)
+    # El primero que arranca levanta el hub
+    assert [b.stats["hub"] for b in brokers] == [True, False]
+    player, spectator = AsyncMock(), AsyncMock()
+    await managers[1].connect(player, 1, player_id=7)
+    await managers[1].connect(spectator, 1)
+
+    await managers[0].broadcast_views({None: "público", 7: "privado"}, 1)
+
+    assert await _received(player) == ["privado"]
+    assert await _received(spectator) == ["público"]
+
+    # Se cae el worker con el hub: el otro levanta uno nuevo y sigue pasando por él
+    await brokers[0].stop()
+    await asyncio.sleep(0.05)
+    await asyncio.wait_for(brokers[1]._connected.wait(), 1)
+    assert brokers[1].stats["hub"] and brokers[1].stats["reconnects"] == 1
+    await managers[1].broadcast("de nuevo", 1)
+    assert (await _received(spectator, 2))[-1] == "de nuevo"
+    assert brokers[1].stats["local_only"] == 0
+    await brokers[1].stop()
+
+
+async def test_commits_of_one_worker_evict_the_game_state_of_the_others(tmp_path):
+    from src.database.models import Game
+    from src.gameState.game_state import GameState, GameStateManager
+    url = f"unix://{tmp_path}/ws.sock"
+    brokers = [SocketBroker(url, retry_ms=10), SocketBroker(url, retry_ms=10)]
+    workers = [GameStateManager(), GameStateManager()]
+    for broker, worker in zip(brokers, workers):
+        worker.share(broker)
+        await broker.start(timeout=1)
+        for game_id in (1, 2):
+            state = GameState()
+            state.game_id, state.status = game_id, "in course"
+            worker._store(state)
+
+    async def evicted(worker, game_id):
+        for _ in range(100):
+            if worker.get(game_id) is None:
+                return True
+            await asyncio.sleep(0.01)
+        return False
+
+    # El worker que commitea aplica el cambio a su copia; el otro la descarta
+    workers[0].apply([("update", Game, 1, {"status": "finished_turn"})])
+    assert await evicted(workers[1], 1)
+    assert workers[0].get(1).status == "finished_turn"
+    assert workers[1].get(2) is not None
+
+    # Una sentencia masiva descarta todo en los demás
+    workers[1]._announce(None)
+    assert await evicted(workers[0], 2)
+    assert workers[1].get(2) is not None
+    for broker in brokers:
+        await broker.stop()
+
+
+async def test_game_state_cache_is_turned_off_for_workers_without_broker(tmp_path):
+    from src.gameState.game_state import GameStateManager
+    from src.webSocket.connection_manager import share_game_state
+    single, workers, shared = GameStateManager(), GameStateManager(), GameStateManager()
+
+    share_game_state(single, InMemoryBroker(), 1)
+    share_game_state(workers, InMemoryBroker(), 4)
+    share_game_state(shared, SocketBroker(f"unix://{tmp_path}/ws.sock"), 4)
+
+    # Sin broker nadie invalidaría las copias de los otros workers
+    assert single.enabled and not workers.enabled
+    assert shared.enabled and shared._broker is not None
+
+
+# --- Formatos negociados por conexión ---
+
+def _negotiating_websocket(*subprotocols):
+    ws = AsyncMock()
+    ws.scope = {"type": "websocket", "subprotocols": list(subprotocols)}
+    return ws
+
+
+async def test_cbor_round_trips_json_messages():
+    message = {"type": "playersState", "version": 3, "data": [
+        {"player_id": 1, "name": "Ñandú", "turn_order": None, "hand_size": 300, "host": True,
+         "secrets": [{"revelated": False, "discardInt": -25}], "score": 1.5}]}
+    encoded = cbor.dumps(message)
+    assert cbor.loads(encoded) == message
+    assert len(encoded) < len(json.dumps(message, separators=(",", ":")))
+
+
+async def test_each_socket_gets_its_negotiated_format():
+    manager = ConnectionManagerGames()
+    plain, binary, compressed = AsyncMock(), _negotiating_websocket("v2", "cbor"), _negotiating_websocket("cbor-deflate")
+    await manager.connect(plain, 1)
+    await manager.connect(binary, 1)
+    await manager.connect(compressed, 1)
+    binary.accept.assert_awaited_once_with(subprotocol="cbor")
+    compressed.accept.assert_awaited_once_with(subprotocol="cbor-deflate")
+
+    messages = [{"type": "droppedCards", "data": [{"card_id": i, "name": "Not so fast", "discardInt": i}]}
+                for i in range(3)]
+    for message in messages:
+        await manager.broadcast(json.dumps(message), 1)
+    await manager.flush()
+
+    assert [json.loads(c.args[0]) for c in plain.send_text.await_args_list] == messages
+    assert [cbor.loads(c.args[0]) for c in binary.send_bytes.await_args_list] == messages
+    # Un solo inflate para toda la conexión, como permessage-deflate con context takeover
+    inflate = zlib.decompressobj(wbits=-15)
+    frames = [c.args[0] for c in compressed.send_bytes.await_args_list]
+    assert [cbor.loads(inflate.decompress(f)) for f in frames] == messages
+    # Lo repetido del primer mensaje ya viaja como referencia en los siguientes
+    assert len(frames[1]) < len(frames[0])
+
+
+async def test_frames_are_encoded_once_per_format(mocker):
+    manager = ConnectionManagerGames()
+    sockets = [_negotiating_websocket("cbor") for _ in range(3)]
+    for player_id, ws in enumerate(sockets):
+        await manager.connect(ws, 1, player_id=player_id)
+    dumps = mocker.spy(cbor, "dumps")
+
+    await manager.broadcast_views({None: '{"type":"a"}', 0: '{"type":"b"}'}, 1)
+    await manager.flush()
+
+    assert dumps.call_count == 2
+    assert [cbor.loads(ws.send_bytes.await_args.args[0])["type"] for ws in sockets] == ["b", "a", "a"]
+
+
+async def test_websocket_metrics_endpoint(client):
+    response = client.get("/metrics/websockets")
+    assert response.status_code == 200
+    assert {"connections", "sent", "dropped", "closed_slow", "closed_timeout", "closed_dead"} <= response.json()["games"].keys()
@@ -0,0 +1,91 @@
+"""
+Tests de los contadores desnormalizados (src/database/counters.py): después de cada
+acción players.hand_size y games.cards_left tienen que coincidir con contar las cartas.
+"""
+import datetime
+import pytest
+from unittest.mock import patch, AsyncMock
+
+from src.database.models import Game, Player, Card, Event
+from src.database.services.services_cards import only_6
+from src.gameState.game_state import gameStateManager
+
+
+def _assert_counters(db_session, game_id):
+    db_session.expire_all()
+    deck = db_session.query(Card).filter(Card.game_id == game_id, Card.picked_up == False,
+                                         Card.dropped == False, Card.draft == False).count()
+    assert db_session.get(Game, game_id).cards_left == deck
+    for player in db_session.query(Player).filter(Player.game_id == game_id):
+        hand = db_session.query(Card).filter(Card.player_id == player.player_id, Card.picked_up == True,
+                                             Card.dropped == False).count()
+        assert player.hand_size == hand
+    state = gameStateManager.get(game_id)
+    if state is not None:
+        assert state.cards_left == deck
+        assert all(state.hand_size(p.player_id) == p.hand_size
+                   for p in db_session.query(Player).filter(Player.game_id == game_id))
+
+
+@patch('src.routes.event_routes.broadcast_last_discarted_cards', new_callable=AsyncMock)
+@patch('src.routes.event_routes.broadcast_game_information', new_callable=AsyncMock)
+@patch('src.routes.cards_routes.broadcast_card_draft', new_callable=AsyncMock)
+@patch('src.routes.cards_routes.broadcast_last_discarted_cards', new_callable=AsyncMock)
+@patch('src.routes.cards_routes.broadcast_game_information', new_callable=AsyncMock)
+@pytest.mark.parametrize("started_game", [{"players": 2}], indirect=True)
+def test_counters_follow_card_moves(m_info, m_discard, m_draft, m_ev_info, m_ev_discard, client, db_session, started_game):
+    game_id = started_game
+    players = [p.player_id for p in db_session.query(Player).filter(Player.game_id == game_id)]
+    # Mazo inicial: 61 cartas menos 6 por jugador menos el draft
+    assert db_session.get(Game, game_id).cards_left == 61 - 6 * 2 - 3
+    _assert_counters(db_session, game_id)
+
+    assert client.put(f"/cards/drop/{players[0]}").status_code == 200
+    _assert_counters(db_session, game_id)
+    assert only_6(players[0], db_session) is False
+
+    assert client.put(f"/cards/pick_up/{players[0]},{game_id}").status_code == 200
+    _assert_counters(db_session, game_id)
+    assert only_6(players[0], db_session) is True
+
+    assert client.put(f"/cards/drop/{players[1]}").status_code == 200
+    draft_card = gameStateManager.load(db_session, game_id).draft_pile()[0]
+    assert client.put(f"/cards/draft_pickup/{game_id},{draft_card.card_id},{players[1]}").status_code == 200
+    _assert_counters(db_session, game_id)
+
+    assert client.put(f"/event/early_train_paddington/{game_id}").status_code == 200
+    _assert_counters(db_session, game_id)
+
+    assert client.put(f"/cards/drop/{players[1]}").status_code == 200
+    ash = gameStateManager.load(db_session, game_id).discard_pile(1)[0]
+    assert client.put(f"/event/look_into_ashes/{players[1]},{ash.card_id}").status_code == 200
+    _assert_counters(db_session, game_id)
+
+
+@pytest.mark.game_state_cache
+def test_counters_follow_inserts_deletes_and_rollbacks(db_session):
+    game = Game(name="Counters", status="in course", max_players=4, min_players=2, players_amount=1)
+    player = Player(name="P", birth_date=datetime.date(2000, 1, 1), game=game)
+    db_session.add_all([game, player])
+    db_session.commit()
+    hand = [Event(name="Not so fast", type="event", picked_up=True, dropped=False, game_id=game.game_id,
+                  player_id=player.player_id) for _ in range(2)]
+    deck = [Event(name="Not so fast", type="event", picked_up=False, dropped=False, game_id=game.game_id) for _ in range(3)]
+    db_session.add_all(hand + deck)
+    db_session.commit()
+    gameStateManager.load(db_session, game.game_id)
+    assert (player.hand_size, game.cards_left) == (2, 3)
+
+    db_session.delete(hand[0])
+    db_session.delete(deck[0])
+    db_session.commit()
+    assert (player.hand_size, game.cards_left) == (1, 2)
+    _assert_counters(db_session, game.game_id)
+
+    deck[1].player_id, deck[1].picked_up = player.player_id, True
+    db_session.flush()
+    assert (player.hand_size, game.cards_left) == (2, 1)
+    db_session.rollback()
+    # Los deltas de una transacción descartada no llegan al estado en memoria
+    state = gameStateManager.get(game.game_id)
+    assert (state.hand_size(player.player_id), state.cards_left) == (1, 2)
@@ -145,6 +145,54 @@ async def test_early_train_paddington_not_enough_cards(mock_broadcast_game, mock
     assert "Not enough cards" in response.json()["message"]
     mock_finish_game.assert_called_once_with(2)
 
+@pytest.mark.asyncio
+@patch('src.routes.event_routes.broadcast_last_discarted_cards', new_callable=AsyncMock)
+@patch('src.routes.event_routes.broadcast_game_information', new_callable=AsyncMock)
+async def test_early_train_paddington_never_draws_discarded_cards(mock_broadcast_game, mock_broadcast_discard, client, db_session):
+    """Las cartas que descarta el evento salen del mazo: otro evento o reponer el draft no las vuelven a robar."""
+    from src.database.services.services_cards import replenish_draft_pile
+    game = Game(game_id=3, name="Deck Order Game", status="in course", max_players=2, min_players=2, players_amount=2)
+    deck_cards = [Detective(name=f"Deck Card {i}", type="detective", game_id=3, quantity_set=1, deck_position=i)
+                  for i in range(20)]
+    db_session.add(game)
+    db_session.add_all(deck_cards)
+    db_session.commit()
+
+    assert client.put("/event/early_train_paddington/3").status_code == 200
+    assert client.put("/event/early_train_paddington/3").status_code == 200
+    drafted = replenish_draft_pile(3, db_session)
+    db_session.commit()
+
+    dropped = db_session.query(Card).filter(Card.game_id == 3, Card.dropped == True).all()
+    assert len(dropped) == 12
+    assert {c.deck_position for c in dropped} == set(range(12))
+    assert drafted.deck_position == 12 and not drafted.dropped
+
+
+@pytest.mark.asyncio
+@pytest.mark.game_state_cache
+@patch('src.routes.event_routes.broadcast_last_discarted_cards', new_callable=AsyncMock)
+@patch('src.routes.event_routes.broadcast_game_information', new_callable=AsyncMock)
+async def test_early_train_paddington_conflicts_with_concurrent_draws(mock_broadcast_game, mock_broadcast_discard, client, db_session):
+    """Si robos concurrentes dejan menos de 6 cartas libres, el evento no descarta nada y responde 409."""
+    from sqlalchemy import update
+    from src.gameState.game_state import SYNCED_OPTION, gameStateManager
+    game = Game(game_id=4, name="Race Game", status="in course", max_players=2, min_players=2, players_amount=2)
+    deck_cards = [Detective(name=f"Deck Card {i}", type="detective", game_id=4, quantity_set=1, deck_position=i)
+                  for i in range(7)]
+    db_session.add(game)
+    db_session.add_all(deck_cards)
+    db_session.commit()
+    gameStateManager.load(db_session, 4)
+    # Otro worker roba dos cartas: la base cambia y el estado en memoria de este no
+    db_session.execute(update(Card).where(Card.game_id == 4, Card.deck_position < 2).values(picked_up=True),
+                       execution_options={SYNCED_OPTION: True})
+
+    response = client.put("/event/early_train_paddington/4")
+
+    assert response.status_code == 409
+    mock_broadcast_discard.assert_not_awaited()
+
 
 # --- Tests for 'Look into the ashes' Event ---
 
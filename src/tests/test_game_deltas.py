@@ -0,0 +1,203 @@
+"""
+Tests del canal de una partida (src/database/services/services_websockets.py): protocolo
+de deltas, vistas privadas por jugador y broadcasts combinados en un frame por request.
+"""
+import json
+from unittest.mock import AsyncMock
+
+import pytest
+from pydantic import TypeAdapter
+
+from src.database.models import Game
+from src.database.services import services_websockets
+from src.database.services.services_websockets import _game_information_messages
+from src.gameState.game_state import gameStateManager
+from src.schemas.players_schemas import Player_State
+
+# Los deltas salen del registro de commits del estado en memoria
+pytestmark = pytest.mark.game_state_cache
+
+
+@pytest.fixture
+def game_manager(mocker):
+    mocker.patch("src.database.services.services_websockets.lobbyManager", new_callable=AsyncMock)
+    return mocker.patch("src.database.services.services_websockets.gameManager", new_callable=AsyncMock)
+
+
+def _sent(game_manager, viewer=None) -> list:
+    """Mensajes que recibió un socket de `viewer`, con los frames combinados de cada request desarmados."""
+    messages = []
+    for call in game_manager.broadcast_views.await_args_list:
+        frames = call.args[0]
+        frame = json.loads(frames.get(viewer, frames.get(None)))
+        messages.extend(frame["data"] if frame["type"] == "batch" else [frame])
+    return messages
+
+
+def _apply(model: dict, message: dict):
+    """Lo que haría un cliente: arma el estado con los mensajes completos y le aplica los deltas."""
+    if message["type"] == "gameUpdated":
+        model["game"], model["version"] = json.loads(message["data"]), message["version"]
+    elif message["type"] == "playersState":
+        model.update(players={}, cards={}, secrets={}, sets={})
+        for player in message["data"]:
+            # De los demás jugadores solo llega lo público: sin cartas en mano
+            for card in player.pop("cards", []):
+                model["cards"][card["card_id"]] = card
+            for secret in player.pop("secrets"):
+                model["secrets"][secret["secret_id"]] = secret
+            for set_ in player.pop("sets"):
+                for card in set_.pop("detective"):
+                    model["cards"][card["card_id"]] = card
+                model["sets"][set_["set_id"]] = set_
+            model["players"][player["player_id"]] = player
+    elif message["type"] == "gameDelta":
+        assert message["base"] == model["version"]
+        model["version"] = message["version"]
+        for op in message["data"]:
+            _, collection, *key = op["path"].split("/")
+            if not key:
+                model[collection].update(op["value"])
+            elif op["op"] == "remove":
+                model[collection].pop(int(key[0]))
+            elif op["op"] == "add":
+                model[collection][int(key[0])] = op["value"]
+            else:
+                model[collection][int(key[0])].update(op["value"])
+
+
+def _full_state(game_id: int, viewer=None) -> dict:
+    """Estado del cliente de `viewer` armado con un envío completo (como al conectarse)."""
+    model = {}
+    views = _game_information_messages(game_id, full=True)
+    for message in views.get(viewer, views[None]):
+        _apply(model, json.loads(message))
+    return model
+
+
+def test_deltas_rebuild_the_full_state(client, db_session, game_manager, started_game):
+    state = gameStateManager.get(started_game)
+    player_id = state.current_player()
+    other_id = next(p for p in state.players if p != player_id)
+    viewers = [player_id, other_id, None]
+    models = {viewer: _full_state(started_game, viewer) for viewer in viewers}
+    secret_id = state.player_secrets(player_id)[0].secret_id
+
+    assert client.put(f"/cards/drop/{player_id}").status_code == 200
+    assert client.put(f"/cards/pick_up/{player_id},{started_game}").status_code == 200
+    assert client.put(f"/secrets/reveal/{secret_id}").status_code == 200
+    assert client.put(f"/game/update_turn/{started_game}").status_code == 202
+
+    for viewer in viewers:
+        messages = [m for m in _sent(game_manager, viewer) if m["type"] in ("gameUpdated", "playersState", "gameDelta")]
+        assert {m["type"] for m in messages} == {"gameDelta"}
+        for message in messages:
+            _apply(models[viewer], message)
+        assert models[viewer] == _full_state(started_game, viewer)
+        assert models[viewer]["secrets"][secret_id]["revelated"] is True
+
+
+def test_each_player_only_sees_its_own_hand_and_secrets(client, game_manager, started_game):
+    state = gameStateManager.get(started_game)
+    player_id = state.current_player()
+    other_id = next(p for p in state.players if p != player_id)
+    hand = {c.card_id for c in state.hand(player_id)}
+    secrets = {s.secret_id for s in state.player_secrets(player_id)}
+
+    model = _full_state(started_game, player_id)
+    assert set(model["cards"]) == hand
+    assert set(model["secrets"]) == secrets
+    assert "cards" not in json.dumps(model["players"][other_id])
+    assert model["players"][other_id]["hand_size"] == len(state.hand(other_id))
+    # Un espectador no ve ninguna mano ni secreto sin revelar
+    spectator = _full_state(started_game)
+    assert spectator["cards"] == {} and spectator["secrets"] == {}
+
+    # Revelar al asesino termina la partida
+    other_secret = next(s.secret_id for s in state.player_secrets(other_id) if not s.murderer)
+    assert client.put(f"/cards/drop/{player_id}").status_code == 200
+    assert client.put(f"/secrets/reveal/{other_secret}").status_code == 200
+
+    for message in _sent(game_manager):
+        _apply(spectator, message)
+    # El descarte solo le cambia al espectador la cantidad de cartas; el secreto revelado lo ven todos
+    assert spectator["cards"] == {}
+    assert spectator["players"][player_id]["hand_size"] == len(hand) - 1
+    assert set(spectator["secrets"]) == {other_secret}
+    # Cada socket recibe bastante menos que las manos y secretos de todos
+    views = _game_information_messages(started_game, full=True)
+    adapter = TypeAdapter(list[Player_State])
+    everything = adapter.dump_json(adapter.validate_python([state.player_view(p) for p in state.players], from_attributes=True))
+    assert all(len(players) * 2 < len(everything) for _, players in views.values())
+
+
+def test_delta_is_much_smaller_than_the_full_state(client, game_manager, started_game):
+    full = sum(len(m) for m in _game_information_messages(started_game, full=True)[None])
+
+    assert client.put(f"/game/update_turn/{started_game}").status_code == 202
+
+    (call,) = game_manager.broadcast_views.await_args_list
+    delta = call.args[0][None]
+    assert json.loads(delta)["data"] == [{"op": "merge", "path": "/game", "value": {"current_turn": 2}}]
+    assert len(delta) * 5 < full
+    # Sin commits nuevos no hay nada que mandar
+    assert _game_information_messages(started_game) == {}
+
+
+def test_full_state_is_resent_periodically_and_after_gaps(client, db_session, game_manager, started_game, monkeypatch):
+    _full_state(started_game)
+    monkeypatch.setattr(services_websockets, "SNAPSHOT_EVERY", 2)
+
+    client.put(f"/game/update_turn/{started_game}")
+    assert [m["type"] for m in _sent(game_manager)] == ["gameDelta"]
+    game_manager.broadcast_views.reset_mock()
+    client.put(f"/game/update_turn/{started_game}")
+    assert [m["type"] for m in _sent(game_manager)] == ["gameUpdated", "playersState"]
+
+    # El journal ya no llega a la última versión enviada
+    monkeypatch.setattr(services_websockets, "SNAPSHOT_EVERY", 50)
+    db_session.query(Game).filter(Game.game_id == started_game).one().current_turn = 1
+    db_session.commit()
+    gameStateManager.get(started_game).journal.clear()
+    assert [json.loads(m)["type"] for m in _game_information_messages(started_game)[None]] == ["gameUpdated", "playersState"]
+
+
+def test_each_request_sends_one_frame_per_game(client, game_manager, started_game):
+    _full_state(started_game)
+    state = gameStateManager.get(started_game)
+    player_id = state.current_player()
+    assert client.put(f"/cards/drop/{player_id}").status_code == 200
+    draft_card = state.draft_pile()[0].card_id
+    game_manager.broadcast_views.reset_mock()
+
+    response = client.put(f"/cards/draft_pickup/{started_game},{draft_card},{player_id}")
+
+    assert response.status_code == 200
+    # gameUpdated/playersState y draftCards salen juntos, de una sola lectura del estado
+    (call,) = game_manager.broadcast_views.await_args_list
+    frame = json.loads(call.args[0][None])
+    assert call.args[1] == started_game
+    assert frame["type"] == "batch"
+    assert [m["type"] for m in frame["data"]] == ["gameDelta", "draftCards"]
+    assert draft_card not in [c["card_id"] for c in frame["data"][1]["data"]]
+
+
+def test_event_routes_broadcast_the_discard_pile_of_their_game(client, game_manager, started_game):
+    _full_state(started_game)
+
+    assert client.put(f"/event/early_train_paddington/{started_game}").status_code == 200
+
+    (call,) = game_manager.broadcast_views.await_args_list
+    assert call.args[1] == started_game
+    assert [m["type"] for m in json.loads(call.args[0][None])["data"]] == ["gameDelta", "droppedCards"]
+
+
+def test_brokers_across_workers_get_the_full_state(client, game_manager, started_game, monkeypatch):
+    # Cada worker numera las versiones con su propio estado: entre workers no hay deltas
+    monkeypatch.setattr(services_websockets.broker, "local", False)
+    _full_state(started_game)
+
+    client.put(f"/game/update_turn/{started_game}")
+    assert [m["type"] for m in _sent(game_manager)] == ["gameUpdated", "playersState"]
+    # Sin commits nuevos no hay nada que mandar
+    assert _game_information_messages(started_game) == {}
@@ -0,0 +1,130 @@
+"""
+Tests del estado en memoria de las partidas (src/gameState).
+"""
+import datetime
+import pytest
+from unittest.mock import patch, AsyncMock
+from sqlalchemy import event
+
+from src.database.models import Game, Player, Detective, Event, Secrets, Card
+from src.gameState.game_state import gameStateManager
+from src.tests.conftest import engine
+
+pytestmark = pytest.mark.game_state_cache
+
+
+@pytest.fixture
+def setup_state_data(db_session):
+    game = Game(game_id=1, name="State Game", status="in course", max_players=4, min_players=2, players_amount=2, current_turn=1)
+    player1 = Player(player_id=1, name="P1", host=True, birth_date=datetime.date(2000, 1, 1), game_id=1, turn_order=1)
+    player2 = Player(player_id=2, name="P2", host=False, birth_date=datetime.date(2001, 1, 1), game_id=1, turn_order=2)
+    hand = [Detective(card_id=i, name="Miss Marple", type="detective", picked_up=True, dropped=False, player_id=1, game_id=1, quantity_set=3)
+            for i in range(1, 4)]
+    deck = [Event(card_id=i, name="Not so fast", type="event", picked_up=False, dropped=False, game_id=1) for i in range(4, 8)]
+    secret = Secrets(secret_id=1, murderer=True, acomplice=False, revelated=False, player_id=2, game_id=1)
+    db_session.add_all([game, player1, player2, secret] + hand + deck)
+    db_session.commit()
+    return db_session
+
+
+def _assert_mirrors_db(db_session, game_id):
+    state = gameStateManager.get(game_id)
+    db_session.expire_all()
+    for card in db_session.query(Card).filter(Card.game_id == game_id):
+        row = state.cards[card.card_id]
+        assert (row.player_id, row.picked_up, row.dropped, row.draft, row.discardInt) == \
+               (card.player_id, card.picked_up, card.dropped, card.draft, card.discardInt)
+    game = db_session.get(Game, game_id)
+    assert (state.status, state.cards_left) == (game.status, game.cards_left)
+    for player in db_session.query(Player).filter(Player.game_id == game_id):
+        assert state.players[player.player_id].hand_size == player.hand_size
+
+
+@patch('src.routes.cards_routes.broadcast_game_information', new_callable=AsyncMock)
+@patch('src.routes.cards_routes.broadcast_last_discarted_cards', new_callable=AsyncMock)
+def test_state_follows_committed_actions(mock_discard, mock_info, client, setup_state_data):
+    db_session = setup_state_data
+    assert gameStateManager.load(db_session, 1) is not None
+
+    assert client.put("/cards/pick_up/2,1").status_code == 200
+    assert client.put("/cards/drop/1").status_code == 200
+    assert client.put("/cards/game/drop_list/1", json={"card_ids": [2, 3]}).status_code == 200
+
+    state = gameStateManager.get(1)
+    assert state.hand_size(1) == 0 and state.hand_size(2) == 1
+    assert [c.card_id for c in state.discard_pile()] == [3, 2, 1]
+    _assert_mirrors_db(db_session, 1)
+
+
+def test_rollback_does_not_reach_state(setup_state_data):
+    db_session = setup_state_data
+    gameStateManager.load(db_session, 1)
+
+    db_session.get(Card, 1).dropped = True
+    db_session.flush()
+    db_session.rollback()
+
+    assert gameStateManager.get(1).cards[1].dropped is False
+
+
+@patch('src.routes.cards_routes.broadcast_last_discarted_cards', new_callable=AsyncMock)
+def test_cached_action_does_not_read_database(mock_discard, client, setup_state_data):
+    gameStateManager.load(setup_state_data, 1)
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        response = client.put("/cards/drop/1")
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+    assert response.status_code == 200
+    assert response.json()["dropped"] is True
+    assert statements and not any(s.lstrip().upper().startswith("SELECT") for s in statements)
+
+
+@patch('src.database.services.services_games.broadcast_game_information', new_callable=AsyncMock)
+@patch('src.routes.secrets_routes.broadcast_game_information', new_callable=AsyncMock)
+def test_finished_game_is_evicted(mock_secret_info, mock_finish_info, client, setup_state_data):
+    gameStateManager.load(setup_state_data, 1)
+
+    response = client.put("/secrets/reveal/1")
+
+    assert response.status_code == 200
+    assert response.json()["revelated"] is True
+    assert gameStateManager.get(1) is None
+    assert gameStateManager.game_of(Player, 1) is None
+
+
+@patch('src.routes.games_routes.broadcast_game_information', new_callable=AsyncMock)
+def test_turn_rotation_is_resolved_from_state(mock_info, client, setup_state_data):
+    db_session = setup_state_data
+    state = gameStateManager.load(db_session, 1)
+    assert state.turn_players() == [1, 2] and state.current_player() == 1
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        assert client.put("/game/update_turn/1").json() == 2
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+    assert not any(s.lstrip().upper().startswith("SELECT") for s in statements)
+    assert gameStateManager.get(1).current_player() == 2
+    assert client.put("/game/update_turn/1").json() == 1
+
+
+def test_turn_sequence_follows_assigned_turns(setup_state_data):
+    from src.database.services.services_games import assign_turn_to_players
+    db_session = setup_state_data
+    state = gameStateManager.load(db_session, 1)
+    assert state.turn_players() == [1, 2]
+
+    # P2 (1/1/2001) y P1 (1/1/2000) están a la misma distancia del 15/9: desempata el player_id
+    db_session.get(Player, 2).birth_date = datetime.date(2001, 9, 10)
+    db_session.commit()
+    assign_turn_to_players(1, db_session)
+
+    assert gameStateManager.get(1).turn_players() == [2, 1]
+    assert gameStateManager.get(1).current_player() == 2
@@ -5,7 +5,13 @@ import datetime
 import pytest
 from unittest.mock import patch, AsyncMock
 import datetime
-from src.database.models import Game, Player , Event , Card , Detective
+from src.database.models import Game, Player , Event , Card , Detective, Secrets
+from src.database.card_catalog import catalog_rows
+from src.database.database import init_db
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
 from src.database.services.services_games import assign_turn_to_players, update_players_on_game, finish_game
 from src.database.services.services_cards import (
     init_detective_cards,
@@ -14,6 +20,8 @@ from src.database.services.services_cards import (
     deal_cards_to_players,
     setup_initial_draft_pile,
     replenish_draft_pile,
+    shuffle_deck,
+    reserve_discard_order,
     only_6
 )
 
@@ -134,11 +142,12 @@ async def test_delete_game_not_found(client):
 @patch('src.routes.games_routes.deal_cards_to_players')
 @patch('src.routes.games_routes.deal_NSF')
 @patch('src.routes.games_routes.init_secrets')
+@patch('src.routes.games_routes.shuffle_deck')
 @patch('src.routes.games_routes.init_event_cards')
 @patch('src.routes.games_routes.init_detective_cards')
 @patch('src.routes.games_routes.assign_turn_to_players')
 @pytest.mark.asyncio
-async def test_initialize_game_success(mock_assign_turns, mock_init_detectives, mock_init_events, mock_init_secrets, mock_deal_nsf, mock_deal_cards, mock_deal_secrets, mock_setup_draft, client, db_session, mocker):
+async def test_initialize_game_success(mock_assign_turns, mock_init_detectives, mock_init_events, mock_shuffle_deck, mock_init_secrets, mock_deal_nsf, mock_deal_cards, mock_deal_secrets, mock_setup_draft, client, db_session, mocker):
     """Verifies a 'bootable' game can be initialized and all setup services are called."""
     mock_broadcast_game = mocker.patch('src.routes.games_routes.broadcast_game_information', new_callable=AsyncMock)
     mock_broadcast_avail = mocker.patch('src.routes.games_routes.broadcast_available_games', new_callable=AsyncMock)
@@ -157,6 +166,7 @@ async def test_initialize_game_success(mock_assign_turns, mock_init_detectives,
     mock_assign_turns.assert_called_once()
     mock_init_detectives.assert_called_once()
     mock_init_events.assert_called_once()
+    mock_shuffle_deck.assert_called_once()
     mock_init_secrets.assert_called_once()
     mock_deal_nsf.assert_called_once()
     mock_deal_cards.assert_called_once()
@@ -165,6 +175,89 @@ async def test_initialize_game_success(mock_assign_turns, mock_init_detectives,
     mock_broadcast_game.assert_awaited_once()
     mock_broadcast_avail.assert_awaited_once()
 
+def _bootable_game(db_session, players=4):
+    game = Game(name="Start", status="bootable", max_players=6, min_players=2, players_amount=players)
+    db_session.add(game)
+    db_session.commit()
+    db_session.add_all([Player(name=f"P{i}", host=i == 0, birth_date=datetime.date(2000, 1 + i, 1), game_id=game.game_id)
+                        for i in range(players)])
+    db_session.commit()
+    return game.game_id
+
+
+def _count_transactions(session):
+    counts = {"commit": 0, "rollback": 0}
+    listeners = [(name, lambda s, name=name: counts.__setitem__(name, counts[name] + 1)) for name in counts]
+    for name, listener in listeners:
+        event.listen(session, f"after_{name}", listener)
+    return counts
+
+
+def test_initialize_game_is_a_single_commit(client, db_session, mocker):
+    """The whole start sequence (turns, deck, secrets, dealing, draft) is one unit of work."""
+    mocker.patch('src.routes.games_routes.broadcast_game_information', new_callable=AsyncMock)
+    mocker.patch('src.routes.games_routes.broadcast_available_games', new_callable=AsyncMock)
+    game_id = _bootable_game(db_session)
+    counts = _count_transactions(db_session)
+
+    response = client.post(f"/game/beginning/{game_id}")
+
+    assert response.status_code == 202
+    assert counts["commit"] == 1
+    assert response.json()["status"] == "in course"
+    assert db_session.query(Card).filter(Card.game_id == game_id).count() == 61
+    assert sorted(p.turn_order for p in db_session.query(Player).filter(Player.game_id == game_id)) == [1, 2, 3, 4]
+    assert db_session.query(Card).filter(Card.game_id == game_id, Card.draft == True).count() == 3
+
+
+def test_initialize_game_failure_commits_nothing(client, db_session, mocker):
+    mocker.patch('src.routes.games_routes.broadcast_game_information', new_callable=AsyncMock)
+    mocker.patch('src.routes.games_routes.broadcast_available_games', new_callable=AsyncMock)
+    mocker.patch('src.routes.games_routes.deal_secrets_to_players',
+                 side_effect=HTTPException(status_code=500, detail="boom"))
+    game_id = _bootable_game(db_session)
+    counts = _count_transactions(db_session)
+
+    response = client.post(f"/game/beginning/{game_id}")
+
+    assert response.status_code == 500
+    assert counts == {"commit": 0, "rollback": 1}
+
+def _trajectory(db_session, game_id):
+    """The start of a game in terms that do not depend on row ids: deck order, hands and secrets."""
+    players = [p.player_id for p in db_session.query(Player).filter(Player.game_id == game_id).order_by(Player.player_id)]
+    cards = db_session.query(Card).filter(Card.game_id == game_id).order_by(Card.deck_position).all()
+    secrets = db_session.query(Secrets).filter(Secrets.game_id == game_id).order_by(Secrets.secret_id).all()
+    return ([(c.name, players.index(c.player_id) if c.player_id else None, c.draft) for c in cards],
+            [(s.murderer, s.acomplice, players.index(s.player_id)) for s in secrets])
+
+
+def test_games_with_the_same_seed_start_identically(client, db_session, mocker):
+    mocker.patch('src.routes.games_routes.broadcast_game_information', new_callable=AsyncMock)
+    mocker.patch('src.routes.games_routes.broadcast_available_games', new_callable=AsyncMock)
+    game_ids = [_bootable_game(db_session) for _ in range(3)]
+    for game_id, seed in zip(game_ids, (1234, 1234, 4321)):
+        db_session.get(Game, game_id).seed = seed
+    db_session.commit()
+
+    for game_id in game_ids:
+        assert client.post(f"/game/beginning/{game_id}").status_code == 202
+
+    first, again, other = (_trajectory(db_session, game_id) for game_id in game_ids)
+    assert first == again
+    assert first[0] != other[0]
+
+
+def test_create_game_stores_the_given_seed(client, db_session, mocker):
+    mocker.patch('src.routes.games_routes.broadcast_available_games', new_callable=AsyncMock)
+    payload = {"name": "Seeded", "max_players": 4, "min_players": 2, "status": "waiting players"}
+    seeded = client.post("/games", json={**payload, "seed": 99}).json()["game_id"]
+    drawn = client.post("/games", json=payload).json()["game_id"]
+
+    assert db_session.get(Game, seeded).seed == 99
+    assert db_session.get(Game, drawn).seed is not None
+
+
 @pytest.mark.asyncio
 async def test_initialize_game_not_found(client):
     """Verifies a 404 for initializing a non-existent game."""
@@ -203,12 +296,13 @@ async def test_update_turn_success(client, db_session, mocker):
     game = Game(name="Test Game", status="in course", max_players=4, min_players=2, players_amount=2, current_turn=1)
     db_session.add(game)
     db_session.commit()
+    game_id = game.game_id # Guardamos el ID antes de la llamada
 
-    response = client.put(f"/game/update_turn/{game.game_id}")
+    response = client.put(f"/game/update_turn/{game_id}")
     
     assert response.status_code == 202
     assert response.json() == 2
-    mock_broadcast.assert_awaited_once_with(game.game_id)
+    mock_broadcast.assert_awaited_once_with(game_id)
 
 @pytest.mark.asyncio
 async def test_update_turn_wraps_around(client, db_session, mocker):
@@ -217,12 +311,13 @@ async def test_update_turn_wraps_around(client, db_session, mocker):
     game = Game(name="Test Game", status="in course", max_players=2, min_players=2, players_amount=2, current_turn=2)
     db_session.add(game)
     db_session.commit()
+    game_id = game.game_id # Guardamos el ID antes de la llamada
     
-    response = client.put(f"/game/update_turn/{game.game_id}")
+    response = client.put(f"/game/update_turn/{game_id}")
     
     assert response.status_code == 202
     assert response.json() == 1
-    mock_broadcast.assert_awaited_once_with(game.game_id)
+    mock_broadcast.assert_awaited_once_with(game_id)
 
 @pytest.mark.asyncio
 async def test_update_turn_game_not_found(client):
@@ -372,11 +467,80 @@ def test_full_game_initialization_flow(db_session):
         assert card.player_id is None
 
 
+def test_deck_is_copied_from_catalog(db_session):
+    game = Game(name="Mazo", max_players=4, min_players=2, players_amount=2)
+    db_session.add(game)
+    db_session.commit()
+
+    assert init_detective_cards(game.game_id, db_session) == {"message": "25 detective cards created successfully"}
+    assert init_event_cards(game.game_id, db_session) == {"message": "36 event cards created successfully"}
+
+    deck = db_session.query(Card).filter(Card.game_id == game.game_id).all()
+    expected = [(r["type"], r["name"], r["quantity_set"]) for r in catalog_rows()]
+    assert sorted(((c.type, c.name, getattr(c, "quantity_set", None)) for c in deck), key=str) == sorted(expected, key=str)
+    assert all(not c.picked_up and not c.dropped and not c.draft and c.discardInt == 0 and c.player_id is None for c in deck)
+
+
+def test_deck_is_shuffled_once_and_drawn_in_order(db_session):
+    game = Game(name="Mazo", max_players=4, min_players=2, players_amount=1)
+    player = Player(name="P1", game=game, birth_date=datetime.date(2000, 1, 1))
+    db_session.add_all([game, player])
+    db_session.commit()
+    init_detective_cards(game.game_id, db_session)
+    init_event_cards(game.game_id, db_session)
+
+    shuffle_deck(game.game_id, db_session)
+
+    deck = db_session.query(Card).filter(Card.game_id == game.game_id).order_by(Card.deck_position).all()
+    assert [c.deck_position for c in deck] == list(range(61))
+    deal_cards_to_players(game.game_id, db_session)
+    assert sorted(c.card_id for c in player.cards) == sorted(c.card_id for c in deck[:5])
+    setup_initial_draft_pile(game.game_id, db_session)
+    db_session.commit()
+    assert {c.card_id for c in db_session.query(Card).filter(Card.draft == True)} == {c.card_id for c in deck[5:8]}
+
+
+def test_discard_order_is_reserved_from_game_counter(db_session):
+    game = Game(name="Descarte", max_players=4, min_players=2, players_amount=1)
+    db_session.add(game)
+    db_session.commit()
+
+    assert reserve_discard_order(game.game_id, 1, db_session) == 1
+    assert reserve_discard_order(game.game_id, 3, db_session) == 2
+    assert reserve_discard_order(game.game_id, 1, db_session) == 5
+    db_session.commit()
+    db_session.refresh(game)
+    assert game.discard_seq == 5
+
+
+def test_concurrent_discard_reservations_never_collide(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'discards.db'}", connect_args={"timeout": 30})
+    init_db(engine)
+    with Session(engine) as session:
+        game = Game(name="Concurrente", max_players=4, min_players=2, players_amount=2)
+        session.add(game)
+        session.commit()
+        game_id = game.game_id
+
+    def reserve_many(_):
+        taken = []
+        with Session(engine) as session:
+            for _ in range(25):
+                taken.append(reserve_discard_order(game_id, 2, session))
+                session.commit()
+        return taken
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        starts = [start for taken in pool.map(reserve_many, range(4)) for start in taken]
+    assert sorted(starts) == list(range(1, 200, 2))
+
+
 def test_replenish_draft_pile(db_session):
     """
     Prueba específicamente la función 'replenish_draft_pile'.
     """
-    game = Game(name="Partida en curso", max_players=4, min_players=2, players_amount=1, cards_left=10)
+    # cards_left lo calcula el contador a partir de las cartas del mazo
+    game = Game(name="Partida en curso", max_players=4, min_players=2, players_amount=1)
     db_session.add(game)
     db_session.commit()
     
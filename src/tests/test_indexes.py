@@ -0,0 +1,83 @@
+"""
+Tests de planes de consulta: verifican que los filtros calientes sobre cards,
+secrets y games usen los índices compuestos en vez de recorrer la tabla entera.
+Los de MySQL solo corren si se define TEST_MYSQL_URL.
+"""
+import os
+import pytest
+from sqlalchemy import MetaData, create_engine, desc, inspect, select
+from sqlalchemy.orm import Session
+from src.database.database import Base, init_db
+from src.database import migrations
+from src.database.models import Card, Game, Secrets
+
+
+def hot_queries():
+    """Consultas equivalentes a las de los servicios y rutas, con el índice que deberían usar."""
+    return [
+        # pickup_a_card: mazo de la partida
+        (select(Card).where(Card.game_id == 1, Card.dropped == False, Card.picked_up == False, Card.draft == False),
+         "ix_cards_game_zone"),
+        # draw_from_deck: cartas de arriba del mazo barajado, sin ordenar en memoria
+        (select(Card).where(Card.game_id == 1, Card.player_id.is_(None), Card.draft == False, Card.dropped.is_not(True))
+         .order_by(Card.deck_position, Card.card_id).limit(1), "ix_cards_game_deck"),
+        # only_6: mano del jugador
+        (select(Card).where(Card.player_id == 1, Card.picked_up == True, Card.dropped == False),
+         "ix_cards_player_dropped"),
+        # get_top_discard_pile / broadcast_last_discarted_cards
+        (select(Card).where(Card.game_id == 1, Card.dropped == True).order_by(desc(Card.discardInt)).limit(5),
+         "ix_cards_game_discard"),
+        # list_secrets_of_game
+        (select(Secrets).where(Secrets.game_id == 1, Secrets.player_id == 1), "ix_secrets_game_player"),
+        # list_available_games
+        (select(Game).where(Game.status == "bootable"), "ix_games_status"),
+    ]
+
+
+def sqlite_plan(conn, stmt) -> str:
+    sql = stmt.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True})
+    return " | ".join(row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}"))
+
+
+@pytest.mark.parametrize("stmt, index", hot_queries())
+def test_sqlite_hot_queries_use_indexes(db_session, stmt, index):
+    plan = sqlite_plan(db_session.connection(), stmt)
+
+    assert index in plan
+    assert "TEMP B-TREE" not in plan  # el ORDER BY (discardInt, deck_position) lo resuelve el índice
+
+
+def test_migration_adds_indexes_to_existing_database(tmp_path):
+    """Una base creada antes de los índices los recibe al correr init_db."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    old_schema = MetaData()
+    for table in Base.metadata.sorted_tables:
+        table.to_metadata(old_schema).indexes.clear()
+    old_schema.create_all(engine)
+
+    init_db(engine)
+
+    card_indexes = {ix["name"] for ix in inspect(engine).get_indexes("cards")}
+    assert {"ix_cards_game_zone", "ix_cards_player_dropped", "ix_cards_game_discard"} <= card_indexes
+    assert "ix_secrets_game_player" in {ix["name"] for ix in inspect(engine).get_indexes("secrets")}
+    assert "ix_games_status" in {ix["name"] for ix in inspect(engine).get_indexes("games")}
+    with engine.connect() as conn:
+        assert migrations.current_version(conn) == migrations.head_version()
+
+
+def test_new_database_is_stamped_with_head(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'new.db'}")
+    init_db(engine)
+    with engine.connect() as conn:
+        assert migrations.current_version(conn) == migrations.head_version()
+
+
+@pytest.mark.skipif(not os.getenv("TEST_MYSQL_URL"), reason="TEST_MYSQL_URL no definido")
+@pytest.mark.parametrize("stmt, index", hot_queries())
+def test_mysql_hot_queries_use_indexes(stmt, index):
+    engine = create_engine(os.environ["TEST_MYSQL_URL"])
+    init_db(engine)
+    with Session(engine) as session:
+        sql = stmt.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True})
+        keys = [row._mapping["possible_keys"] or "" for row in session.connection().exec_driver_sql(f"EXPLAIN {sql}")]
+    assert any(index in key for key in keys)
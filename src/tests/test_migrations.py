@@ -0,0 +1,169 @@
+"""
+Tests de las migraciones de datos sobre una base SQLite con el esquema anterior.
+"""
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import Session
+from src.database.database import init_db
+from src.database.models import Card, Detective, Event, Game
+
+OLD_SCHEMA = [
+    "CREATE TABLE games (game_id INTEGER PRIMARY KEY, name VARCHAR(30) NOT NULL, status VARCHAR(50), "
+    "max_players INTEGER NOT NULL, min_players INTEGER NOT NULL, players_amount INTEGER NOT NULL, "
+    "current_turn INTEGER, cards_left INTEGER)",
+    "CREATE TABLE players (player_id INTEGER PRIMARY KEY, name VARCHAR(100) NOT NULL, host BOOLEAN, "
+    "birth_date DATE NOT NULL, turn_order INTEGER, avatar VARCHAR(255), game_id INTEGER NOT NULL)",
+    "CREATE TABLE sets (set_id INTEGER PRIMARY KEY, name VARCHAR(30), player_id INTEGER, game_id INTEGER NOT NULL)",
+    "CREATE TABLE cards (card_id INTEGER PRIMARY KEY, type VARCHAR(15), picked_up BOOLEAN, dropped BOOLEAN, "
+    "player_id INTEGER, game_id INTEGER NOT NULL, draft BOOLEAN, discardInt INTEGER)",
+    "CREATE TABLE detectives (name VARCHAR(30), card_id INTEGER PRIMARY KEY, quantity_set INTEGER, set_id INTEGER)",
+    "CREATE TABLE events (name VARCHAR(30), card_id INTEGER PRIMARY KEY)",
+]
+
+
+def test_cards_are_folded_into_single_table(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'joined.db'}")
+    with engine.begin() as conn:
+        for ddl in OLD_SCHEMA:
+            conn.execute(text(ddl))
+        conn.execute(text("INSERT INTO games VALUES (1, 'g', 'in course', 4, 2, 2, 1, 10)"))
+        conn.execute(text("INSERT INTO sets VALUES (7, 'Miss Marple', NULL, 1)"))
+        conn.execute(text("INSERT INTO cards VALUES (1, 'detective', 0, 0, NULL, 1, 0, 0)"))
+        conn.execute(text("INSERT INTO cards VALUES (2, 'event', 0, 1, NULL, 1, 0, 3)"))
+        conn.execute(text("INSERT INTO detectives VALUES ('Miss Marple', 1, 3, 7)"))
+        conn.execute(text("INSERT INTO events VALUES ('Not so fast', 2)"))
+
+    init_db(engine)
+
+    tables = inspect(engine).get_table_names()
+    assert "detectives" not in tables and "events" not in tables
+    with Session(engine) as session:
+        detective = session.get(Card, 1)
+        event = session.get(Card, 2)
+        assert isinstance(detective, Detective)
+        assert (detective.name, detective.quantity_set, detective.set_id) == ("Miss Marple", 3, 7)
+        assert isinstance(event, Event)
+        assert event.name == "Not so fast"
+        assert event.discardInt == 3
+        assert session.get(Game, 1).discard_seq == 3
+
+
+def test_card_catalog_is_created_and_seeded(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        for ddl in OLD_SCHEMA:
+            conn.execute(text(ddl))
+
+    init_db(engine)
+    init_db(engine)  # volver a correrlo no duplica el catálogo
+
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT type, COUNT(*) FROM card_catalog GROUP BY type ORDER BY type")).all()
+    assert [tuple(r) for r in rows] == [("detective", 25), ("event", 36)]
+
+
+def test_existing_cards_get_a_shuffled_deck_position(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        for ddl in OLD_SCHEMA:
+            conn.execute(text(ddl))
+        for game_id in (1, 2):
+            conn.execute(text(f"INSERT INTO games VALUES ({game_id}, 'g', 'in course', 4, 2, 2, 1, 10)"))
+            for i in range(10):
+                conn.execute(text(f"INSERT INTO cards VALUES ({game_id * 100 + i}, 'event', 0, 0, NULL, {game_id}, 0, 0)"))
+
+    init_db(engine)
+
+    with engine.connect() as conn:
+        for game_id in (1, 2):
+            positions = conn.execute(text(f"SELECT deck_position FROM cards WHERE game_id = {game_id}")).scalars().all()
+            assert sorted(positions) == list(range(10))
+        indexes = {ix["name"] for ix in inspect(engine).get_indexes("cards")}
+    assert "ix_cards_game_deck" in indexes and "ix_cards_game_player_draft" not in indexes
+
+
+def test_card_counters_are_seeded_from_cards(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        for ddl in OLD_SCHEMA:
+            conn.execute(text(ddl))
+        conn.execute(text("INSERT INTO games VALUES (1, 'g', 'in course', 4, 2, 1, 1, 40)"))
+        conn.execute(text("INSERT INTO games VALUES (2, 'g', 'waiting players', 4, 2, 1, NULL, NULL)"))
+        conn.execute(text("INSERT INTO players VALUES (1, 'p', 1, '2000-01-01', 1, NULL, 1)"))
+        conn.execute(text("INSERT INTO cards VALUES (1, 'event', 1, 0, 1, 1, 0, 0)"))  # en mano
+        conn.execute(text("INSERT INTO cards VALUES (2, 'event', 1, 1, 1, 1, 0, 1)"))  # descartada
+        conn.execute(text("INSERT INTO cards VALUES (3, 'event', 0, 0, NULL, 1, 1, 0)"))  # draft
+        conn.execute(text("INSERT INTO cards VALUES (4, 'event', 0, 0, NULL, 1, 0, 0)"))  # mazo
+        conn.execute(text("INSERT INTO cards VALUES (5, 'event', 0, 0, NULL, 1, 0, 0)"))  # mazo
+
+    init_db(engine)
+
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT hand_size FROM players WHERE player_id = 1")).scalar() == 1
+        assert conn.execute(text("SELECT game_id, cards_left FROM games ORDER BY game_id")).all() == [(1, 2), (2, None)]
+
+
+def test_archive_table_and_finished_at_are_added(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        for ddl in OLD_SCHEMA:
+            conn.execute(text(ddl))
+
+    init_db(engine)
+
+    inspector = inspect(engine)
+    assert "finished_at" in {c["name"] for c in inspector.get_columns("games")}
+    assert "ix_games_status_finished" in {ix["name"] for ix in inspector.get_indexes("games")}
+    assert "ix_archived_games_archived_at" in {ix["name"] for ix in inspector.get_indexes("archived_games")}
+
+
+def test_game_seed_is_added(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        for ddl in OLD_SCHEMA:
+            conn.execute(text(ddl))
+        conn.execute(text("INSERT INTO games VALUES (1, 'g', 'in course', 4, 2, 1, 1, 40)"))
+
+    init_db(engine)
+
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT seed FROM games")).scalar() is None
+
+
+def test_action_log_table_is_added(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        for ddl in OLD_SCHEMA:
+            conn.execute(text(ddl))
+        conn.execute(text("INSERT INTO games VALUES (1, 'g', 'in course', 4, 2, 1, 1, 40)"))
+
+    init_db(engine)
+
+    inspector = inspect(engine)
+    assert "ix_game_actions_game_seq" in {ix["name"] for ix in inspector.get_indexes("game_actions")}
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT action_seq FROM games")).scalar() == 0
+
+
+def test_archived_game_id_becomes_unique(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        for ddl in OLD_SCHEMA:
+            conn.execute(text(ddl))
+    init_db(engine)
+    with engine.begin() as conn:
+        # Una base de antes de la versión 10, con la misma partida archivada por dos workers
+        conn.execute(text("DROP INDEX uq_archived_games_game"))
+        conn.execute(text("CREATE INDEX ix_archived_games_game ON archived_games (game_id)"))
+        conn.execute(text("UPDATE schema_version SET version = 9"))
+        for archive_id, game_id in ((1, 5), (2, 5), (3, 6)):
+            conn.execute(text("INSERT INTO archived_games (archive_id, game_id, name, max_players, min_players, "
+                              f"players_amount, archived_at, snapshot) VALUES ({archive_id}, {game_id}, 'g', 4, 2, 2, "
+                              "'2025-01-01 00:00:00', '{}')"))
+
+    init_db(engine)
+
+    indexes = {ix["name"]: ix for ix in inspect(engine).get_indexes("archived_games")}
+    assert "ix_archived_games_game" not in indexes and indexes["uq_archived_games_game"]["unique"]
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT archive_id, game_id FROM archived_games ORDER BY archive_id")).all() == \
+               [(1, 5), (3, 6)]
@@ -0,0 +1,51 @@
+"""
+Tests de la telemetría del pool de conexiones (src/database/pool_metrics.py).
+"""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, exc, text
+
+from src.database.database import run_db
+from src.database.pool_metrics import InstrumentedQueuePool, PoolMetrics, RouteTagMiddleware, current_route, instrument
+
+
+def test_pool_counts_overflow_timeouts_and_longest_checkout(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=InstrumentedQueuePool,
+                           pool_size=1, max_overflow=1, pool_timeout=0.05)
+    metrics = instrument(engine, PoolMetrics())
+
+    first, second = engine.connect(), engine.connect()
+    second.execute(text("SELECT 1"))
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+    second.close()
+    data = metrics.snapshot(engine.pool)
+    first.close()
+
+    assert (data["checkouts"], data["overflow_hits"], data["timeouts"]) == (2, 1, 1)
+    assert data["wait_ms"]["count"] == 3 and data["wait_ms"]["max"] >= 50
+    assert sum(data["wait_ms"]["histogram"].values()) == 3
+    assert data["held"]["count"] == 1 and data["held"]["current"][0]["route"] == "background"
+    assert data["pool"]["size"] == 1 and data["pool"]["checked_out"] == 1
+    assert metrics.snapshot()["held"]["longest"]["route"] == "background"
+    engine.dispose()
+
+
+def test_checkouts_are_attributed_to_the_route_template():
+    app = FastAPI()
+    app.add_middleware(RouteTagMiddleware)
+
+    @app.get("/games/{game_id}")
+    async def route_of_threadpool_work(game_id: int):
+        # run_db corre en el threadpool: el ContextVar tiene que llegar igual
+        return await run_db(current_route)
+
+    assert TestClient(app).get("/games/7").json() == "GET /games/{game_id}"
+    assert current_route() == "background"
+
+
+def test_db_pool_endpoint(client):
+    response = client.get("/metrics/db-pool")
+    assert response.status_code == 200
+    assert {"checkouts", "overflow_hits", "timeouts", "wait_ms", "held", "pool"} <= response.json().keys()
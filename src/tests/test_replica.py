@@ -0,0 +1,74 @@
+"""
+Tests del ruteo de lecturas a la réplica (src/database/replica.py), con dos archivos
+SQLite: la "réplica" solo tiene lo que se copió a mano, como si viniera atrasada.
+"""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from src.database.database import init_db, run_db
+from src.database.models import Game
+from src.database.replica import ReadYourWritesMiddleware, ReplicaSession
+
+
+def _game(name):
+    return Game(name=name, status="waiting players", max_players=4, min_players=2, players_amount=0)
+
+
+@pytest.fixture
+def engines(tmp_path):
+    primary = create_engine(f"sqlite:///{tmp_path / 'primary.db'}")
+    replica = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    for engine in (primary, replica):
+        init_db(engine)
+        with Session(engine) as session:
+            session.add(_game("replicada"))
+            session.commit()
+    yield primary, replica
+    primary.dispose()
+    replica.dispose()
+
+
+def test_reads_go_to_replica_and_flushes_to_primary(engines):
+    primary, replica = engines
+    ReadSession = sessionmaker(bind=replica, class_=ReplicaSession, primary=primary)
+    with ReadSession() as db:
+        db.add(_game("nueva"))
+        db.commit()
+        # Fuera de un request no hay read-your-writes: se sigue leyendo la réplica
+        assert [g.name for g in db.query(Game)] == ["replicada"]
+    with Session(primary) as db:
+        assert [g.name for g in db.query(Game)] == ["replicada", "nueva"]
+
+
+def test_acting_request_reads_its_own_writes(engines):
+    primary, replica = engines
+    ReadSession = sessionmaker(bind=replica, class_=ReplicaSession, primary=primary)
+    app = FastAPI()
+    app.add_middleware(ReadYourWritesMiddleware)
+
+    def read_names():
+        with ReadSession() as db:
+            return [g.name for g in db.query(Game)]
+
+    def write(name):
+        with Session(primary) as db:
+            db.add(_game(name))
+            db.commit()
+
+    @app.get("/names")
+    async def names():
+        return await run_db(read_names)
+
+    @app.post("/games/{name}")
+    async def create(name: str):
+        # La escritura corre en el threadpool: la marca tiene que volver al request
+        await run_db(write, name)
+        return await run_db(read_names)
+
+    client = TestClient(app)
+    assert client.post("/games/nueva").json() == ["replicada", "nueva"]
+    # Otro request que no escribió lee la réplica (todavía sin la partida nueva)
+    assert client.get("/names").json() == ["replicada"]
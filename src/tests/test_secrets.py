@@ -213,4 +213,40 @@ def test_deal_secrets_avoids_murderer_and_acomplice_on_same_player(db_session):
 
     assert murderer_secret.player_id is not None
     assert acomplice_secret.player_id is not None
-    assert murderer_secret.player_id != acomplice_secret.player_id
\ No newline at end of file
+    assert murderer_secret.player_id != acomplice_secret.player_id
+
+def _chi_square(observed, expected):
+    return sum((o - e) ** 2 / e for o, e in zip(observed, expected))
+
+
+def test_secret_dealing_is_uniform_over_valid_deals():
+    """
+    Chi-cuadrado (p = 0.001, semilla fija) contra la distribución del reparto con
+    reintentos: uniforme sobre los repartos con Asesino y Cómplice separados.
+    """
+    import itertools
+    import random
+    from collections import Counter
+    from src.database.services.services_secrets import deal_secret_ids
+
+    rng = random.Random(20240915)
+    players = [10, 20, 30, 40, 50]
+    secrets = [(1, True, False), (2, False, True)] + [(i, False, False) for i in range(3, 16)]
+    trials = 20000
+    pairs, plain_owner, plain_with_murderer = Counter(), Counter(), 0
+    for _ in range(trials):
+        dealt = deal_secret_ids(players, secrets, rng)
+        assert sorted(Counter(dealt.values()).values()) == [3] * 5
+        pairs[(dealt[1], dealt[2])] += 1
+        plain_owner[dealt[3]] += 1
+        plain_with_murderer += dealt[3] == dealt[1]
+
+    # Dueños de Asesino y Cómplice: los 20 pares ordenados de jugadores distintos
+    ordered_pairs = list(itertools.permutations(players, 2))
+    assert set(pairs) == set(ordered_pairs)
+    assert _chi_square([pairs[p] for p in ordered_pairs], [trials / 20] * 20) < 43.82  # 19 g.l.
+    # Un secreto común cae en cualquier jugador por igual
+    assert _chi_square([plain_owner[p] for p in players], [trials / 5] * 5) < 18.47  # 4 g.l.
+    # ...y comparte mano con el Asesino en 2 de los 13 lugares que quedan para los comunes
+    expected = trials * 2 / 13
+    assert _chi_square([plain_with_murderer, trials - plain_with_murderer], [expected, trials - expected]) < 10.83  # 1 g.l.
@@ -0,0 +1,134 @@
+"""
+Tests de los snapshots binarios de partidas (src/database/services/services_snapshots.py).
+"""
+import datetime
+import json
+import os
+from unittest.mock import AsyncMock
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from src.database.database import init_db
+from src.database.models import Card, Game, GameAction, Player
+from src.database.services.services_snapshots import (MAGIC, decode_snapshot, encode_snapshot, restore_game,
+                                                      snapshot_game)
+from src.gameState.action_log import read_snapshot, replay_game
+from src.gameState.game_state import gameStateManager
+from src.routes.games_routes import start_game
+
+_BROADCASTS = {
+    "src.routes.games_routes": ("broadcast_game_information", "broadcast_available_games"),
+    "src.routes.cards_routes": ("broadcast_last_discarted_cards",),
+}
+
+STARTED_GAME = pytest.mark.parametrize("started_game", [{"players": 5, "seed": 3}], indirect=True)
+
+
+@pytest.fixture(autouse=True)
+def no_broadcasts(mocker):
+    for module, names in _BROADCASTS.items():
+        for name in names:
+            mocker.patch(f"{module}.{name}", new_callable=AsyncMock)
+
+
+def _normalized(tables):
+    """Las tablas de un snapshot con cada id reemplazado por su posición, para comparar partidas distintas."""
+    ids = {}
+    for name, pk in (("players", "player_id"), ("sets", "set_id"), ("cards", "card_id"), ("secrets", "secret_id")):
+        column = tables[name]["columns"].index(pk)
+        ids[pk] = {row[column]: i for i, row in enumerate(tables[name]["rows"])}
+    result = {}
+    for name, table in tables.items():
+        columns = table["columns"]
+        result[name] = [{c: ids[c].get(v) if c in ids else v for c, v in zip(columns, row)
+                         if c not in ("game_id", "action_seq")} for row in table["rows"]]
+    return result
+
+
+@STARTED_GAME
+def test_snapshot_round_trip_is_compact(db_session, started_game):
+    blob = snapshot_game(started_game, db_session)
+
+    assert blob.startswith(MAGIC)
+    tables = decode_snapshot(blob)
+    assert len(tables["cards"]["rows"]) == 61 and len(tables["secrets"]["rows"]) == 15
+    assert encode_snapshot(tables) == blob
+    birth_dates = [row[tables["players"]["columns"].index("birth_date")] for row in tables["players"]["rows"]]
+    assert birth_dates[0] == datetime.date(2000, 1, 1)
+    assert len(blob) * 4 < len(json.dumps(tables, default=str))
+
+
+@STARTED_GAME
+def test_restore_as_new_game_matches_the_original(client, db_session, started_game):
+    blob = client.get(f"/games/{started_game}/snapshot").content
+
+    response = client.post("/games/snapshot", content=blob, headers={"Content-Type": "application/octet-stream"})
+
+    assert response.status_code == 201
+    restored = response.json()["game_id"]
+    assert restored != started_game and response.json()["status"] == "in course"
+    assert _normalized(decode_snapshot(snapshot_game(restored, db_session))) == _normalized(decode_snapshot(blob))
+    # El estado en memoria y el registro de acciones arrancan desde el snapshot
+    assert gameStateManager.load(db_session, restored).cards_left == 61 - 5 * 6 - 3
+    assert db_session.query(GameAction.action).filter(GameAction.game_id == restored).scalar() == "restore"
+    assert replay_game(db_session, restored).cards_left == 61 - 5 * 6 - 3
+
+
+@STARTED_GAME
+def test_restore_in_place_rewinds_the_game(client, db_session, started_game):
+    blob = client.get(f"/games/{started_game}/snapshot").content
+    before = read_snapshot(db_session, started_game)
+    player_id = gameStateManager.load(db_session, started_game).current_player()
+    assert client.put(f"/cards/drop/{player_id}").status_code == 200
+    assert gameStateManager.load(db_session, started_game).hand_size(player_id) == 5
+
+    response = client.put(f"/games/{started_game}/snapshot", content=blob)
+
+    assert response.status_code == 200
+    assert gameStateManager.load(db_session, started_game).hand_size(player_id) == 6
+    assert read_snapshot(db_session, started_game) == before
+    assert db_session.query(Card).filter(Card.game_id == started_game, Card.dropped == True).count() == 0
+
+
+@STARTED_GAME
+def test_invalid_snapshots_are_rejected(client, db_session, started_game):
+    blob = client.get(f"/games/{started_game}/snapshot").content
+
+    assert client.post("/games/snapshot", content=b"not a snapshot").status_code == 400
+    assert client.post("/games/snapshot", content=blob[:20]).status_code == 400
+    assert client.put(f"/games/{started_game + 1}/snapshot", content=blob).status_code == 400
+    assert client.get("/games/999/snapshot").status_code == 404
+
+
+@STARTED_GAME
+def test_restore_as_new_game_without_insert_returning(db_session, started_game, monkeypatch):
+    # Como en MySQL: sin RETURNING en los INSERT masivos se inserta fila por fila
+    dialect = db_session.get_bind().dialect
+    monkeypatch.setattr(dialect, "insert_executemany_returning_sort_by_parameter_order", False)
+    blob = snapshot_game(started_game, db_session)
+
+    restored = restore_game(blob, db_session)
+
+    assert _normalized(decode_snapshot(snapshot_game(restored, db_session))) == _normalized(decode_snapshot(blob))
+
+
+@pytest.mark.skipif(not os.getenv("TEST_MYSQL_URL"), reason="TEST_MYSQL_URL no definido")
+def test_mysql_restore_as_new_game():
+    engine = create_engine(os.environ["TEST_MYSQL_URL"])
+    init_db(engine)
+    with Session(engine) as db:
+        game = Game(name="Snapshot", status="bootable", max_players=6, min_players=2, players_amount=3, seed=3)
+        db.add(game)
+        db.commit()
+        db.add_all([Player(name=f"P{i}", birth_date=datetime.date(2000, 1 + i, 1), game_id=game.game_id)
+                    for i in range(3)])
+        db.commit()
+        start_game(game, db)
+        blob = snapshot_game(game.game_id, db)
+
+        restored = restore_game(blob, db)
+
+        assert restored != game.game_id
+        assert _normalized(decode_snapshot(snapshot_game(restored, db))) == _normalized(decode_snapshot(blob))
@@ -97,7 +97,7 @@ async def test_broadcast_lobby_information_game_not_found(mock_game_manager, moc
 
 
 @patch('src.database.services.services_websockets.gameManager', new_callable=AsyncMock)
-@patch('src.database.services.services_websockets.SessionLocal')
+@patch('src.database.services.services_websockets.ReadSessionLocal')
 async def test_broadcast_game_information_success(mock_session_local, mock_game_manager, mock_db_session):
     # 1. Arrange: Configuramos el mock de SessionLocal para que devuelva nuestra sesión mockeada
     mock_session_local.return_value = mock_db_session
@@ -117,26 +117,29 @@ async def test_broadcast_game_information_success(mock_session_local, mock_game_
     # 2. Act
     await broadcast_game_information(game_id)
 
-    # 3. Assert
-    assert mock_game_manager.broadcast.await_count == 2
+    # 3. Assert: un frame por jugador y uno público para los sockets sin jugador
+    mock_game_manager.broadcast_views.assert_awaited_once()
+    frames, sent_game_id = mock_game_manager.broadcast_views.await_args.args
+    assert sent_game_id == game_id
+    assert set(frames) == {None, 1, 2}
     
-    # Verificamos la llamada para "gameUpdated"
-    game_updated_call_args = mock_game_manager.broadcast.await_args_list[0].args
-    game_updated_data = json.loads(game_updated_call_args[0])
+    # Verificamos el mensaje "gameUpdated"
+    game_updated_data, players_state_data = json.loads(frames[None])['data']
     assert game_updated_data['type'] == 'gameUpdated'
     assert json.loads(game_updated_data['data'])['status'] == 'in progress'
 
-    # Verificamos la llamada para "playersState"
-    players_state_call_args = mock_game_manager.broadcast.await_args_list[1].args
-    players_state_data = json.loads(players_state_call_args[0])
+    # Verificamos el mensaje "playersState": los demás solo ven lo público
     assert players_state_data['type'] == 'playersState'
     assert len(players_state_data['data']) == 2
+    assert all('cards' not in player for player in players_state_data['data'])
+    own, other = json.loads(frames[1])['data'][1]['data']
+    assert own['cards'] == [] and other['hand_size'] == 0
     
 
 # --- Pruebas para broadcast_last_discarted_cards ---
 
 @patch('src.database.services.services_websockets.gameManager', new_callable=AsyncMock)
-@patch('src.database.services.services_websockets.SessionLocal')
+@patch('src.database.services.services_websockets.ReadSessionLocal')
 async def test_broadcast_last_discarted_cards_success(mock_session_local, mock_game_manager, mock_db_session):
     # 1. Arrange
     mock_session_local.return_value = mock_db_session
@@ -170,26 +173,23 @@ async def test_broadcast_last_discarted_cards_success(mock_session_local, mock_g
     await broadcast_last_discarted_cards(player_id)
 
     # 3. Assert
-    assert mock_game_manager.broadcast.await_count == 2
+    mock_game_manager.broadcast_views.assert_awaited_once()
+    frames, sent_game_id = mock_game_manager.broadcast_views.await_args.args
+    assert sent_game_id == game_id # Verifica el game_id
+    assert set(frames) == {None, player_id}
 
-    calls = mock_game_manager.broadcast.await_args_list
-
-    # Primera llamada: playersState
-    call1_args = calls[0].args
-    data1 = json.loads(call1_args[0])
+    # Primer mensaje: playersState
+    data1, data2 = json.loads(frames[player_id])['data']
     assert data1['type'] == 'playersState'
-    assert call1_args[1] == game_id # Verifica el game_id
+    assert 'cards' in data1['data'][0]
 
-    # Segunda llamada: droppedCards
-    call2_args = calls[1].args
-    data2 = json.loads(call2_args[0])
+    # Segundo mensaje: droppedCards
     assert data2['type'] == 'droppedCards'
     assert len(data2['data']) == 2
-    assert call2_args[1] == game_id # Verifica el game_id
     
 
 @patch('src.database.services.services_websockets.gameManager', new_callable=AsyncMock)
-@patch('src.database.services.services_websockets.SessionLocal')
+@patch('src.database.services.services_websockets.ReadSessionLocal')
 async def test_broadcast_last_discarted_cards_no_cards_found(mock_session_local, mock_game_manager, mock_db_session):
     # 1. Arrange
     mock_session_local.return_value = mock_db_session
@@ -212,3 +212,20 @@ async def test_broadcast_last_discarted_cards_no_cards_found(mock_session_local,
     
     assert exc_info.value.status_code == 404
     mock_game_manager.broadcast.assert_not_awaited()
+
+
+async def test_messages_keep_the_previous_payload():
+    # Serializar directo a bytes no cambia lo que reciben los clientes
+    from fastapi.encoders import jsonable_encoder
+    from src.database.services.services_websockets import _dropped_cards_message, _game_message
+    from pydantic import TypeAdapter
+    from src.schemas.card_schemas import AllCardsResponse
+    from src.schemas.games_schemas import Game_Response
+    game = Game(game_id=1, name="Partida", status="in course", max_players=6, min_players=2, players_amount=2)
+    cards = [Event(card_id=101, type="event", game_id=1, player_id=1, dropped=True, picked_up=True, draft=False,
+                   discardInt=5, name="Dead card folly")]
+
+    game_message = json.loads(_game_message("gameUpdated", game))
+    assert game_message == {"type": "gameUpdated", "data": Game_Response.model_validate(game).model_dump_json()}
+    expected = jsonable_encoder(TypeAdapter(list[AllCardsResponse]).validate_python(cards, from_attributes=True))
+    assert json.loads(_dropped_cards_message(cards)) == {"type": "droppedCards", "data": expected}
@@ -0,0 +1,278 @@
+"""
+Pub/sub de los broadcasts de WebSocket entre workers.
+
+Los managers de connection_manager.py no le mandan directo a sus sockets: publican en
+un canal del broker ("lobby", "games") y cada worker, suscripto a esos canales, reparte
+lo que le llega entre sus propios sockets. Así, con varios workers de uvicorn, un
+jugador conectado al worker A recibe lo que disparó un request atendido por el B.
+
+`WS_BROKER` elige la implementación:
+
+- memory (default): un solo proceso; publicar es llamar a los suscriptores.
+- unix:///ruta/al.sock: un hub local que le reenvía cada mensaje a todos los workers
+  de la máquina. El primer worker que toma el lock (`<ruta>.lock`) levanta el hub y
+  todos, él incluido, se conectan como clientes. Si el hub se cae, los workers se
+  reconectan y el que tome el lock levanta uno nuevo.
+- tcp://host:puerto: lo mismo sobre TCP, para workers en varias máquinas; el hub lo
+  levanta el worker que logra hacer bind en esa dirección.
+
+Los mensajes viajan como JSON con un prefijo de 4 bytes con el largo.
+"""
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import struct
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+from pydantic_core import to_json
+
+logger = logging.getLogger(__name__)
+
+_LENGTH = struct.Struct(">I")
+
+
+class Broker(ABC):
+    """Canales de pub/sub: `subscribe` registra quién reparte cada canal en este worker."""
+
+    # Si todos los suscriptores viven en este proceso (los deltas del canal de una
+    # partida dependen del estado en memoria del worker que los arma)
+    local = True
+
+    def __init__(self):
+        self._subscribers: Dict[str, List[Callable[[Any], None]]] = defaultdict(list)
+        self.stats = {"published": 0, "delivered": 0}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: set = set()
+
+    def subscribe(self, channel: str, callback: Callable[[Any], None]):
+        self._subscribers[channel].append(callback)
+
+    def _deliver(self, channel: str, message: Any):
+        self.stats["delivered"] += 1
+        for callback in self._subscribers.get(channel, []):
+            try:
+                callback(message)
+            except Exception:
+                logger.exception("Error repartiendo un mensaje del canal %s", channel)
+
+    @abstractmethod
+    async def publish(self, channel: str, message: Any):
+        """Reparte `message` a los suscriptores de `channel` en todos los workers."""
+
+    def publish_soon(self, channel: str, message: Any):
+        """
+        `publish` desde código sincrónico y desde cualquier thread (el after_commit de la
+        Session): se agenda en el loop del broker. Sin arrancar no hace nada.
+        """
+        loop = self._loop
+        if loop is None:
+            return
+        try:
+            loop.call_soon_threadsafe(self._spawn, channel, message)
+        except RuntimeError:
+            # El loop ya se cerró (apagado)
+            pass
+
+    def _spawn(self, channel: str, message: Any):
+        task = asyncio.ensure_future(self._publish_logged(channel, message))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _publish_logged(self, channel: str, message: Any):
+        try:
+            await self.publish(channel, message)
+        except Exception:
+            logger.exception("Error publicando en el canal %s", channel)
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+
+    async def stop(self):
+        self._loop = None
+
+
+class InMemoryBroker(Broker):
+    """Un solo proceso: el mensaje se reparte enseguida, sin serializarlo."""
+
+    async def publish(self, channel: str, message: Any):
+        self.stats["published"] += 1
+        self._deliver(channel, message)
+
+
+def _pack(payload: bytes) -> bytes:
+    return _LENGTH.pack(len(payload)) + payload
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> bytes:
+    (length,) = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))
+    return await reader.readexactly(length)
+
+
+class SocketBroker(Broker):
+    """Workers conectados a un hub (unix:// o tcp://) que reenvía cada mensaje a todos."""
+
+    local = False
+
+    def __init__(self, url: str, retry_ms: int = 500, max_buffer: int = 8 * 1024 * 1024):
+        super().__init__()
+        parts = urlsplit(url)
+        if parts.scheme == "unix":
+            self.path: Optional[str] = parts.path
+        elif parts.scheme == "tcp":
+            self.path = None
+            self.host, self.port = parts.hostname, parts.port
+        else:
+            raise ValueError(f"WS_BROKER no soportado: {url}")
+        self.url = url
+        self.retry = retry_ms / 1000
+        # Un worker que no lee lo que le manda el hub se desconecta (se reconecta solo)
+        self.max_buffer = max_buffer
+        self.stats.update(local_only=0, reconnects=0, hub=False)
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._connected = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._lock_fd: Optional[int] = None
+        self._hub_clients: set = set()
+        self._hub_tasks: set = set()
+
+    async def publish(self, channel: str, message: Any):
+        self.stats["published"] += 1
+        writer = self._writer
+        if writer is None:
+            # Sin hub: al menos los sockets de este worker reciben el mensaje
+            self.stats["local_only"] += 1
+            self._deliver(channel, message)
+            return
+        writer.write(_pack(to_json([channel, message])))
+        await writer.drain()
+
+    async def start(self, timeout: float = 5):
+        await super().start()
+        self._task = asyncio.create_task(self._run())
+        try:
+            await asyncio.wait_for(self._connected.wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Broker %s sin hub todavía: los broadcasts quedan en este worker", self.url)
+
+    async def stop(self):
+        await super().stop()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        await self._stop_hub()
+
+    # --- Cliente ---
+
+    async def _open(self):
+        if self.path is not None:
+            return await asyncio.open_unix_connection(self.path)
+        return await asyncio.open_connection(self.host, self.port)
+
+    async def _run(self):
+        while True:
+            try:
+                reader, writer = await self._open()
+            except OSError:
+                if not await self._serve():
+                    await asyncio.sleep(self.retry)
+                continue
+            self._writer = writer
+            self._connected.set()
+            try:
+                while True:
+                    channel, message = json.loads(await _read_frame(reader))
+                    self._deliver(channel, message)
+            except (asyncio.IncompleteReadError, OSError):
+                logger.warning("Se perdió la conexión con el hub %s, reconectando", self.url)
+                self.stats["reconnects"] += 1
+            finally:
+                self._writer = None
+                self._connected.clear()
+                writer.close()
+
+    # --- Hub ---
+
+    async def _serve(self) -> bool:
+        """Levanta el hub si ningún otro worker lo tiene. True si quedó levantado."""
+        if self._server is not None:
+            return False
+        try:
+            if self.path is not None:
+                if not self._take_lock():
+                    return False
+                # Un .sock que quedó de un hub muerto (el lock ya se liberó)
+                if os.path.exists(self.path):
+                    os.unlink(self.path)
+                self._server = await asyncio.start_unix_server(self._hub_client, self.path)
+            else:
+                self._server = await asyncio.start_server(self._hub_client, self.host, self.port)
+        except OSError:
+            # Otro worker ganó el bind, o la dirección es de otra máquina
+            self._release_lock()
+            return False
+        self.stats["hub"] = True
+        logger.info("Hub de broadcasts en %s", self.url)
+        return True
+
+    def _take_lock(self) -> bool:
+        fd = os.open(self.path + ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        return True
+
+    def _release_lock(self):
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    async def _hub_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._hub_clients.add(writer)
+        self._hub_tasks.add(asyncio.current_task())
+        try:
+            while True:
+                frame = _pack(await _read_frame(reader))
+                for client in list(self._hub_clients):
+                    if client.transport.get_write_buffer_size() > self.max_buffer:
+                        self._hub_clients.discard(client)
+                        client.close()
+                    else:
+                        client.write(frame)
+        except (asyncio.IncompleteReadError, OSError):
+            pass
+        finally:
+            self._hub_clients.discard(writer)
+            self._hub_tasks.discard(asyncio.current_task())
+            writer.close()
+
+    async def _stop_hub(self):
+        if self._server is None:
+            return
+        self._server.close()
+        for client in list(self._hub_clients):
+            client.close()
+        # Con los sockets cerrados cada handler termina solo (sin cancelarlo)
+        await asyncio.gather(*self._hub_tasks, return_exceptions=True)
+        await self._server.wait_closed()
+        self._server = None
+        self.stats["hub"] = False
+        if self.path is not None and os.path.exists(self.path):
+            os.unlink(self.path)
+        self._release_lock()
+
+
+def create_broker(url: str) -> Broker:
+    if url in ("", "memory"):
+        return InMemoryBroker()
+    return SocketBroker(url)
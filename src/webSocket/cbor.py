@@ -0,0 +1,136 @@
+"""
+CBOR (RFC 8949) para los mensajes de WebSocket: solo los tipos que salen de un JSON
+(dict, list, str, int, float, bool, None) y bytes.
+
+Las claves de los dicts se repiten en cada carta y cada jugador, así que sus bytes
+codificados se guardan en `_KEYS` en vez de codificarlas cada vez.
+"""
+import struct
+from typing import Any, Tuple
+
+_FLOAT = struct.Struct(">d")
+_KEYS: dict = {}
+_MAX_KEYS = 4096
+
+
+def _head(out: bytearray, major: int, n: int):
+    major <<= 5
+    if n < 24:
+        out.append(major | n)
+    elif n < 0x100:
+        out += bytes((major | 24, n))
+    elif n < 0x10000:
+        out.append(major | 25)
+        out += n.to_bytes(2, "big")
+    elif n < 0x100000000:
+        out.append(major | 26)
+        out += n.to_bytes(4, "big")
+    else:
+        out.append(major | 27)
+        out += n.to_bytes(8, "big")
+
+
+def _key(key: str) -> bytes:
+    encoded = _KEYS.get(key)
+    if encoded is None:
+        raw = key.encode()
+        head = bytearray()
+        _head(head, 3, len(raw))
+        encoded = bytes(head) + raw
+        if len(_KEYS) < _MAX_KEYS:
+            _KEYS[key] = encoded
+    return encoded
+
+
+def _encode(value: Any, out: bytearray):
+    kind = type(value)
+    if kind is str:
+        raw = value.encode()
+        _head(out, 3, len(raw))
+        out += raw
+    elif kind is dict:
+        _head(out, 5, len(value))
+        for key, item in value.items():
+            if type(key) is str:
+                out += _key(key)
+            else:
+                _encode(key, out)
+            _encode(item, out)
+    elif kind is list or kind is tuple:
+        _head(out, 4, len(value))
+        for item in value:
+            _encode(item, out)
+    elif kind is bool:
+        out.append(0xf5 if value else 0xf4)
+    elif kind is int:
+        if value >= 0:
+            _head(out, 0, value)
+        else:
+            _head(out, 1, -1 - value)
+    elif value is None:
+        out.append(0xf6)
+    elif kind is float:
+        out.append(0xfb)
+        out += _FLOAT.pack(value)
+    elif kind is bytes:
+        _head(out, 2, len(value))
+        out += value
+    else:
+        raise TypeError(f"CBOR: tipo no soportado {kind.__name__}")
+
+
+def dumps(value: Any) -> bytes:
+    out = bytearray()
+    _encode(value, out)
+    return bytes(out)
+
+
+def _decode(data: bytes, i: int) -> Tuple[Any, int]:
+    initial = data[i]
+    major, info = initial >> 5, initial & 0x1f
+    i += 1
+    if major == 7:
+        if info == 20:
+            return False, i
+        if info == 21:
+            return True, i
+        if info == 22:
+            return None, i
+        if info == 27:
+            return _FLOAT.unpack_from(data, i)[0], i + 8
+        raise ValueError(f"CBOR: valor simple no soportado {initial:#x}")
+    if info < 24:
+        n = info
+    elif info <= 27:
+        size = 1 << (info - 24)
+        n, i = int.from_bytes(data[i:i + size], "big"), i + size
+    else:
+        raise ValueError(f"CBOR: largo indefinido no soportado {initial:#x}")
+    if major == 0:
+        return n, i
+    if major == 1:
+        return -1 - n, i
+    if major == 2:
+        return bytes(data[i:i + n]), i + n
+    if major == 3:
+        return data[i:i + n].decode(), i + n
+    if major == 4:
+        items = []
+        for _ in range(n):
+            item, i = _decode(data, i)
+            items.append(item)
+        return items, i
+    if major == 5:
+        mapping = {}
+        for _ in range(n):
+            key, i = _decode(data, i)
+            mapping[key], i = _decode(data, i)
+        return mapping, i
+    raise ValueError(f"CBOR: tipo mayor no soportado {major}")
+
+
+def loads(data: bytes) -> Any:
+    value, end = _decode(data, 0)
+    if end != len(data):
+        raise ValueError("CBOR: sobran bytes al final")
+    return value
@@ -1,53 +1,266 @@
+"""
+Conexiones WebSocket del lobby y de las partidas.
+
+Cada socket tiene su propia cola de envío acotada (`ClientSender`) que vacía una tarea
+propia: `broadcast` solo encola y vuelve enseguida, así un cliente lento o medio
+muerto no demora a los demás jugadores de la partida. Cada envío tiene un timeout;
+si vence o el socket falla, la conexión se cierra y se saca del manager. Si la cola
+de un cliente se llena, se aplica `WS_SLOW_CONSUMER_POLICY`:
+
+- close (default): se cierra el socket con 1013; el cliente se vuelve a conectar y
+  recibe el estado completo al conectarse.
+- drop_oldest: se descarta el mensaje más viejo de la cola y se encola el nuevo.
+
+Los sockets de una partida pueden identificar a su jugador al conectarse; con
+`broadcast_views` cada uno recibe la vista de su jugador (su mano y sus secretos) y los
+que no tienen jugador, la vista pública.
+
+Los broadcasts pasan por el broker (broker.py, `WS_BROKER`): cada manager publica en su
+canal y reparte entre sus sockets lo que le llega de todos los workers. Por el mismo
+broker viajan las partidas que commitea cada worker, para que los demás descarten su
+copia en memoria (gameStateManager.share). Con varios workers (WEB_CONCURRENCY) y sin
+WS_BROKER no hay cómo avisarles, así que el estado en memoria se apaga.
+
+Cada socket negocia su formato con el subprotocolo (wire.py): JSON, CBOR y, opcional,
+deflate. Un mismo frame se codifica una sola vez por formato en cada reparto; la
+compresión es por conexión y se hace al sacar el mensaje de la cola, en el orden en que
+se manda (con drop_oldest un mensaje descartado nunca entra al contexto del deflate).
+"""
+import asyncio
+import logging
+import os
 from collections import defaultdict
-from typing import List, Dict
-from fastapi import APIRouter, WebSocket 
+from dataclasses import dataclass, field
+from typing import Callable, List, Dict, Optional, Union
+from fastapi import APIRouter, WebSocket
+from src.gameState.game_state import gameStateManager
+from src.webSocket.broker import Broker, InMemoryBroker, create_broker
+from src.webSocket.wire import JSON, WireFormat, negotiate
 
 ws = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class WebSocketSettings:
+    queue_size: int = field(default_factory=lambda: int(os.getenv("WS_SEND_QUEUE_SIZE", 64)))
+    send_timeout_ms: int = field(default_factory=lambda: int(os.getenv("WS_SEND_TIMEOUT_MS", 5000)))
+    slow_consumer_policy: str = field(default_factory=lambda: os.getenv("WS_SLOW_CONSUMER_POLICY", "close"))
+
+
+class ClientSender:
+    """Cola de envío acotada de un socket, vaciada por su propia tarea."""
+
+    def __init__(self, websocket: WebSocket, settings: WebSocketSettings, stats: Dict[str, int],
+                 on_closed: Callable[[WebSocket], None], wire: WireFormat = JSON):
+        self.websocket = websocket
+        self._compress = wire.compressor()
+        self.settings = settings
+        self.stats = stats
+        self.closed = False
+        self._on_closed = on_closed
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.queue_size)
+        self.loop = asyncio.get_running_loop()
+        self._task = self.loop.create_task(self._run())
+
+    def offer(self, message: Union[str, bytes]):
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait(message)
+            return
+        except asyncio.QueueFull:
+            pass
+        if self.settings.slow_consumer_policy == "drop_oldest":
+            self.queue.get_nowait()
+            self.queue.task_done()
+            self.queue.put_nowait(message)
+            self.stats["dropped"] += 1
+        else:
+            self.stats["closed_slow"] += 1
+            logger.warning("Cliente WebSocket lento: cola llena (%s mensajes), se cierra", self.settings.queue_size)
+            self.close(code=1013, reason="Slow consumer")
+
+    async def _run(self):
+        timeout = self.settings.send_timeout_ms / 1000
+        while True:
+            message = await self.queue.get()
+            if self._compress is not None:
+                message = self._compress(message)
+            send = self.websocket.send_bytes if isinstance(message, bytes) else self.websocket.send_text
+            try:
+                await asyncio.wait_for(send(message), timeout)
+            except asyncio.TimeoutError:
+                self.stats["closed_timeout"] += 1
+                self.close(code=1013, reason="Send timeout")
+                return
+            except Exception:
+                # Socket muerto: no hay a quién avisarle
+                self.stats["closed_dead"] += 1
+                self.close(code=None)
+                return
+            finally:
+                self.queue.task_done()
+            self.stats["sent"] += 1
+
+    def close(self, code=None, reason: str = ""):
+        """Deja de enviar, saca el socket del manager y, con `code`, lo cierra."""
+        if self.closed:
+            return
+        self.closed = True
+        self.stop()
+        self._on_closed(self.websocket)
+        if code is not None:
+            self.loop.create_task(self._close_socket(code, reason))
+
+    async def _close_socket(self, code: int, reason: str):
+        try:
+            await asyncio.wait_for(self.websocket.close(code=code, reason=reason), self.settings.send_timeout_ms / 1000)
+        except Exception:
+            pass
+
+    def stop(self):
+        self.closed = True
+        if self._task is not asyncio.current_task():
+            self._task.cancel()
+        # Lo que quedó en la cola ya no se va a mandar
+        while not self.queue.empty():
+            self.queue.get_nowait()
+            self.queue.task_done()
+
+    async def join(self):
+        await self.queue.join()
 
-class ConnectionManagerLobby: # ESTE MANEJA LA LISTA DE PARTIDAS DISPONIBLES
-    def __init__(self):
+
+class _FanOut:
+    """Un ClientSender por socket, creado al conectar (o en el primer broadcast)."""
+
+    def __init__(self, settings: WebSocketSettings = None, broker: Broker = None):
+        self.settings = settings or WebSocketSettings()
+        self.broker = broker or InMemoryBroker()
+        self._senders: Dict[WebSocket, ClientSender] = {}
+        self.formats: Dict[WebSocket, WireFormat] = {}
+        self.stats = {"sent": 0, "dropped": 0, "closed_slow": 0, "closed_timeout": 0, "closed_dead": 0}
+
+    async def _accept(self, websocket: WebSocket):
+        scope = getattr(websocket, "scope", None)
+        wire = negotiate(scope.get("subprotocols") if isinstance(scope, dict) else None)
+        await websocket.accept(subprotocol=wire.subprotocol)
+        self.formats[websocket] = wire
+
+    def _send(self, websocket: WebSocket, message: str, on_closed: Callable[[WebSocket], None], encoded: dict):
+        """`encoded`: los mensajes ya codificados en este reparto, por (codificación, mensaje)."""
+        wire = self.formats.get(websocket, JSON)
+        if wire.encoding != "json":
+            key = (wire.encoding, message)
+            if key not in encoded:
+                encoded[key] = wire.encode(message)
+            message = encoded[key]
+        sender = self._senders.get(websocket)
+        if sender is None or sender.loop is not asyncio.get_running_loop():
+            if sender is not None:
+                sender.stop()
+            sender = self._senders[websocket] = ClientSender(websocket, self.settings, self.stats, on_closed, wire)
+        sender.offer(message)
+
+    def _forget(self, websocket: WebSocket):
+        self.formats.pop(websocket, None)
+        sender = self._senders.pop(websocket, None)
+        if sender is not None:
+            sender.stop()
+
+    async def flush(self):
+        """Espera a que se vacíen las colas de envío (tests y apagado)."""
+        await asyncio.gather(*(sender.join() for sender in list(self._senders.values())))
+
+
+class ConnectionManagerLobby(_FanOut): # ESTE MANEJA LA LISTA DE PARTIDAS DISPONIBLES
+    def __init__(self, settings: WebSocketSettings = None, broker: Broker = None):
+        super().__init__(settings, broker)
         self.active_connections: List[WebSocket] = []
+        self.broker.subscribe("lobby", self._deliver)
 
     async def connect(self, websocket: WebSocket):
-        await websocket.accept()
+        await self._accept(websocket)
         self.active_connections.append(websocket)
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        # El sender puede haberlo sacado antes (socket muerto o lento)
+        if websocket in self.active_connections:
+            self.active_connections.remove(websocket)
+        self._forget(websocket)
 
     async def broadcast(self, message: str):
-        disconnected = []
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message)
-            except Exception:
-                # Si la conexión está cerrada, la marcamos para remover
-                disconnected.append(connection)
-        # Removemos las conexiones cerradas
-        for conn in disconnected:
-            await self.disconnect(conn)
+        await self.broker.publish("lobby", message)
+
+    def _deliver(self, message: str):
+        encoded = {}
+        for connection in list(self.active_connections):
+            self._send(connection, message, self.disconnect, encoded)
 
     async def send_personal_message(self, message: str, websocket: WebSocket):
         await websocket.send_text(message)
 
-lobbyManager = ConnectionManagerLobby()
+# Compartido por los dos managers: una sola conexión al hub por worker
+broker = create_broker(os.getenv("WS_BROKER", "memory"))
+
+
+def share_game_state(manager, broker: Broker, workers: int):
+    """
+    El estado en memoria de las partidas es de cada proceso. Con un broker entre workers
+    cada commit invalida las copias de los demás (`manager.share`); con varios workers y
+    el broker en memoria nadie las invalidaría y las acciones se validarían contra un
+    estado viejo, así que el cache se apaga y cada acción lee la base.
+    """
+    if not broker.local:
+        manager.share(broker)
+    elif workers > 1 and manager.enabled:
+        logger.warning("%s workers sin WS_BROKER: el estado en memoria de las partidas queda apagado", workers)
+        manager.enabled = False
+
 
+# uvicorn y gunicorn toman la cantidad de workers por defecto de WEB_CONCURRENCY
+share_game_state(gameStateManager, broker, int(os.getenv("WEB_CONCURRENCY", 1)))
 
+lobbyManager = ConnectionManagerLobby(broker=broker)
 
-class ConnectionManagerGames :  # ESTE MANEJA SALA DE ESPERA Y PARTIDA EN JUEGO
-    def __init__(self): 
+
+
+class ConnectionManagerGames(_FanOut) :  # ESTE MANEJA SALA DE ESPERA Y PARTIDA EN JUEGO
+    def __init__(self, settings: WebSocketSettings = None, broker: Broker = None):
+        super().__init__(settings, broker)
         self.active_connections : Dict[int, List[WebSocket]] = defaultdict(list)
+        # Jugador de cada socket (None para espectadores)
+        self.players : Dict[WebSocket, Optional[int]] = {}
+        self.broker.subscribe("games", self._deliver)
 
-    async def connect (self, websocket : WebSocket, game_id : int) : 
-        await websocket.accept() 
+    async def connect (self, websocket : WebSocket, game_id : int, player_id : Optional[int] = None) :
+        await self._accept(websocket)
         self.active_connections[game_id].append(websocket)
-    def disconnect (self, websocket : WebSocket, game_id : int) : 
-        self.active_connections[game_id].remove(websocket)
-        if not self.active_connections[game_id]:
+        self.players[websocket] = player_id
+    def disconnect (self, websocket : WebSocket, game_id : int) :
+        connections = self.active_connections.get(game_id, [])
+        if websocket in connections:
+            connections.remove(websocket)
+        if game_id in self.active_connections and not connections:
             del self.active_connections[game_id]
+        self.players.pop(websocket, None)
+        self._forget(websocket)
+
+    async def broadcast (self, message : str, game_id : int) :
+        await self.broadcast_views({None: message}, game_id)
+
+    async def broadcast_views (self, frames : Dict[Optional[int], str], game_id : int) :
+        """Manda a cada socket el frame de su jugador; sin jugador o sin frame propio, el de None."""
+        await self.broker.publish("games", {"game_id": game_id, "frames": list(frames.items())})
 
-    async def broadcast (self, message : str, game_id : int) : 
-        for connection in self.active_connections[game_id]: 
-            await connection.send_text(message)   
+    def _deliver (self, message : dict) :
+        # Solo encola: cada socket lo manda desde su propia tarea
+        game_id, frames = message["game_id"], dict(message["frames"])
+        encoded = {}
+        for connection in list(self.active_connections.get(game_id, [])):
+            frame = frames.get(self.players.get(connection), frames.get(None))
+            if frame is not None:
+                self._send(connection, frame, lambda websocket: self.disconnect(websocket, game_id), encoded)
 
-gameManager = ConnectionManagerGames() 
\ No newline at end of file
+gameManager = ConnectionManagerGames(broker=broker)
@@ -0,0 +1,69 @@
+"""
+Formato de los mensajes de WebSocket, negociado por conexión con el subprotocolo.
+
+El cliente ofrece subprotocolos al conectarse (Sec-WebSocket-Protocol) y el server
+acepta el primero que conoce; sin ninguno conocido, todo sigue como siempre:
+
+- json: texto JSON.
+- cbor: el mismo mensaje en CBOR (RFC 8949, cbor.py), en frames binarios. Las claves y
+  los valores son los del JSON.
+- json-deflate / cbor-deflate: además comprimido con deflate, con el contexto de la
+  conexión compartido entre mensajes como en permessage-deflate (RFC 7692): los nombres
+  de campos y de cartas que se repiten de un mensaje a otro se mandan como referencias.
+  Cada frame es binario, deflate crudo terminado en un flush de sync; el cliente lo
+  descomprime con un solo inflate crudo (windowBits -15) que mantiene toda la conexión.
+
+permessage-deflate propiamente dicho lo negocia el server ASGI (uvicorn lo ofrece por
+defecto); los subprotocolos -deflate son para clientes o proxies que no lo negocian, y
+no conviene usar los dos a la vez.
+
+CBOR ahorra ~30% contra JSON pero se codifica en Python (decenas de µs por frame, una
+vez por formato en cada reparto); json-deflate ahorra mucho más por mucho menos CPU
+(benchmarks/bench_wire.py).
+"""
+import zlib
+from dataclasses import dataclass
+from typing import Iterable, Optional, Union
+from pydantic_core import from_json
+from src.webSocket import cbor
+
+
+@dataclass(frozen=True)
+class WireFormat:
+    subprotocol: Optional[str]
+    encoding: str = "json"
+    deflate: bool = False
+
+    def encode(self, message: str) -> Union[str, bytes]:
+        """El mensaje (un JSON) en la codificación del formato, sin comprimir."""
+        if self.encoding == "cbor":
+            return cbor.dumps(from_json(message))
+        return message
+
+    def compressor(self):
+        """Compresor de una conexión: se usa en orden, para cada mensaje que se manda."""
+        if not self.deflate:
+            return None
+        compressor = zlib.compressobj(wbits=-15)
+
+        def compress(message: Union[str, bytes]) -> bytes:
+            data = message.encode() if isinstance(message, str) else message
+            return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        return compress
+
+
+JSON = WireFormat(None)
+FORMATS = {
+    "json": WireFormat("json"),
+    "cbor": WireFormat("cbor", "cbor"),
+    "json-deflate": WireFormat("json-deflate", "json", deflate=True),
+    "cbor-deflate": WireFormat("cbor-deflate", "cbor", deflate=True),
+}
+
+
+def negotiate(offered: Optional[Iterable[str]]) -> WireFormat:
+    """El primer subprotocolo ofrecido que se conoce, o JSON sin subprotocolo."""
+    for subprotocol in offered or ():
+        if subprotocol in FORMATS:
+            return FORMATS[subprotocol]
+    return JSON